@@ -1,16 +1,27 @@
+from collections import OrderedDict
+
+
 class ProDistribution:
     """概率分布类 - 基于动态技能名称"""
     
-    def __init__(self, initial_value=500, ratio=0.6):
+    def __init__(self, initial_value=500, ratio=0.6, cache_size=4096):
         """
         初始化概率分布
         
         Args:
             initial_value: 基础权重值，默认为500
             ratio: 递减比例，默认为0.8
+            cache_size: 累积权重缓存的最大条目数（LRU淘汰），为0时不缓存，默认为4096
         """
         self.initial_value = initial_value
         self.ratio = ratio
+        self.cache_size = cache_size
+        
+        # 累积权重缓存：规范状态签名 -> 累积权重列表
+        self._cumulative_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
     
     def get_current_weight(self, character):
         """
@@ -20,47 +31,147 @@ class ProDistribution:
             character: Character类实例，包含attribute_values字典
             
         Returns:
-            dict: 包含每个流派当前概率的字典 {str: float}
+            dict: 包含每个流派当前概率的字典 {str: float}，按流派的字典插入顺序排列
+                  （卡池顺序由character.get_pool_order()提供）
         """
         attribute_values = character.attribute_values
-        style_count = character.get_style_count()
+        value_counts = character.value_counts
+        restricted = character.get_style_count() >= 3
+        
+        # 每个不同的属性值只计算一次权重
+        value_weights = {value: self.get_style_weight(None, value) for value in value_counts}
+        # 如果流派拥有数量>=3，只保留角色拥有的流派（value>0）
+        styles = [style for style, value in attribute_values.items() if not (restricted and value == 0)]
+        
+        # 计算所有权重之和：角色绑定了本概率分布时直接使用其增量维护的权重之和
+        if character.pro_distribution is self:
+            total_weight = character.get_total_weight()
+        else:
+            total_weight = sum(
+                value_weights[value] * count for value, count in value_counts.items()
+                if not (restricted and value == 0)
+            )
+        
+        # 将权重转换为概率（每一项/所有项之和）
+        if total_weight > 0:
+            return {style: value_weights[attribute_values[style]] / total_weight for style in styles}
+        
+        # 如果总权重为0，则所有概率相等
+        equal_probability = 1.0 / len(styles) if styles else 0.0
+        return {style: equal_probability for style in styles}
+    
+    def get_state_signature(self, character):
+        """
+        获取角色当前状态的规范签名
         
-        # 创建结果字典，用于存储每个流派的当前权重
-        current_weights = {}
+        流派名称不影响权重，因此签名只包含卡池流派数、拥有数量是否>=3以及属性值多重集。
+        属性值多重集由角色增量维护，无需扫描attribute_values
         
-        # 遍历角色的所有流派
-        for style_name, style_value in attribute_values.items():
-            # 如果流派拥有数量>=3，只保留角色拥有的流派（value>0）
-            if style_count >= 3 and style_value == 0:
-                continue  # 跳过未拥有的流派
+        Args:
+            character: Character类实例
             
-            # 为每个流派创建一个简单的分布（这里使用默认分布）
-            # 可以根据需要扩展为更复杂的分布逻辑
-            if style_value == 0:
-                current_weight = self.initial_value  # 基础权重
-            else:
-                current_weight = self.initial_value * (self.ratio ** style_value)  # 按流派值递减
+        Returns:
+            tuple: (卡池流派数, 是否只保留已拥有流派, (升序排列的属性值, ...))
+        """
+        return (
+            len(character.attribute_values),
+            character.get_style_count() >= 3,
+            character.get_value_signature()
+        )
+    
+    def _build_cumulative_weights(self, signature):
+        """
+        根据规范签名计算累积权重
+        
+        Args:
+            signature: get_state_signature返回的签名
             
-            # 将权重存储到字典中
-            current_weights[style_name] = current_weight
+        Returns:
+            list: 按属性值升序排列的卡池流派的累积权重
+        """
+        _, restricted, sorted_values = signature
         
-        # 计算所有权重之和
-        total_weight = sum(current_weights.values())
+        # 如果流派拥有数量>=3，只保留角色拥有的流派（value>0）
+        pool_values = [value for value in sorted_values if not (restricted and value == 0)]
+        weights = [self.get_style_weight(None, value) for value in pool_values]
         
-        # 将权重转换为概率（每一项/所有项之和）
-        current_probabilities = {}
-        if total_weight > 0:
-            for style_name, weight in current_weights.items():
-                probability = weight / total_weight
-                current_probabilities[style_name] = probability
-        else:
-            # 如果总权重为0，则所有概率相等
-            num_styles = len(current_weights)
-            equal_probability = 1.0 / num_styles if num_styles > 0 else 0.0
-            for style_name in current_weights.keys():
-                current_probabilities[style_name] = equal_probability
+        # 如果总权重为0，则所有流派等权重
+        if sum(weights) <= 0:
+            weights = [1.0] * len(pool_values)
         
-        return current_probabilities
+        cumulative = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        return cumulative
+    
+    def _lookup_cumulative_weights(self, signature):
+        """
+        按规范签名查找累积权重，未命中时计算并按LRU规则写入缓存
+        
+        Args:
+            signature: 规范状态签名
+            
+        Returns:
+            list: 累积权重列表
+        """
+        cumulative = self._cumulative_cache.get(signature)
+        if cumulative is not None:
+            self.cache_hits += 1
+            self._cumulative_cache.move_to_end(signature)
+            return cumulative
+        
+        self.cache_misses += 1
+        cumulative = self._build_cumulative_weights(signature)
+        if self.cache_size > 0:
+            self._cumulative_cache[signature] = cumulative
+            if len(self._cumulative_cache) > self.cache_size:
+                self._cumulative_cache.popitem(last=False)
+                self.cache_evictions += 1
+        return cumulative
+    
+    def get_cumulative_weights(self, character):
+        """
+        返回当前卡池的流派列表及对应的累积权重，可直接用于random.choices(cum_weights=...)
+        
+        结果按规范状态签名缓存，属性值组合相同的角色共享同一个累积权重列表
+        
+        Args:
+            character: Character类实例
+            
+        Returns:
+            tuple: (styles, cumulative)
+                styles: 卡池流派名称列表，按属性值升序排列（角色内部列表，不得修改）
+                cumulative: 与styles一一对应的累积权重列表
+        """
+        signature = self.get_state_signature(character)
+        cumulative = self._lookup_cumulative_weights(signature)
+        
+        # 卡池顺序由角色随属性值变化增量维护，命中缓存时无需排序
+        return character.get_pool_order(), cumulative
+    
+    def cache_info(self):
+        """
+        获取累积权重缓存的统计信息
+        
+        Returns:
+            dict: 包含命中、未命中、淘汰次数以及当前大小和容量
+        """
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'evictions': self.cache_evictions,
+            'size': len(self._cumulative_cache),
+            'maxsize': self.cache_size
+        }
+    
+    def clear_cache(self):
+        """清空累积权重缓存及统计信息"""
+        self._cumulative_cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
     
     def get_style_weight(self, style_name, style_value):
         """
@@ -88,6 +199,7 @@ class ProDistribution:
         summary = f"概率分布配置:\n"
         summary += f"  基础权重值: {self.initial_value}\n"
         summary += f"  递减比例: {self.ratio}\n"
+        summary += f"  缓存统计: {self.cache_info()}\n"
         return summary
     
     def print_summary(self):
@@ -0,0 +1,255 @@
+from statistics import NormalDist
+import time
+import numpy as np
+from histogram import empty_histogram
+from parallel import collect_character_stats_sharded, collect_ratio_counts_sharded
+
+"""
+自适应蒙特卡洛模拟
+
+功能说明：
+- 分批模拟，每批结束后计算被跟踪单元格的二项分布置信区间（Wilson区间）
+- 所有被跟踪单元格的半宽都达到目标，或超出时间预算/轮数上限时停止
+- 下一批的轮数由当前最差单元格估算，最多翻倍，保证能及时检查停止条件
+- 各批依次模拟连续的轮次（计数器随机流），结果与用同一种子一次模拟相同轮数完全一致
+"""
+
+# 默认跟踪的gacha次数（与报告中标记最大值的列一致）
+TRACKED_DRAWS = (12, 15, 20)
+
+
+class PrecisionTarget:
+    """自适应模拟的精度目标与停止条件"""
+
+    def __init__(self, half_width=0.01, confidence=0.95, time_budget=None, max_rounds=None, initial_rounds=1000,
+                 tracked_draws=TRACKED_DRAWS):
+        """
+        初始化精度目标
+
+        Args:
+            half_width: 置信区间半宽目标（比例），默认0.01
+            confidence: 置信水平，默认0.95
+            time_budget: 时间预算（秒），默认None（不限制）
+            max_rounds: 轮数上限，默认None（不限制）
+            initial_rounds: 第一批的轮数，默认1000
+            tracked_draws: 跟踪的抽卡次数，默认(12, 15, 20)；都超过draw_count时跟踪最后一次
+        """
+        if not 0 < confidence < 1:
+            raise ValueError(f"置信水平 {confidence} 必须在0与1之间")
+        if half_width <= 0:
+            raise ValueError(f"置信区间半宽 {half_width} 必须大于0")
+        self.half_width = half_width
+        self.confidence = confidence
+        self.time_budget = time_budget
+        self.max_rounds = max_rounds
+        self.initial_rounds = initial_rounds
+        self.tracked_draws = tuple(tracked_draws)
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    def describe(self):
+        """
+        获取可JSON序列化的精度目标描述
+
+        Returns:
+            dict: 精度目标参数
+        """
+        return {
+            'half_width': self.half_width,
+            'confidence': self.confidence,
+            'time_budget': self.time_budget,
+            'max_rounds': self.max_rounds,
+            'initial_rounds': self.initial_rounds,
+            'tracked_draws': list(self.tracked_draws),
+        }
+
+    def get_tracked_draws(self, draw_count):
+        """
+        获取draw_count范围内实际跟踪的抽卡次数
+
+        Args:
+            draw_count: 每轮抽卡次数
+
+        Returns:
+            list: 抽卡次数列表
+        """
+        draws = [draw for draw in self.tracked_draws if 1 <= draw <= draw_count]
+        return draws or [draw_count]
+
+    def next_batch_rounds(self, counts, rounds, elapsed):
+        """
+        估算下一批的轮数
+
+        Args:
+            counts: 被跟踪单元格的计数数组
+            rounds: 已模拟的轮数
+            elapsed: 已用时间（秒）
+
+        Returns:
+            int: 下一批的轮数
+        """
+        p = counts / rounds
+        # 正态近似下达到目标半宽所需的总轮数
+        required = int(np.ceil((self.z ** 2 * p * (1 - p)).max(initial=0) / self.half_width ** 2))
+        batch = min(max(required - rounds, self.initial_rounds), rounds)
+
+        if self.max_rounds is not None:
+            batch = min(batch, self.max_rounds - rounds)
+        if self.time_budget is not None and elapsed > 0:
+            # 按目前的速度估算剩余时间内还能模拟的轮数
+            affordable = int((self.time_budget - elapsed) * rounds / elapsed)
+            batch = min(batch, max(affordable, 1))
+        return max(batch, 1)
+
+
+def wilson_half_width(counts, rounds, z):
+    """
+    计算二项比例Wilson置信区间的半宽
+
+    Args:
+        counts: 成功次数（标量或数组）
+        rounds: 试验次数
+        z: 标准正态分位数
+
+    Returns:
+        ndarray: 半宽
+    """
+    p = np.asarray(counts, dtype=np.float64) / rounds
+    denominator = 1 + z ** 2 / rounds
+    return z / denominator * np.sqrt(p * (1 - p) / rounds + z ** 2 / (4 * rounds ** 2))
+
+
+def _run_adaptive(target, run_batch, tracked_counts):
+    """
+    自适应分批模拟的主循环
+
+    Args:
+        target: PrecisionTarget实例
+        run_batch: 函数 (轮数, 第一轮的轮次) -> None，模拟一批并累加到调用方的统计数据中
+        tracked_counts: 函数 () -> 每个角色被跟踪单元格计数数组的列表
+
+    Returns:
+        tuple: (总轮数, 精度报告字典)
+    """
+    start = time.perf_counter()
+    rounds = 0
+    batch = target.initial_rounds
+    if target.max_rounds is not None:
+        batch = min(batch, target.max_rounds)
+    while True:
+        run_batch(batch, rounds)
+        rounds += batch
+        elapsed = time.perf_counter() - start
+
+        counts = tracked_counts()
+        half_widths = [float(wilson_half_width(char_counts, rounds, target.z).max(initial=0)) for char_counts in counts]
+        converged = max(half_widths, default=0) <= target.half_width
+        out_of_time = target.time_budget is not None and elapsed >= target.time_budget
+        out_of_rounds = target.max_rounds is not None and rounds >= target.max_rounds
+        if converged or out_of_time or out_of_rounds:
+            break
+        batch = target.next_batch_rounds(np.concatenate(counts), rounds, elapsed)
+
+    report = dict(target.describe())
+    report.update({
+        'rounds': rounds,
+        'elapsed': elapsed,
+        'converged': converged,
+        'half_widths': half_widths,
+        'max_half_width': max(half_widths, default=0),
+    })
+    return rounds, report
+
+
+def adaptive_character_stats(simulator, draw_count, target, enable_reroll=True, max_rerolls=2, engine='batch',
+                             workers=1, seed=None, final_states=None):
+    """
+    自适应地统计每次抽卡后主攻流派属性值的分布
+
+    跟踪每个角色在target.tracked_draws列上所有属性值单元格的比例
+
+    Args:
+        simulator: Simulator实例
+        draw_count: 每轮抽卡次数
+        target: PrecisionTarget实例
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        engine: 模拟引擎，'scalar'或'batch'，默认'batch'
+        workers: 并行进程数，默认1
+        seed: 主随机种子，默认None（使用模拟器的种子或生成新的种子）
+        final_states: 传入列表时，为每个角色追加各批拼接的 (流派列表, 最终属性值矩阵)，默认None
+
+    Returns:
+        tuple: (character_stats, 总轮数, 精度报告字典)
+    """
+    if engine not in ('scalar', 'batch'):
+        raise ValueError(f"模拟引擎 '{engine}' 不支持自适应模拟")
+
+    seed = simulator.resolve_seed(seed)
+    character_stats = empty_histogram(simulator.characters, draw_count)
+    batch_states = []
+    tracked_draws = target.get_tracked_draws(draw_count)
+
+    def run_batch(rounds, first_round):
+        states = [] if final_states is not None else None
+        batch_stats = collect_character_stats_sharded(
+            simulator, draw_count, rounds, enable_reroll, max_rerolls, engine, workers, seed, states, first_round
+        )
+        # 原地累加（character_stats属于外层函数）
+        character_stats[...] += batch_stats
+        batch_states.append(states)
+
+    def tracked_counts():
+        return [stats[tracked_draws].ravel().astype(np.float64) for stats in character_stats]
+
+    rounds, report = _run_adaptive(target, run_batch, tracked_counts)
+    report['tracked_draws'] = tracked_draws
+
+    if final_states is not None:
+        for i in range(len(simulator.characters)):
+            styles = batch_states[0][i][0]
+            final_states.append((styles, np.concatenate([states[i][1] for states in batch_states])))
+    return character_stats, rounds, report
+
+
+def adaptive_ratio_counts(simulator, draw_count, threshold, target, enable_reroll=True, max_rerolls=2,
+                          engine='batch', workers=1, seed=None):
+    """
+    自适应地统计每个角色的达标轮数与没有主攻属性的轮数
+
+    跟踪每个角色的达标比例与没有主攻属性的比例
+
+    Args:
+        simulator: Simulator实例
+        draw_count: 每轮抽卡次数
+        threshold: 阈值
+        target: PrecisionTarget实例
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        engine: 模拟引擎，'scalar'或'batch'，默认'batch'
+        workers: 并行进程数，默认1
+        seed: 主随机种子，默认None（使用模拟器的种子或生成新的种子）
+
+    Returns:
+        tuple: (每个角色的 (达标轮数, 没有主攻属性的轮数), 总轮数, 精度报告字典)
+    """
+    if engine not in ('scalar', 'batch'):
+        raise ValueError(f"模拟引擎 '{engine}' 不支持自适应模拟")
+
+    seed = simulator.resolve_seed(seed)
+    ratio_counts = [(0, 0)] * len(simulator.characters)
+
+    def run_batch(rounds, first_round):
+        nonlocal ratio_counts
+        batch_counts = collect_ratio_counts_sharded(
+            simulator, draw_count, rounds, threshold, enable_reroll, max_rerolls, engine, workers, seed, first_round
+        )
+        ratio_counts = [
+            (success + batch_success, no_main + batch_no_main)
+            for (success, no_main), (batch_success, batch_no_main) in zip(ratio_counts, batch_counts)
+        ]
+
+    def tracked_counts():
+        return [np.array(counts, dtype=np.float64) for counts in ratio_counts]
+
+    rounds, report = _run_adaptive(target, run_batch, tracked_counts)
+    return ratio_counts, rounds, report
@@ -0,0 +1,199 @@
+import json
+import os
+import numpy as np
+from histogram import trim_histogram
+
+"""
+列式模拟结果
+
+功能说明：
+- 以稠密数组保存直方图：histogram[角色下标, 抽卡次数, 主攻流派属性值]
+- 可选保存每轮结束时的全部属性值（最终状态）
+- 附带运行元数据（概率分布参数、引擎、轮数、种子等）
+- 支持NumPy .npz与Parquet（需要pyarrow）两种格式
+- Excel报告是基于结果的可选渲染步骤
+"""
+
+# Parquet文件中保存元数据的键
+PARQUET_METADATA_KEY = b'rougelike_reward'
+
+
+class SimulationArtifact:
+    """一次模拟运行的列式结果"""
+
+    def __init__(self, characters, histogram, draw_count, rounds, metadata=None, final_states=None):
+        """
+        初始化模拟结果
+
+        Args:
+            characters: 角色配置列表 [(attribute, level, havetool), ...]
+            histogram: 直方图数组 (角色数, draw_count+1, 最大属性值+1)，'exact'引擎为概率
+            draw_count: 每轮抽卡次数
+            rounds: 模拟轮数
+            metadata: 运行元数据字典，默认None
+            final_states: 每个角色的 (流派列表, 最终属性值矩阵 (轮数, 流派数))，默认None
+        """
+        self.characters = [(attribute, int(level), bool(havetool)) for attribute, level, havetool in characters]
+        self.histogram = histogram
+        self.draw_count = draw_count
+        self.rounds = rounds
+        self.metadata = dict(metadata or {})
+        self.final_states = final_states
+
+    @classmethod
+    def from_histogram(cls, characters, histogram, draw_count, rounds, metadata=None, final_states=None):
+        """
+        由模拟得到的稠密直方图构造结果（去掉末尾全为0的属性值列）
+
+        Args:
+            characters: Character实例列表
+            histogram: 直方图 (角色数, draw_count+1, 属性值个数)，见histogram.empty_histogram
+            draw_count: 每轮抽卡次数
+            rounds: 模拟轮数
+            metadata: 运行元数据字典，默认None
+            final_states: 每个角色的 (流派列表, 最终属性值矩阵)，默认None
+
+        Returns:
+            SimulationArtifact: 模拟结果
+        """
+        specs = [(character.attribute, character.get_level(), character.get_havetool()) for character in characters]
+        return cls(specs, trim_histogram(histogram), draw_count, rounds, metadata, final_states)
+
+    def build_characters(self):
+        """
+        按保存的配置重建角色
+
+        Returns:
+            list: Character实例列表
+        """
+        from character import Character
+
+        return [Character(attribute, level, havetool) for attribute, level, havetool in self.characters]
+
+    def save(self, filename):
+        """
+        保存结果，格式由扩展名决定（.npz 或 .parquet）
+
+        Args:
+            filename: 输出文件名
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.npz':
+            self._save_npz(filename)
+        elif extension == '.parquet':
+            self._save_parquet(filename)
+        else:
+            raise ValueError(f"不支持的结果格式 '{extension}'，可选 .npz 或 .parquet")
+
+    @classmethod
+    def load(cls, filename):
+        """
+        读取结果，格式由扩展名决定（.npz 或 .parquet）
+
+        Args:
+            filename: 结果文件名
+
+        Returns:
+            SimulationArtifact: 模拟结果
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.npz':
+            return cls._load_npz(filename)
+        if extension == '.parquet':
+            return cls._load_parquet(filename)
+        raise ValueError(f"不支持的结果格式 '{extension}'，可选 .npz 或 .parquet")
+
+    def _header(self):
+        """
+        获取需要随结果保存的元数据
+
+        Returns:
+            dict: 元数据（包括抽卡次数、轮数与角色配置）
+        """
+        return {
+            'draw_count': self.draw_count,
+            'rounds': self.rounds,
+            'characters': self.characters,
+            'metadata': self.metadata,
+        }
+
+    def _save_npz(self, filename):
+        """以NumPy .npz格式保存（不依赖pickle）"""
+        arrays = {
+            'header': np.array(json.dumps(self._header(), ensure_ascii=False)),
+            'histogram': self.histogram,
+        }
+        if self.final_states is not None:
+            for i, (styles, counts) in enumerate(self.final_states):
+                arrays[f'final_styles_{i}'] = np.array(styles)
+                arrays[f'final_counts_{i}'] = counts
+        np.savez(filename, **arrays)
+
+    @classmethod
+    def _load_npz(cls, filename):
+        """读取NumPy .npz格式的结果"""
+        with np.load(filename, allow_pickle=False) as data:
+            header = json.loads(data['header'].item())
+            final_states = None
+            if 'final_counts_0' in data.files:
+                final_states = [
+                    (data[f'final_styles_{i}'].tolist(), data[f'final_counts_{i}'])
+                    for i in range(len(header['characters']))
+                ]
+            return cls(
+                header['characters'], data['histogram'], header['draw_count'], header['rounds'],
+                header['metadata'], final_states
+            )
+
+    def _save_parquet(self, filename):
+        """以Parquet长表格式保存直方图：每个非零单元格一行"""
+        if self.final_states is not None:
+            raise ValueError("Parquet格式只保存直方图，保存最终状态请使用 .npz")
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        char_index, draw, value = np.nonzero(self.histogram)
+        table = pa.table({
+            'character': char_index.astype(np.int32),
+            'draw': draw.astype(np.int32),
+            'value': value.astype(np.int32),
+            'count': self.histogram[char_index, draw, value],
+        })
+        table = table.replace_schema_metadata({
+            PARQUET_METADATA_KEY: json.dumps(self._header(), ensure_ascii=False).encode('utf-8')
+        })
+        pq.write_table(table, filename)
+
+    @classmethod
+    def _load_parquet(cls, filename):
+        """读取Parquet长表格式的结果"""
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(filename)
+        header = json.loads(table.schema.metadata[PARQUET_METADATA_KEY].decode('utf-8'))
+
+        char_index = table.column('character').to_numpy()
+        draw = table.column('draw').to_numpy()
+        value = table.column('value').to_numpy()
+        count = table.column('count').to_numpy()
+        max_value = int(value.max()) if value.size else 0
+        histogram = np.zeros((len(header['characters']), header['draw_count'] + 1, max_value + 1), dtype=count.dtype)
+        histogram[char_index, draw, value] = count
+        return cls(header['characters'], histogram, header['draw_count'], header['rounds'], header['metadata'])
+
+    def render_report(self, filename="simulation_results.xlsx", write_only=False, instrument=None):
+        """
+        由结果渲染Excel报告
+
+        Args:
+            filename: 输出文件名，默认"simulation_results.xlsx"
+            write_only: 是否使用流式写入模式，默认False
+            instrument: Instrument实例，记录布局与保存阶段的用时，默认None
+        """
+        from report import write_report
+
+        write_report(
+            filename, self.build_characters(), self.histogram, self.draw_count, self.rounds, write_only,
+            self.metadata.get('precision'), instrument
+        )
@@ -0,0 +1,387 @@
+import numpy as np
+from character import Character, CharacterPopulation
+from histogram import add_main_values
+from instrument import NULL_INSTRUMENT
+from round_rng import RoundRandom, round_blocks
+
+"""
+向量化批量抽卡引擎
+
+功能说明：
+- 以NumPy数组同步推进成千上万轮模拟（每行一轮）
+- 属性值以整数矩阵保存，权重按 initial_value * ratio**counts 计算
+- 三张卡牌通过一次向量化调用完成加权抽样
+- 每轮使用由 (种子, 角色下标, 轮次) 确定的计数器随机流；卡池按属性值升序排列（同值按名称或流派顺序），
+  与逐轮模拟的累积权重抽样方式一致，相同种子下每一轮的结果与逐轮模拟相同
+- 随机流可替换为低差异序列（qmc.SobolStream），每一维对应一个卡牌位置
+- 可指定共同的每轮块数，使重新roll设置不同的多个配置使用对齐的随机流（公共随机数对比）
+- 支持流派拥有数量>=3时的卡池限制以及重新roll规则
+- 按固定大小分块处理，内存占用与总轮数无关
+- 每轮结束时的状态可以保存为CharacterPopulation（int16属性值矩阵），百万轮只占几十MB
+"""
+
+
+class BatchEngine:
+    """向量化批量抽卡引擎"""
+
+    def __init__(self, pro_distribution, chunk_size=8192, seed=None, instrument=None, antithetic=False, stream=None):
+        """
+        初始化批量引擎
+
+        Args:
+            pro_distribution: ProDistribution实例，提供initial_value与ratio
+            chunk_size: 每块同时推进的轮数，默认8192（数组能放进CPU缓存）
+            seed: 随机种子，默认None（由系统熵生成，可从self.rng.seed读取）
+            instrument: Instrument实例，记录消耗的重新roll次数与进度，默认None（不记录）
+            antithetic: 是否使用对偶轮次（见RoundRandom），默认False
+            stream: 提供uniforms()的随机流（如qmc.SobolStream），默认None（RoundRandom(seed, antithetic)）
+        """
+        self.pro_distribution = pro_distribution
+        self.chunk_size = chunk_size
+        self.rng = stream if stream is not None else RoundRandom(seed, antithetic)
+        self.instrument = instrument if instrument is not None else NULL_INSTRUMENT
+
+    def _character_layout(self, character):
+        """
+        获取角色的流派顺序、初始属性值与主攻流派下标
+
+        Args:
+            character: Character类实例
+
+        Returns:
+            tuple: (styles, initial_counts, main_index, name_ranks)，主攻流派不在卡池中时main_index为-1，
+                name_ranks为每个流派按名称排序后的名次
+        """
+        # 使用全新角色获取初始属性值，避免修改传入角色的状态
+        template = Character(character.attribute, character.get_level(), character.get_havetool())
+        styles = list(template.attribute_values.keys())
+        initial_counts = np.array([template.attribute_values[style] for style in styles], dtype=np.int64)
+        main_index = styles.index(character.attribute) if character.attribute in styles else -1
+        name_ranks = np.empty(len(styles), dtype=np.int64)
+        name_ranks[sorted(range(len(styles)), key=styles.__getitem__)] = np.arange(len(styles))
+        return styles, initial_counts, main_index, name_ranks
+
+    def _key_table(self, weight_table, style_total):
+        """
+        构造按排序键索引的权重表与卡池标记表
+
+        排序键 = 属性值*流派数 + 同值时的名次，流派拥有数量>=3的轮再加上偏移量len(weight_table)*流派数；
+        偏移后属性值为0的流派被卡池排除，权重为0
+
+        Args:
+            weight_table: 按属性值索引的权重表
+            style_total: 流派数
+
+        Returns:
+            tuple: (key_table, pool_table)，长度均为 2*len(weight_table)*流派数
+                key_table: 权重表
+                pool_table: 在卡池中为1.0，被排除为0.0
+        """
+        weights = np.repeat(weight_table, style_total)
+        pool_table = np.ones(2 * weights.size)
+        pool_table[weights.size:weights.size + style_total] = 0.0
+        return np.concatenate([weights, weights]) * pool_table, pool_table
+
+    def _cumulative_weights(self, sorted_keys, key_table, pool_table, scale=None):
+        """
+        计算每一轮当前卡池的累积权重
+
+        与ProDistribution.get_cumulative_weights一致：卡池按属性值升序排列，同值时按流派顺序，
+        只保留已拥有流派时按名称；被排除的流派排在最前面，权重为0
+
+        Args:
+            sorted_keys: 每一轮升序排列的排序键矩阵 (轮数, 流派数)，见_key_table
+            key_table: 按排序键索引的权重表
+            pool_table: 按排序键索引的卡池标记（在卡池中为1.0，被排除为0.0）
+            scale: 与sorted_keys同形状的权重倍数（重要性抽样的倾斜），默认None
+
+        Returns:
+            ndarray: 累积权重矩阵 (轮数, 流派数)
+        """
+        weights = key_table[sorted_keys]
+        if scale is not None:
+            weights *= scale
+        cumulative = np.cumsum(weights, axis=1)
+        # 与ProDistribution保持一致：总权重为0时卡池内流派等概率
+        zero_total = np.flatnonzero(cumulative[:, -1] == 0)
+        if zero_total.size:
+            cumulative[zero_total] = np.cumsum(pool_table[sorted_keys[zero_total]], axis=1)
+        return cumulative
+
+    def _sort_rows(self, sorted_keys, order, rows):
+        """
+        对指定的轮重新排序，原地更新排序键与排列顺序
+
+        Args:
+            sorted_keys: 排序键矩阵 (轮数, 流派数)
+            order: 每个位置对应的流派下标 (轮数, 流派数)
+            rows: 需要重新排序的轮的下标
+        """
+        if rows.size == 0:
+            return
+        permutation = np.argsort(sorted_keys[rows], axis=1)
+        sorted_keys[rows] = np.take_along_axis(sorted_keys[rows], permutation, axis=1)
+        order[rows] = np.take_along_axis(order[rows], permutation, axis=1)
+
+    def _sample_positions(self, cumulative, uniforms):
+        """
+        按累积权重为每一行抽取三张卡牌
+
+        Args:
+            cumulative: 累积权重矩阵 (行数, 流派数)
+            uniforms: 每行三个[0, 1)均匀随机数 (行数, 3)
+
+        Returns:
+            ndarray: 卡牌在排列顺序中的位置矩阵 (行数, 3)
+        """
+        targets = uniforms * cumulative[:, -1:]
+        # 等价于对每张卡执行bisect_right，与random.choices的选择方式一致
+        positions = (cumulative[:, None, :] <= targets[:, :, None]).sum(axis=2)
+        return np.minimum(positions, cumulative.shape[1] - 1)
+
+    def simulate_chunk(self, character, size, draw_count, enable_reroll=True, max_rerolls=2, character_index=0,
+                       first_round=0, blocks=None, tilt=None, main_share=None, log_weights=None, likelihood=None,
+                       trajectory=None):
+        """
+        同步模拟一块轮次
+
+        Args:
+            character: Character类实例
+            size: 本块轮数
+            draw_count: 每轮抽卡次数
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            character_index: 角色下标（随机流的一部分），默认0
+            first_round: 本块第一轮的轮次（随机流的一部分），默认0
+            blocks: 每轮块数，默认None（由round_blocks计算）；对比多个配置时传入共同的块数使随机流对齐
+            tilt: 重要性抽样时主攻流派权重的倍数，默认None（不倾斜）
+            main_share: 重要性抽样时主攻流派单张卡概率的下限（主攻流派在卡池中时），默认None（不倾斜）
+            log_weights: 传入长度为size的数组时，累加每一轮的对数似然比 log(原分布概率/倾斜后概率)，默认None
+            likelihood: reweight.LikelihoodRecord实例，记录每一轮抽到的手牌在一组ratio下的对数概率，默认None
+            trajectory: trajectory.TrajectoryRecord实例，记录每一轮每次抽卡后的属性值、最终手牌与重新roll次数，默认None
+
+        Returns:
+            tuple: (main_values, counts)
+                main_values: 主攻流派属性值矩阵 (size, draw_count+1)，第j列为第j次抽卡后的值
+                counts: 本块结束时的属性值矩阵 (size, 流派数)
+        """
+        styles, initial_counts, main_index, name_ranks = self._character_layout(character)
+        # 与逐轮模拟使用相同的权重计算，保证浮点结果一致
+        weight_table = np.array([
+            self.pro_distribution.get_style_weight(None, value)
+            for value in range(int(initial_counts.max(initial=0)) + draw_count + 1)
+        ], dtype=np.float64)
+
+        # 本块每一轮预留的均匀随机数：第一手牌按抽卡次数取固定的列，
+        # 重新roll的手牌按展平后的下标取，cursor为每一轮下一手重新roll使用的位置
+        if blocks is None:
+            blocks = round_blocks(draw_count, enable_reroll, max_rerolls)
+        hand_uniforms, reroll_uniforms = self.rng.uniforms(character_index, first_round, size, blocks)
+        flat_rerolls = reroll_uniforms.ravel()
+        cursor = np.arange(size) * reroll_uniforms.shape[1]
+        hand_offsets = np.arange(3)
+
+        counts = np.tile(initial_counts, (size, 1))
+        style_count = (counts > 0).sum(axis=1)
+        remaining_rerolls = np.full(size, max_rerolls, dtype=np.int64)
+        main_values = np.zeros((size, draw_count + 1), dtype=np.int64)
+        rows = np.arange(size)
+        # 排序键与排列顺序随抽卡增量维护；只保留已拥有流派后，同值时改按名称排序
+        style_total = len(styles)
+        key_table, pool_table = self._key_table(weight_table, style_total)
+        columns = np.arange(style_total)
+        restrict_shift = weight_table.size * style_total + name_ranks - columns
+        sorted_keys = counts * style_total + columns + (style_count >= 3)[:, None] * restrict_shift
+        order = np.tile(columns, (size, 1))
+        self._sort_rows(sorted_keys, order, rows)
+        # 逐行取单个元素时使用展平后的下标
+        row_starts = rows * style_total
+        flat_counts, flat_keys, flat_order = counts.ravel(), sorted_keys.ravel(), order.ravel()
+        if main_index >= 0:
+            main_values[:, 0] = counts[:, main_index]
+        tilted = main_index >= 0 and (tilt is not None and tilt != 1.0 or main_share is not None)
+        if likelihood is not None:
+            likelihood.begin_chunk(size)
+        if trajectory is not None:
+            trajectory.begin_chunk(size, counts)
+
+        for draw in range(draw_count):
+            if trajectory is not None:
+                rerolls_before = remaining_rerolls.copy()
+            if tilted:
+                main_slot = order == main_index
+                weights = key_table[sorted_keys]
+                total = weights.sum(axis=1)
+                main_weight = (weights * main_slot).sum(axis=1)
+                # 每一轮主攻流派权重的倍数；总权重为0时卡池内等概率，不倾斜
+                row_tilt = np.ones(size)
+                valid = (total > 0) & (main_weight > 0)
+                if main_share is not None:
+                    # 把主攻流派单张卡的概率p提高到q：倍数为 q(1-p)/(p(1-q))
+                    probability = main_weight[valid] / total[valid]
+                    target = np.maximum(probability, main_share)
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        row_tilt[valid] = np.where(
+                            target < 1, target * (1 - probability) / (probability * (1 - target)), 1.0
+                        )
+                else:
+                    row_tilt[valid] = tilt
+                cumulative = self._cumulative_weights(
+                    sorted_keys, key_table, pool_table, np.where(main_slot, row_tilt[:, None], 1.0)
+                )
+                # 每张卡的对数似然比：主攻流派为 log(W'/(倍数*W))，其他流派为 log(W'/W)，
+                # W'、W分别为倾斜后与倾斜前的总权重
+                card_log = np.zeros(size)
+                card_log[valid] = np.log(cumulative[valid, -1] / total[valid])
+                main_log = np.log(row_tilt)
+            else:
+                cumulative = self._cumulative_weights(sorted_keys, key_table, pool_table)
+            positions = self._sample_positions(cumulative, hand_uniforms[:, 3 * draw:3 * draw + 3])
+            hands = np.take_along_axis(order, positions, axis=1)
+            if tilted and log_weights is not None:
+                log_weights += 3 * card_log - (hands == main_index).sum(axis=1) * main_log
+            if likelihood is not None:
+                # 卡池按排列顺序的属性值，以及抽到的卡牌的属性值（本次抽卡选择前）
+                likelihood.begin_draw(np.take_along_axis(counts, order, axis=1), pool_table[sorted_keys] > 0)
+                likelihood.add_hands(rows, np.take_along_axis(counts, hands, axis=1))
+
+            if main_index >= 0:
+                has_main_in_hand = (hands == main_index).any(axis=1)
+            else:
+                has_main_in_hand = np.zeros(size, dtype=bool)
+
+            if enable_reroll and main_index >= 0:
+                # 条件2在同一次抽卡内不会变化：已拿到主攻流派或目前还没凑齐三个流派
+                can_reroll = (counts[:, main_index] > 0) | (style_count < 3)
+                while True:
+                    # 条件1：三张卡牌全不是自身流派，且仍有剩余重新roll次数
+                    reroll_rows = np.flatnonzero(can_reroll & ~has_main_in_hand & (remaining_rerolls > 0))
+                    if reroll_rows.size == 0:
+                        break
+                    positions[reroll_rows] = self._sample_positions(
+                        cumulative[reroll_rows], flat_rerolls[cursor[reroll_rows, None] + hand_offsets]
+                    )
+                    hands[reroll_rows] = np.take_along_axis(order[reroll_rows], positions[reroll_rows], axis=1)
+                    if tilted and log_weights is not None:
+                        main_cards = (hands[reroll_rows] == main_index).sum(axis=1)
+                        log_weights[reroll_rows] += 3 * card_log[reroll_rows] - main_cards * main_log[reroll_rows]
+                    if likelihood is not None:
+                        likelihood.add_hands(
+                            reroll_rows, np.take_along_axis(counts[reroll_rows], hands[reroll_rows], axis=1)
+                        )
+                    cursor[reroll_rows] += 3
+                    remaining_rerolls[reroll_rows] -= 1
+                    self.instrument.count('rerolls', reroll_rows.size)
+                    has_main_in_hand[reroll_rows] = (hands[reroll_rows] == main_index).any(axis=1)
+
+            # 角色选择逻辑：优先选择和自身属性相同的流派，否则选择第一张
+            main_card = (hands == main_index).argmax(axis=1)
+            selected_position = np.where(has_main_in_hand, positions.ravel()[rows * 3 + main_card], positions[:, 0])
+            selected_index = row_starts + selected_position
+            count_index = row_starts + flat_order[selected_index]
+            flat_counts[count_index] += 1
+            new_style = flat_counts[count_index] == 1
+            style_count += new_style
+
+            # 只有被选中的流派排序键增大，与后一个位置比较即可知道顺序是否被打乱；
+            # 刚凑齐三个流派的轮整行改按名称排序
+            flat_keys[selected_index] += style_total
+            restricting = np.flatnonzero(new_style & (style_count == 3))
+            sorted_keys[restricting] += restrict_shift[order[restricting]]
+            next_index = row_starts + np.minimum(selected_position + 1, style_total - 1)
+            unsorted = flat_keys[selected_index] > flat_keys[next_index]
+            unsorted[restricting] = True
+            self._sort_rows(sorted_keys, order, np.flatnonzero(unsorted))
+
+            if main_index >= 0:
+                main_values[:, draw + 1] = counts[:, main_index]
+            if trajectory is not None:
+                trajectory.record_draw(draw, counts, hands, rerolls_before - remaining_rerolls)
+
+        return main_values, counts
+
+    def iter_chunks(self, character, draw_count, rounds, enable_reroll=True, max_rerolls=2, character_index=0,
+                    first_round=0):
+        """
+        按固定块大小依次模拟全部轮次
+
+        Args:
+            character: Character类实例
+            draw_count: 每轮抽卡次数
+            rounds: 模拟总轮数
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            character_index: 角色下标，默认0
+            first_round: 第一轮的轮次，默认0
+
+        Yields:
+            tuple: simulate_chunk的返回值
+        """
+        done = 0
+        while done < rounds:
+            size = min(self.chunk_size, rounds - done)
+            yield self.simulate_chunk(
+                character, size, draw_count, enable_reroll, max_rerolls, character_index, first_round + done
+            )
+            done += size
+
+    def simulate_population(self, character, draw_count, rounds, enable_reroll=True, max_rerolls=2,
+                            character_index=0, first_round=0):
+        """
+        模拟全部轮次，把每轮结束时的状态保存为紧凑的角色群体
+
+        Args:
+            character: Character类实例
+            draw_count: 每轮抽卡次数
+            rounds: 模拟总轮数
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            character_index: 角色下标，默认0
+            first_round: 第一轮的轮次，默认0
+
+        Returns:
+            CharacterPopulation: 每行为一轮结束时的属性值
+        """
+        population = CharacterPopulation(character.attribute, character.get_level(), character.get_havetool(), rounds)
+        done = 0
+        for _, counts in self.iter_chunks(
+            character, draw_count, rounds, enable_reroll, max_rerolls, character_index, first_round
+        ):
+            population.counts[done:done + counts.shape[0]] = counts
+            done += counts.shape[0]
+        return population
+
+    def fill_character_stats(self, characters, character_stats, draw_count, rounds, enable_reroll=True, max_rerolls=2,
+                             final_states=None, first_round=0):
+        """
+        模拟所有角色并累加到character_stats直方图中
+
+        Args:
+            characters: 角色列表
+            character_stats: 直方图 (角色数, draw_count+1, 属性值个数)，见histogram.empty_histogram
+            draw_count: 每轮抽卡次数
+            rounds: 模拟轮数
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            final_states: 传入列表时，为每个角色追加 (流派列表, 最终属性值矩阵 (轮数, 流派数))，默认None
+            first_round: 第一轮的轮次，默认0
+        """
+        total = rounds * len(characters)
+        for i, character in enumerate(characters):
+            if final_states is not None:
+                population = CharacterPopulation(
+                    character.attribute, character.get_level(), character.get_havetool(), rounds
+                )
+            done = 0
+            for main_values, counts in self.iter_chunks(
+                character, draw_count, rounds, enable_reroll, max_rerolls, i, first_round
+            ):
+                if final_states is not None:
+                    # 直接写入预先分配的int16矩阵，不保留每块的int64结果
+                    population.counts[done:done + counts.shape[0]] = counts
+                done += main_values.shape[0]
+                self.instrument.progress('simulation', i * rounds + done, total)
+                add_main_values(character_stats, i, main_values)
+
+            if final_states is not None:
+                final_states.append((population.get_style_names(), population.counts))
@@ -0,0 +1,284 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+"""
+性能基准测试
+
+功能说明：
+- 测量权重计算、单次抽卡、完整模拟+Excel生成（多种规模）与单独报告生成的吞吐量
+- 测量命令行启动与导入simulator模块的用时（独立的Python进程）
+- 每个基准重复若干次取最快的一次，减少系统噪声
+- 结果可保存为基线JSON；之后的运行与基线比较，吞吐量下降超过容忍度时以非0状态退出
+
+用法示例：
+    python benchmark.py --save-baseline          # 记录基线到 benchmark_baseline.json
+    python benchmark.py                          # 与基线比较，默认容忍度20%
+    python benchmark.py --quick --tolerance 0.3
+"""
+
+# 默认基线文件
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# 默认吞吐量下降容忍度
+DEFAULT_TOLERANCE = 0.2
+
+
+def _best_time(function, repeat):
+    """
+    重复执行并返回最短用时
+
+    Args:
+        function: 无参数函数
+        repeat: 重复次数
+
+    Returns:
+        float: 最短用时（秒）
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_weight(iterations, repeat):
+    """
+    测量ProDistribution.get_current_weight
+
+    Returns:
+        dict: 吞吐量指标
+    """
+    from ProDistribution import ProDistribution
+    from character import Character
+
+    pro_distribution = ProDistribution()
+    character = Character("熔岩球", 35, havetool=True)
+    character.bind_distribution(pro_distribution)
+    styles = list(character.attribute_values.keys())
+
+    def run():
+        # 每次改变一个流派的属性值，使签名变化，兼顾缓存命中与未命中
+        for i in range(iterations):
+            if i % 16 == 0:
+                character.reset_all_attributes()
+            character.increase_attribute_value(styles[i % len(styles)], 1)
+            pro_distribution.get_current_weight(character)
+
+    seconds = _best_time(run, repeat)
+    return {'seconds': seconds, 'weights_per_sec': iterations / seconds}
+
+
+def bench_single_draw(iterations, repeat):
+    """
+    测量Simulator._perform_single_draw（含重新roll与属性值更新）
+
+    Returns:
+        dict: 吞吐量指标
+    """
+    from simulator import Simulator
+
+    simulator = Simulator(seed=0)
+    character = simulator.characters[-1]
+
+    def run():
+        remaining_rerolls = 2
+        for i in range(iterations):
+            if i % 15 == 0:
+                character.reset_all_attributes()
+                remaining_rerolls = 2
+            selected_style, _, _, _, remaining_rerolls = simulator._perform_single_draw(
+                character, True, remaining_rerolls
+            )
+            character.increase_attribute_value(selected_style, 1)
+
+    seconds = _best_time(run, repeat)
+    return {'seconds': seconds, 'draws_per_sec': iterations / seconds}
+
+
+def bench_full_run(rounds, draw_count, engine, repeat):
+    """
+    测量完整的simulate_and_generate_excel（在临时目录中生成文件）
+
+    Returns:
+        dict: 吞吐量指标
+    """
+    from simulator import Simulator
+
+    simulator = Simulator()
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulator.simulate_and_generate_excel(draw_count=draw_count, rounds=rounds, engine=engine)
+
+    seconds = _in_temp_dir(lambda: _best_time(run, repeat))
+    draws = rounds * draw_count * len(simulator.characters)
+    return {'seconds': seconds, 'draws_per_sec': draws / seconds}
+
+
+def bench_report(rounds, draw_count, repeat):
+    """
+    单独测量Simulator._generate_excel_files（统计数据预先由批量引擎生成）
+
+    Returns:
+        dict: 吞吐量指标
+    """
+    import numpy as np
+    from simulator import Simulator
+
+    simulator = Simulator()
+    character_stats = simulator.collect_character_stats(draw_count, rounds, engine='batch', seed=0)
+
+    # 数据单元格数量：每个等级表中每个块的每个属性值一行，每次抽卡一列
+    cells = 0
+    for level in {character.get_level() for character in simulator.characters}:
+        indices = [i for i, character in enumerate(simulator.characters) if character.get_level() == level]
+        values = np.flatnonzero(character_stats[indices].any(axis=(0, 1)))
+        blocks = len({simulator.characters[i].get_havetool() for i in indices})
+        cells += blocks * values.size * (draw_count + 1)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulator._generate_excel_files(character_stats, draw_count, rounds)
+
+    seconds = _in_temp_dir(lambda: _best_time(run, repeat))
+    return {'seconds': seconds, 'cells_per_sec': cells / seconds}
+
+
+def bench_startup(code, repeat):
+    """
+    在新的Python进程中测量启动与导入用时
+
+    Args:
+        code: 传给 python -c 的代码
+        repeat: 重复次数
+
+    Returns:
+        dict: 每秒可启动的次数
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, '-c', code]
+    seconds = _best_time(lambda: subprocess.run(command, cwd=directory, check=True, capture_output=True), repeat)
+    return {'seconds': seconds, 'starts_per_sec': 1 / seconds}
+
+
+def _in_temp_dir(function):
+    """在临时目录中执行函数，避免覆盖当前目录下的结果文件"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            return function()
+        finally:
+            os.chdir(cwd)
+
+
+def run_benchmarks(quick=False, repeat=3):
+    """
+    运行全部基准
+
+    Args:
+        quick: 是否使用较小的规模，默认False
+        repeat: 每个基准的重复次数，默认3
+
+    Returns:
+        dict: 基准名 -> 指标字典
+    """
+    scale = 1 if quick else 5
+    results = {
+        'startup_cli': bench_startup("import cli; cli.build_parser()", repeat),
+        # 导入simulator不应加载openpyxl（只在生成Excel时导入）
+        'startup_simulator': bench_startup("import sys, simulator; assert 'openpyxl' not in sys.modules", repeat),
+        'weight': bench_weight(2000 * scale, repeat),
+        'single_draw': bench_single_draw(2000 * scale, repeat),
+        'report': bench_report(1000, 20, repeat),
+    }
+    for rounds in (20 * scale, 100 * scale):
+        results[f'full_run_scalar_{rounds}'] = bench_full_run(rounds, 15, 'scalar', repeat)
+    for rounds in (2000 * scale, 20000 * scale):
+        results[f'full_run_batch_{rounds}'] = bench_full_run(rounds, 15, 'batch', repeat)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基线比较吞吐量（所有以_per_sec结尾的指标）
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        tolerance: 允许的吞吐量下降比例
+
+    Returns:
+        list: 回退项 [(基准名, 指标名, 基线值, 本次值), ...]
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            if not metric.endswith('_per_sec'):
+                continue
+            base = baseline.get(name, {}).get(metric)
+            if base is not None and value < base * (1 - tolerance):
+                regressions.append((name, metric, base, value))
+    return regressions
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="抽卡模拟性能基准测试")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线JSON文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="允许的吞吐量下降比例")
+    parser.add_argument('--quick', action='store_true', help="使用较小的规模")
+    parser.add_argument('--repeat', type=int, default=3, help="每个基准的重复次数")
+    parser.add_argument('--output', help="把本次结果另存为JSON")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.quick, args.repeat)
+    for name, metrics in results.items():
+        summary = ", ".join(f"{metric}={value:,.1f}" for metric, value in metrics.items() if metric != 'seconds')
+        print(f"{name:28s} {metrics['seconds']:8.3f}s  {summary}")
+
+    document = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': args.quick,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2)
+        print(f"基线已保存: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"基线文件 {args.baseline} 不存在，使用 --save-baseline 记录基线")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    if baseline.get('quick') != args.quick:
+        print("警告：基线与本次运行的规模不同（--quick），结果不可比较")
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for name, metric, base, value in regressions:
+        print(f"性能回退: {name}.{metric} {base:,.1f} -> {value:,.1f} ({value / base - 1:+.1%})")
+    if regressions:
+        return 1
+    print(f"未发现超过{args.tolerance:.0%}的性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import json
+import os
+import zipfile
+from artifact import SimulationArtifact
+
+"""
+磁盘结果缓存
+
+功能说明：
+- 以内容寻址的方式缓存模拟结果（SimulationArtifact，.npz格式）
+- 缓存键为完整模拟配置加上引擎版本号的sha256
+- 按文件大小做LRU淘汰：每次命中刷新修改时间，超出容量时删除最久未使用的结果
+- 只有可复现的运行（给定种子或精确求解）才会被缓存
+- 提供命令行工具查看与清除缓存：python cache.py info / python cache.py invalidate [键 ...]
+"""
+
+# 引擎版本号，模拟逻辑或结果格式变化时递增，使旧缓存全部失效
+ENGINE_VERSION = 3
+
+# 默认缓存目录与容量
+DEFAULT_CACHE_DIR = ".simulation_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def config_key(config):
+    """
+    计算模拟配置的缓存键
+
+    Args:
+        config: 可JSON序列化的配置字典
+
+    Returns:
+        str: 十六进制sha256
+    """
+    payload = json.dumps(dict(config, engine_version=ENGINE_VERSION), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def is_cacheable(config):
+    """
+    判断配置对应的运行是否可复现（可以缓存）
+
+    Args:
+        config: 配置字典，需包含'engine'与'seed'，可选'precision'
+
+    Returns:
+        bool: 是否可以缓存
+    """
+    # 有时间预算的自适应模拟，轮数取决于运行速度
+    precision = config.get('precision')
+    if precision is not None and precision['time_budget'] is not None:
+        return False
+    return config['engine'] == 'exact' or config['seed'] is not None
+
+
+class ResultCache:
+    """内容寻址的模拟结果缓存"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        初始化缓存
+
+        Args:
+            directory: 缓存目录，默认".simulation_cache"
+            max_bytes: 缓存总大小上限（字节），默认512MB
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        """获取缓存键对应的文件路径"""
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def _entries(self):
+        """
+        列出缓存中的所有结果
+
+        Returns:
+            list: [(最后使用时间, 文件大小, 缓存键), ...]
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            # 以'.'开头的是正在写入的临时文件
+            if name.startswith('.') or not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-len('.npz')]))
+        return entries
+
+    def get(self, key):
+        """
+        读取缓存的结果，命中时刷新其最后使用时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            SimulationArtifact: 缓存的结果，未命中时为None
+        """
+        path = self._path(key)
+        try:
+            artifact = SimulationArtifact.load(path)
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # 文件不存在、已被其他进程淘汰或已损坏，都视为未命中
+            self.misses += 1
+            return None
+        self.hits += 1
+        return artifact
+
+    def put(self, key, artifact):
+        """
+        写入结果并按容量淘汰
+
+        Args:
+            key: 缓存键
+            artifact: SimulationArtifact实例
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        # 先写临时文件再原子替换，避免并发读取到不完整的结果
+        temp_path = os.path.join(self.directory, f".{key}.{os.getpid()}.npz")
+        artifact.save(temp_path)
+        os.replace(temp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """
+        删除最久未使用的结果，直到总大小不超过上限
+
+        Returns:
+            int: 删除的结果数量
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if self.invalidate(key):
+                removed += 1
+            total -= size
+        return removed
+
+    def invalidate(self, key=None):
+        """
+        删除指定结果，key为None时清空缓存
+
+        Args:
+            key: 缓存键，默认None
+
+        Returns:
+            int: 删除的结果数量
+        """
+        keys = [key] if key is not None else [entry_key for _, _, entry_key in self._entries()]
+        removed = 0
+        for entry_key in keys:
+            try:
+                os.remove(self._path(entry_key))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def info(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 目录、结果数量、总大小、容量上限与本实例的命中统计
+        """
+        entries = self._entries()
+        return {
+            'directory': self.directory,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="模拟结果缓存管理")
+    parser.add_argument('--dir', default=DEFAULT_CACHE_DIR, help="缓存目录")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('info', help="查看缓存统计信息")
+    invalidate_parser = subparsers.add_parser('invalidate', help="删除指定缓存键的结果，不指定时清空缓存")
+    invalidate_parser.add_argument('keys', nargs='*')
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.dir)
+    if args.command == 'info':
+        for name, value in cache.info().items():
+            print(f"{name}: {value}")
+    else:
+        if args.keys:
+            removed = sum(cache.invalidate(key) for key in args.keys)
+        else:
+            removed = cache.invalidate()
+        print(f"已删除{removed}个缓存结果")
+
+
+if __name__ == "__main__":
+    main()
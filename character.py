@@ -1,4 +1,6 @@
-from type import Style
+from bisect import bisect_left, insort
+import numpy as np
+from type import SkillCatalog, Style
 
 class Character:
     def __init__(self, attribute, level=1, havetool=False):
@@ -14,6 +16,12 @@ class Character:
         self.level = level
         self.havetool = havetool
         
+        # 绑定的概率分布，用于增量维护权重之和
+        self.pro_distribution = None
+        
+        # 挂接的流派抽样器（如StyleSampler），属性值变化时同步更新
+        self.sampler = None
+        
         # 创建流派实例
         self.style = Style("默认流派")
         
@@ -35,12 +43,169 @@ class Character:
             else:
                 self.attribute_values[style] = 0
         
-        # 计算流派拥有数量
-        self._update_style_count()
+        # 重新计算流派拥有数量等增量维护的状态
+        self._rebuild_running_state()
+    
+    def _rebuild_running_state(self):
+        """全量重建增量维护的状态（仅在初始化或重置时调用）"""
+        # 已拥有的流派集合及流派拥有数量
+        self.owned_styles = {style for style, value in self.attribute_values.items() if value > 0}
+        self.style_count = len(self.owned_styles)
+        
+        # 属性值多重集 {属性值: 流派数量}，用于按属性值计算权重
+        self.value_counts = {}
+        for value in self.attribute_values.values():
+            self.value_counts[value] = self.value_counts.get(value, 0) + 1
+        
+        # 属性值升序列表，与属性值多重集一一对应，属性值变化时用二分查找增量调整，直接作为规范状态签名
+        self._sorted_values = sorted(self.attribute_values.values())
+        
+        # 流派的排序序号：全部流派同值时按字典插入顺序，只保留已拥有流派时同值按名称
+        styles = tuple(self.attribute_values)
+        if styles != getattr(self, '_ranked_styles', None):
+            self._ranked_styles = styles
+            self._style_ranks = {style: rank for rank, style in enumerate(styles)}
+            self._name_ranks = {style: rank for rank, style in enumerate(sorted(styles))}
+        
+        # 卡池顺序在首次使用时建立，之后随属性值变化增量调整
+        self._order_restricted = None
+        
+        # 已拥有流派的权重之和（需绑定概率分布）
+        self.owned_weight = 0.0
+        if self.pro_distribution is not None:
+            for style in self.owned_styles:
+                self.owned_weight += self.pro_distribution.get_style_weight(style, self.attribute_values[style])
+        
+        if self.sampler is not None:
+            self.sampler.rebuild()
+    
+    def _on_value_changed(self, attribute_name, old_value, new_value):
+        """
+        单个属性值变化后增量更新流派拥有数量、已拥有流派集合、属性值多重集、卡池顺序及权重之和
+        
+        Args:
+            attribute_name: 属性名称
+            old_value: 变化前的数值
+            new_value: 变化后的数值
+        """
+        if old_value == new_value:
+            return
+        
+        # 更新属性值多重集
+        self.value_counts[old_value] -= 1
+        if self.value_counts[old_value] == 0:
+            del self.value_counts[old_value]
+        self.value_counts[new_value] = self.value_counts.get(new_value, 0) + 1
+        
+        # 更新属性值升序列表
+        sorted_values = self._sorted_values
+        del sorted_values[bisect_left(sorted_values, old_value)]
+        insort(sorted_values, new_value)
+        
+        # 更新已拥有流派集合及流派拥有数量
+        if old_value > 0 and new_value <= 0:
+            self.owned_styles.discard(attribute_name)
+        elif old_value <= 0 and new_value > 0:
+            self.owned_styles.add(attribute_name)
+        self.style_count = len(self.owned_styles)
+        
+        # 调整卡池顺序：用二分查找删除旧的排序键，再按新的属性值插入
+        restricted = self._order_restricted
+        if restricted is not None:
+            keys = self._order_keys
+            width = len(self._ranked_styles)
+            if restricted:
+                rank = self._name_ranks[attribute_name]
+            else:
+                rank = self._style_ranks[attribute_name]
+            if not restricted or old_value > 0:
+                index = bisect_left(keys, old_value * width + rank)
+                del keys[index]
+                del self._order[index]
+            if not restricted or new_value > 0:
+                key = new_value * width + rank
+                index = bisect_left(keys, key)
+                keys.insert(index, key)
+                self._order.insert(index, attribute_name)
+        
+        # 更新已拥有流派的权重之和
+        if self.pro_distribution is not None:
+            if old_value > 0:
+                self.owned_weight -= self.pro_distribution.get_style_weight(attribute_name, old_value)
+            if new_value > 0:
+                self.owned_weight += self.pro_distribution.get_style_weight(attribute_name, new_value)
+        
+        if self.sampler is not None:
+            self.sampler.on_value_changed(attribute_name, new_value)
+    
+    def get_pool_order(self):
+        """
+        获取当前卡池中按属性值升序排列的流派列表
+        
+        列表在首次使用或卡池是否只保留已拥有流派发生变化时排序建立一次，之后随属性值变化增量调整，
+        排序键为 属性值*流派数+排序序号
+        
+        Returns:
+            list: 流派拥有数量>=3时为已拥有流派（同值按名称），否则为全部流派（同值按流派顺序）；
+                  返回的是内部列表，调用方不得修改
+        """
+        restricted = self.style_count >= 3
+        if restricted != self._order_restricted:
+            width = len(self._ranked_styles)
+            ranks = self._name_ranks if restricted else self._style_ranks
+            entries = sorted(
+                (value * width + ranks[style], style)
+                for style, value in self.attribute_values.items()
+                if not restricted or value > 0
+            )
+            self._order_keys = [key for key, _ in entries]
+            self._order = [style for _, style in entries]
+            self._order_restricted = restricted
+        return self._order
+    
+    def bind_distribution(self, pro_distribution):
+        """
+        绑定概率分布，之后权重之和随属性值变化增量维护
+        
+        修改概率分布的initial_value或ratio后需要重新绑定
+        
+        Args:
+            pro_distribution: ProDistribution实例
+        """
+        self.pro_distribution = pro_distribution
+        self._rebuild_running_state()
+    
+    def attach_sampler(self, sampler):
+        """
+        挂接流派抽样器，之后属性值变化会通知抽样器增量更新
+        
+        Args:
+            sampler: 提供rebuild()与on_value_changed()方法的抽样器，None表示取消挂接
+        """
+        self.sampler = sampler
+    
+    def get_total_weight(self):
+        """
+        获取当前卡池的权重之和（需绑定概率分布）
+        
+        Returns:
+            float: 卡池内所有流派的权重之和，流派拥有数量>=3时只计算已拥有的流派
+        """
+        if self.pro_distribution is None:
+            raise ValueError("角色尚未绑定概率分布")
+        if self.style_count >= 3:
+            return self.owned_weight
+        unowned_count = len(self.attribute_values) - self.style_count
+        return self.owned_weight + unowned_count * self.pro_distribution.initial_value
     
-    def _update_style_count(self):
-        """更新流派拥有数量"""
-        self.style_count = sum(1 for value in self.attribute_values.values() if value > 0)
+    def get_value_signature(self):
+        """
+        获取属性值多重集的规范元组
+        
+        Returns:
+            tuple: 所有流派的属性值，按升序排列（增量维护，无需排序）
+        """
+        return tuple(self._sorted_values)
 
     def get_attribute_value(self, attribute_name):
         """
@@ -63,9 +228,10 @@ class Character:
             value: 要设置的数值（整数）
         """
         if attribute_name in self.attribute_values:
+            old_value = self.attribute_values[attribute_name]
             self.attribute_values[attribute_name] = value
-            # 更新流派拥有数量
-            self._update_style_count()
+            # 增量更新流派拥有数量
+            self._on_value_changed(attribute_name, old_value, value)
         else:
             raise ValueError(f"属性名称 '{attribute_name}' 不存在")
     
@@ -78,9 +244,10 @@ class Character:
             increment: 增加的数值，默认为1
         """
         if attribute_name in self.attribute_values:
-            self.attribute_values[attribute_name] += increment
-            # 更新流派拥有数量
-            self._update_style_count()
+            old_value = self.attribute_values[attribute_name]
+            self.attribute_values[attribute_name] = old_value + increment
+            # 增量更新流派拥有数量
+            self._on_value_changed(attribute_name, old_value, old_value + increment)
         else:
             raise ValueError(f"属性名称 '{attribute_name}' 不存在")
     
@@ -199,4 +366,143 @@ class Character:
                 self.level == other.level and 
                 self.havetool == other.havetool and
                 self.style_count == other.style_count and
-                self.attribute_values == other.attribute_values)
\ No newline at end of file
+                self.attribute_values == other.attribute_values)
+
+
+class CharacterPopulation:
+    """
+    角色群体 - 紧凑保存大量同规格角色的状态（每行一个角色）
+    
+    使用__slots__，技能名称驻留为共享SkillCatalog中的整数ID，属性值保存在int16矩阵中，
+    每个角色只占 流派数*2 字节；同等级的群体共享同一份技能ID元组，技能名称只在生成报告时翻译回来
+    """
+    
+    __slots__ = ('catalog', 'attribute', 'level', 'havetool', 'skill_ids', 'slot_map', 'counts')
+    
+    def __init__(self, attribute, level=1, havetool=False, size=0, catalog=None):
+        """
+        初始化群体，所有角色处于初始状态
+        
+        Args:
+            attribute: 角色属性（技能名称）
+            level: 角色等级，默认为1
+            havetool: 是否拥有工具，默认为False
+            size: 角色数量，默认为0
+            catalog: 技能目录，默认为SkillCatalog.default()
+        """
+        self.catalog = catalog if catalog is not None else SkillCatalog.default()
+        self.attribute = attribute
+        self.level = level
+        self.havetool = havetool
+        self.skill_ids = self.catalog.get_ids_below_level(level + 1)
+        self.slot_map = self.catalog.get_slot_map(level + 1)
+        
+        # 如果havetool为True，且角色自身的属性在卡池中，则初始值为1
+        self.counts = np.zeros((size, len(self.skill_ids)), dtype=np.int16)
+        main_slot = self.slot_map.get(self.catalog.ids.get(attribute))
+        if havetool and main_slot is not None:
+            self.counts[:, main_slot] = 1
+    
+    @classmethod
+    def from_counts(cls, character, counts, catalog=None):
+        """
+        由属性值矩阵创建群体
+        
+        Args:
+            character: Character类实例，提供属性、等级与havetool
+            counts: 属性值矩阵 (角色数, 流派数)，列顺序与character.attribute_values一致
+            catalog: 技能目录，默认为SkillCatalog.default()
+            
+        Returns:
+            CharacterPopulation: 群体（counts转换为int16，已是int16时不复制）
+        """
+        population = cls(character.attribute, character.get_level(), character.get_havetool(), 0, catalog)
+        counts = np.asarray(counts, dtype=np.int16)
+        if counts.ndim != 2 or counts.shape[1] != len(population.skill_ids):
+            raise ValueError(f"属性值矩阵的形状 '{counts.shape}' 与 {len(population.skill_ids)} 个流派不符")
+        population.counts = counts
+        return population
+    
+    @property
+    def nbytes(self):
+        """属性值矩阵占用的字节数"""
+        return self.counts.nbytes
+    
+    def __len__(self):
+        return self.counts.shape[0]
+    
+    def get_style_names(self):
+        """
+        获取属性值矩阵各列对应的流派名称（技能ID翻译回名称）
+        
+        Returns:
+            list: 流派名称列表，顺序与Character.attribute_values一致
+        """
+        return [self.catalog.get_name(skill_id) for skill_id in self.skill_ids]
+    
+    def get_slot(self, attribute_name):
+        """
+        获取属性名称在属性值矩阵中的列
+        
+        Args:
+            attribute_name: 属性名称（字符串）
+            
+        Returns:
+            int: 列下标
+        """
+        slot = self.slot_map.get(self.catalog.get_id(attribute_name))
+        if slot is None:
+            raise ValueError(f"属性名称 '{attribute_name}' 不存在")
+        return slot
+    
+    def get_attribute_values(self, attribute_name):
+        """
+        获取所有角色指定属性的数值
+        
+        Args:
+            attribute_name: 属性名称（字符串）
+            
+        Returns:
+            ndarray: 属性数值 (角色数,)，为属性值矩阵的视图
+        """
+        return self.counts[:, self.get_slot(attribute_name)]
+    
+    def get_style_counts(self):
+        """
+        获取每个角色的流派拥有数量
+        
+        Returns:
+            ndarray: 属性值大于0的流派数量 (角色数,)
+        """
+        return (self.counts > 0).sum(axis=1)
+    
+    def store(self, row, character):
+        """
+        把角色当前的属性值写入指定行
+        
+        Args:
+            row: 行下标
+            character: 与群体规格相同的Character类实例
+        """
+        self.counts[row] = list(character.attribute_values.values())
+    
+    def to_character(self, row):
+        """
+        把指定行转换为Character实例（用于报告或与原有接口交互）
+        
+        Args:
+            row: 行下标
+            
+        Returns:
+            Character: 属性值相同的角色
+        """
+        character = Character(self.attribute, self.level, self.havetool)
+        for attribute_name, value in zip(self.get_style_names(), self.counts[row].tolist()):
+            character.set_attribute_value(attribute_name, value)
+        return character
+    
+    def __str__(self):
+        return f"CharacterPopulation(attribute={self.attribute}, level={self.level}, havetool={self.havetool}, size={len(self)})"
+    
+    def __repr__(self):
+        return self.__str__()
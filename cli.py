@@ -0,0 +1,282 @@
+import argparse
+import sys
+
+"""
+命令行入口
+
+功能说明：
+- 子命令：simulate（模拟并生成报告/结果文件）、ratio（统计达标比例）、
+  report（由已保存的结果渲染Excel）、replay（重放并追踪某一轮）、sweep（参数扫描）、
+  compare（公共随机数配置对比）、importance（重要性抽样估计稀有事件概率）、
+  reweight（似然比重新加权估计附近ratio下的结果）、trajectory（逐轮轨迹的记录与事后查询）
+- 模块只在对应子命令内导入；openpyxl只在需要生成Excel时导入，启动开销最小
+
+用法示例：
+    python cli.py simulate --draw-count 20 --rounds 100000 --engine batch --seed 1 --artifact run.npz
+    python cli.py ratio --draw-count 15 --threshold 7 --half-width 0.01
+    python cli.py ratio --engine qmc --rounds 16384 --replicates 8
+    python cli.py report run.npz --output run.xlsx
+    python cli.py replay --artifact run.npz --character 5 --round 1234
+    python cli.py sweep --ratio 0.5 0.6 --draw-count 12 15 20 --rounds 10000
+    python cli.py compare --variant ratio=0.6 --variant ratio=0.7 --rounds 20000 --antithetic
+    python cli.py importance --event above --threshold 12 --character 4 --rounds 100000
+    python cli.py reweight --ratio 0.6 --target 0.58 0.62 --rounds 100000 --seed 1
+    python cli.py reweight --from reweight_run.npz --target 0.57 0.63
+    python cli.py trajectory record --dir trajectories --rounds 10000000 --seed 1 --character 0
+    python cli.py trajectory query --dir trajectories --metric style_count@10 --where main@5==0
+"""
+
+
+def _add_run_arguments(parser):
+    """添加simulate与ratio共用的模拟参数"""
+    parser.add_argument('--draw-count', type=int, default=15, help="每轮抽卡次数")
+    parser.add_argument('--rounds', type=int, default=1000, help="模拟轮数")
+    parser.add_argument('--no-reroll', action='store_true', help="禁用重新roll")
+    parser.add_argument('--max-rerolls', type=int, default=2, help="一轮最大重新roll次数")
+    parser.add_argument('--initial-value', type=float, default=500, help="概率分布初始值")
+    parser.add_argument('--ratio', type=float, default=0.6, help="概率分布衰减比例")
+    parser.add_argument('--sampler', default='cumulative', choices=['cumulative', 'fenwick'], help="逐轮模拟的抽样方式")
+    parser.add_argument('--workers', type=int, default=1, help="并行进程数")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子")
+    parser.add_argument('--half-width', type=float, default=None, help="自适应模拟的置信区间半宽目标")
+    parser.add_argument('--confidence', type=float, default=0.95, help="自适应模拟的置信水平")
+    parser.add_argument('--time-budget', type=float, default=None, help="自适应模拟的时间预算（秒）")
+    parser.add_argument('--max-rounds', type=int, default=None, help="自适应模拟的轮数上限")
+    parser.add_argument('--instrument', default=None, help="把插桩汇总导出为JSON文件")
+    parser.add_argument('--replicates', type=int, default=8, help="qmc引擎独立打乱的重复数（估计标准误）")
+
+
+def build_parser():
+    """
+    构造命令行参数解析器
+
+    Returns:
+        argparse.ArgumentParser: 参数解析器
+    """
+    parser = argparse.ArgumentParser(description="Rougelike抽卡模拟")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    simulate_parser = subparsers.add_parser('simulate', help="模拟多轮抽卡并生成Excel报告或结果文件")
+    _add_run_arguments(simulate_parser)
+    simulate_parser.add_argument('--engine', default='scalar', choices=['scalar', 'batch', 'qmc', 'exact'], help="模拟引擎")
+    simulate_parser.add_argument('--artifact', default=None, help="保存列式结果（.npz 或 .parquet）")
+    simulate_parser.add_argument('--final-states', action='store_true', help="在结果中保存每轮最终属性值")
+    simulate_parser.add_argument('--no-excel', action='store_true', help="不生成Excel报告")
+    simulate_parser.add_argument('--write-only', action='store_true', help="以流式模式写出Excel")
+    simulate_parser.add_argument('--cache-dir', default=None, help="结果缓存目录")
+
+    ratio_parser = subparsers.add_parser('ratio', help="统计主攻流派属性值大于阈值的比例")
+    _add_run_arguments(ratio_parser)
+    ratio_parser.add_argument('--engine', default='scalar', choices=['scalar', 'batch', 'qmc'], help="模拟引擎")
+    ratio_parser.add_argument('--threshold', type=int, default=7, help="阈值")
+
+    report_parser = subparsers.add_parser('report', help="由已保存的结果渲染Excel报告")
+    report_parser.add_argument('artifact', help="结果文件（.npz 或 .parquet）")
+    report_parser.add_argument('--output', default="simulation_results.xlsx", help="输出文件名")
+    report_parser.add_argument('--write-only', action='store_true', help="以流式模式写出Excel")
+
+    replay_parser = subparsers.add_parser('replay', help="单独重放某次运行中的一轮并逐次追踪")
+    replay_parser.add_argument('--character', type=int, required=True, help="角色下标")
+    replay_parser.add_argument('--round', type=int, required=True, help="轮次（从0开始）")
+    replay_parser.add_argument('--artifact', default=None, help="从结果文件读取种子与模拟参数（覆盖下列参数）")
+    replay_parser.add_argument('--seed', type=int, default=None, help="该次运行的随机种子")
+    replay_parser.add_argument('--draw-count', type=int, default=15, help="每轮抽卡次数")
+    replay_parser.add_argument('--no-reroll', action='store_true', help="禁用重新roll")
+    replay_parser.add_argument('--max-rerolls', type=int, default=2, help="一轮最大重新roll次数")
+    replay_parser.add_argument('--initial-value', type=float, default=500, help="概率分布初始值")
+    replay_parser.add_argument('--ratio', type=float, default=0.6, help="概率分布衰减比例")
+    replay_parser.add_argument('--sampler', default='cumulative', choices=['cumulative', 'fenwick'], help="抽样方式")
+    replay_parser.add_argument('--render', default='text', choices=['text', 'json', 'table'], help="输出方式")
+
+    # sweep的参数原样交给sweep.main解析
+    subparsers.add_parser('sweep', help="参数扫描（参数同 python sweep.py）", add_help=False)
+    # compare的参数原样交给compare.main解析
+    subparsers.add_parser('compare', help="公共随机数配置对比（参数同 python compare.py）", add_help=False)
+    # importance的参数原样交给importance.main解析
+    subparsers.add_parser('importance', help="重要性抽样估计稀有事件概率（参数同 python importance.py）", add_help=False)
+    # reweight的参数原样交给reweight.main解析
+    subparsers.add_parser('reweight', help="似然比重新加权估计附近ratio下的结果（参数同 python reweight.py）", add_help=False)
+    # trajectory的参数原样交给trajectory.main解析
+    subparsers.add_parser('trajectory', help="逐轮轨迹的记录与事后查询（参数同 python trajectory.py）", add_help=False)
+    return parser
+
+
+def _build_simulator(args):
+    """
+    按命令行参数构造模拟器
+
+    Returns:
+        tuple: (Simulator, Instrument或None)
+    """
+    from simulator import Simulator
+    from ProDistribution import ProDistribution
+
+    instrument = None
+    if args.instrument:
+        from instrument import Instrument
+        instrument = Instrument()
+    simulator = Simulator(
+        ProDistribution(args.initial_value, args.ratio), sampler=args.sampler, instrument=instrument
+    )
+    return simulator, instrument
+
+
+def _build_precision(args):
+    """按命令行参数构造精度目标，未指定自适应参数时返回None"""
+    if args.half_width is None and args.time_budget is None:
+        return None
+    from adaptive import PrecisionTarget
+
+    return PrecisionTarget(
+        half_width=args.half_width if args.half_width is not None else 0.01,
+        confidence=args.confidence,
+        time_budget=args.time_budget,
+        max_rounds=args.max_rounds,
+    )
+
+
+def run_simulate(args):
+    """simulate子命令"""
+    simulator, instrument = _build_simulator(args)
+    cache = None
+    if args.cache_dir:
+        from cache import ResultCache
+        cache = ResultCache(args.cache_dir)
+
+    simulator.simulate_and_generate_excel(
+        draw_count=args.draw_count, rounds=args.rounds, enable_reroll=not args.no_reroll,
+        max_rerolls=args.max_rerolls, engine=args.engine, workers=args.workers, seed=args.seed,
+        write_only=args.write_only, artifact=args.artifact, final_states=args.final_states,
+        excel=not args.no_excel, cache=cache, precision=_build_precision(args), replicates=args.replicates
+    )
+    if instrument is not None:
+        instrument.save(args.instrument)
+    return 0
+
+
+def run_ratio(args):
+    """ratio子命令"""
+    simulator, instrument = _build_simulator(args)
+    simulator.simulate_attribute_value_ratio(
+        draw_count=args.draw_count, rounds=args.rounds, threshold=args.threshold,
+        enable_reroll=not args.no_reroll, max_rerolls=args.max_rerolls, engine=args.engine,
+        workers=args.workers, seed=args.seed, precision=_build_precision(args), replicates=args.replicates
+    )
+    if instrument is not None:
+        instrument.save(args.instrument)
+    return 0
+
+
+def run_report(args):
+    """report子命令"""
+    from artifact import SimulationArtifact
+
+    SimulationArtifact.load(args.artifact).render_report(args.output, args.write_only)
+    print(f"  生成文件: {args.output}")
+    return 0
+
+
+def run_replay(args):
+    """replay子命令"""
+    from simulator import Simulator
+    from ProDistribution import ProDistribution
+
+    if args.artifact:
+        from artifact import SimulationArtifact
+
+        result = SimulationArtifact.load(args.artifact)
+        metadata = result.metadata
+        # 'qmc'引擎使用打乱的Sobol序列，'exact'引擎没有随机轮次，都无法按轮次重放
+        if metadata.get('engine') in ('qmc', 'exact'):
+            raise ValueError(f"结果文件 '{args.artifact}' 由 '{metadata['engine']}' 引擎生成，不能重放单轮")
+        if metadata.get('seed') is None:
+            raise ValueError(f"结果文件 '{args.artifact}' 没有记录随机种子")
+        args.seed, args.draw_count = metadata['seed'], result.draw_count
+        args.no_reroll, args.max_rerolls = not metadata['enable_reroll'], metadata['max_rerolls']
+        args.initial_value, args.ratio, args.sampler = metadata['initial_value'], metadata['ratio'], metadata['sampler']
+        characters = result.build_characters()
+    elif args.seed is None:
+        raise ValueError("需要指定 --seed 或 --artifact")
+    else:
+        characters = None
+
+    simulator = Simulator(ProDistribution(args.initial_value, args.ratio), seed=args.seed, sampler=args.sampler)
+    if characters is not None:
+        simulator.characters = characters
+        simulator.bind_characters()
+    simulator.replay_round(
+        args.character, args.round, args.draw_count, not args.no_reroll, args.max_rerolls, render=args.render
+    )
+    return 0
+
+
+def run_sweep(args, sweep_args):
+    """sweep子命令"""
+    import sweep
+
+    sweep.main(sweep_args)
+    return 0
+
+
+def run_compare(args, compare_args):
+    """compare子命令"""
+    import compare
+
+    compare.main(compare_args)
+    return 0
+
+
+def run_importance(args, importance_args):
+    """importance子命令"""
+    import importance
+
+    importance.main(importance_args)
+    return 0
+
+
+def run_reweight(args, reweight_args):
+    """reweight子命令"""
+    import reweight
+
+    reweight.main(reweight_args)
+    return 0
+
+
+def run_trajectory(args, trajectory_args):
+    """trajectory子命令"""
+    import trajectory
+
+    trajectory.main(trajectory_args)
+    return 0
+
+
+# 参数原样转交给对应模块解析的子命令
+PASSTHROUGH_COMMANDS = {
+    'sweep': run_sweep,
+    'compare': run_compare,
+    'importance': run_importance,
+    'reweight': run_reweight,
+    'trajectory': run_trajectory,
+}
+
+COMMANDS = {
+    'simulate': run_simulate,
+    'ratio': run_ratio,
+    'report': run_report,
+    'replay': run_replay,
+}
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command in PASSTHROUGH_COMMANDS:
+        return PASSTHROUGH_COMMANDS[args.command](args, extra)
+    if extra:
+        parser.error(f"无法识别的参数: {' '.join(extra)}")
+    return COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,431 @@
+from statistics import NormalDist
+import argparse
+import csv
+import json
+import numpy as np
+from ProDistribution import ProDistribution
+from character import Character
+from batch_engine import BatchEngine
+from round_rng import new_seed, round_blocks
+from simulator import DEFAULT_CHARACTERS
+from sweep import parse_bool
+
+"""
+公共随机数对比
+
+功能说明：
+- 用同一组随机流驱动多个变体（ProDistribution参数、重新roll设置、是否havetool），
+  同一角色下标、同一轮次、同一次抽卡的第一手牌在所有变体中使用相同的均匀随机数
+- 重新roll的手牌使用独立的子流，按所有变体中最大的重新roll次数对齐预留
+- 可选对偶轮次：第2k+1轮使用第2k轮随机数的对偶 1-u，以每对轮次为一个分析单位
+- 第一个变体为基准，其余变体逐项与基准配对比较：每次抽卡后的平均属性值、属性值>threshold的比例、
+  以及每个属性值的比例，给出差值、配对置信区间与相对独立模拟的方差缩减倍数
+  （独立模拟达到相同精度所需的轮数是本次的多少倍）
+
+用法示例：
+    python compare.py --variant ratio=0.6 --variant ratio=0.7 --variant max_rerolls=3 \\
+        --rounds 20000 --seed 1 --antithetic --output compare_results.csv
+    python compare.py --variant havetool=false --variant havetool=true --draw-count 20
+"""
+
+# 变体字段及默认值；havetool为None时保留每个角色自身的设置
+VARIANT_DEFAULTS = {
+    'initial_value': 500,
+    'ratio': 0.6,
+    'enable_reroll': True,
+    'max_rerolls': 2,
+    'havetool': None,
+}
+
+# 对比表的列
+COMPARISON_COLUMNS = [
+    'variant', 'label', 'character', 'attribute', 'level', 'baseline_havetool', 'havetool', 'draw',
+    'metric', 'value', 'baseline', 'estimate', 'delta', 'half_width', 'ci_low', 'ci_high', 'variance_reduction',
+    'threshold', 'rounds', 'seed', 'antithetic',
+]
+
+def normalize_variant(variant):
+    """
+    补全变体中缺省的字段
+
+    Args:
+        variant: 变体字典
+
+    Returns:
+        dict: 完整的变体字典
+    """
+    for name in variant:
+        if name not in VARIANT_DEFAULTS:
+            raise ValueError(f"变体参数 '{name}' 不存在")
+    return dict(VARIANT_DEFAULTS, **variant)
+
+
+def variant_label(variant):
+    """
+    生成变体的简短说明（只列出与默认值不同的字段）
+
+    Args:
+        variant: 完整的变体字典
+
+    Returns:
+        str: 说明文字
+    """
+    changed = [f"{name}={value}" for name, value in variant.items() if value != VARIANT_DEFAULTS[name]]
+    return ", ".join(changed) if changed else "默认"
+
+
+class PairedStatistic:
+    """配对差值累加器 - 以分析单位（一轮或一对对偶轮）累加变体与基准的差值"""
+
+    def __init__(self, shape):
+        """
+        初始化累加器
+
+        Args:
+            shape: 每轮统计量的形状，如 (抽卡次数,) 或 (抽卡次数, 属性值个数)
+        """
+        self.shape = shape
+        self.rounds = 0
+        self.units = 0
+        self.sums = {name: np.zeros(shape) for name in ('baseline', 'variant', 'delta')}
+        self.squares = {name: np.zeros(shape) for name in ('baseline', 'variant', 'delta')}
+
+    def add(self, baseline, variant, pair_size=1):
+        """
+        累加一块轮次
+
+        Args:
+            baseline: 基准变体每轮的统计量 (轮数, *shape)
+            variant: 对比变体每轮的统计量 (轮数, *shape)，与baseline逐行对应同一随机流
+            pair_size: 每个分析单位的轮数，对偶模式为2，默认1
+        """
+        delta = variant - baseline
+        if pair_size > 1:
+            delta = delta.reshape(-1, pair_size, *self.shape).mean(axis=1)
+        self.rounds += baseline.shape[0]
+        self.units += delta.shape[0]
+        for name, values in (('baseline', baseline), ('variant', variant), ('delta', delta)):
+            self.sums[name] += values.sum(axis=0)
+            self.squares[name] += np.square(values).sum(axis=0)
+
+    def _variance(self, name, count):
+        """每轮（或每个分析单位）的样本方差"""
+        mean = self.sums[name] / count
+        return np.maximum(self.squares[name] / count - mean * mean, 0.0) * count / max(count - 1, 1)
+
+    def summary(self, z):
+        """
+        计算估计值、差值与置信区间
+
+        Args:
+            z: 置信水平对应的正态分位数
+
+        Returns:
+            dict: 'baseline'、'estimate'、'delta'、'half_width'、'variance_reduction' -> 形状为shape的数组
+        """
+        paired_variance = self._variance('delta', self.units) / self.units
+        # 两个变体各自独立模拟相同轮数时差值的方差
+        independent_variance = (
+            self._variance('baseline', self.rounds) + self._variance('variant', self.rounds)
+        ) / self.rounds
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reduction = np.where(
+                independent_variance > 0, independent_variance / paired_variance, np.nan
+            )
+        return {
+            'baseline': self.sums['baseline'] / self.rounds,
+            'estimate': self.sums['variant'] / self.rounds,
+            'delta': self.sums['delta'] / self.units,
+            'half_width': z * np.sqrt(paired_variance),
+            'variance_reduction': reduction,
+        }
+
+
+class PairedIndicatorStatistic(PairedStatistic):
+    """
+    属性值指示量 [属性值 == value] 的配对差值累加器
+
+    每轮的统计量是整数属性值，不展开成独热数组：和与平方和用一次bincount按 (抽卡次数, 属性值) 直接累加
+    """
+
+    def _count(self, cells):
+        """统计展平后的 (抽卡次数, 属性值) 下标出现的次数"""
+        draws, width = self.shape
+        return np.bincount(cells.ravel(), minlength=draws * width).reshape(self.shape)
+
+    def add(self, baseline, variant, pair_size=1):
+        """
+        累加一块轮次
+
+        Args:
+            baseline: 基准变体每轮每次抽卡后的属性值 (轮数, 抽卡次数)，整数
+            variant: 对比变体每轮每次抽卡后的属性值 (轮数, 抽卡次数)，与baseline逐行对应同一随机流
+            pair_size: 每个分析单位的轮数，对偶模式为2，默认1
+        """
+        draws, width = self.shape
+        # 把 (抽卡次数, 属性值) 展平成一个下标
+        offsets = np.arange(draws) * width
+        baseline_cells = np.asarray(baseline, dtype=np.int64) + offsets
+        variant_cells = np.asarray(variant, dtype=np.int64) + offsets
+        baseline_counts = self._count(baseline_cells)
+        variant_counts = self._count(variant_cells)
+
+        # 每个分析单位的差值为 (单位内变体指示量之和 - 基准指示量之和) / pair_size，
+        # 其平方展开为各项的平方（指示量为0或1，即各自的计数）加上单位内两两落在同一格的交叉项
+        terms = [
+            (cells[k::pair_size], sign)
+            for cells, sign in ((variant_cells, 1), (baseline_cells, -1)) for k in range(pair_size)
+        ]
+        delta_squares = baseline_counts + variant_counts
+        for a in range(len(terms)):
+            for b in range(a + 1, len(terms)):
+                (cells_a, sign_a), (cells_b, sign_b) = terms[a], terms[b]
+                delta_squares += 2 * sign_a * sign_b * self._count(cells_a[cells_a == cells_b])
+
+        self.rounds += baseline.shape[0]
+        self.units += baseline.shape[0] // pair_size
+        for name, counts in (('baseline', baseline_counts), ('variant', variant_counts)):
+            self.sums[name] += counts
+            self.squares[name] += counts
+        self.sums['delta'] += (variant_counts - baseline_counts) / pair_size
+        self.squares['delta'] += delta_squares / pair_size ** 2
+
+
+def _round_statistics(main_values, threshold):
+    """
+    由主攻流派属性值矩阵计算每轮的统计量
+
+    Args:
+        main_values: 主攻流派属性值矩阵 (轮数, draw_count+1)
+        threshold: 阈值
+
+    Returns:
+        dict: 'mean_value' (轮数, draw_count)、'p_above_threshold' (轮数, draw_count)、
+            'p_value' (轮数, draw_count) 整数属性值，由PairedIndicatorStatistic按属性值累加
+    """
+    # 与其他统计保持一致：第0次抽卡不记录
+    values = main_values[:, 1:]
+    return {
+        'mean_value': values.astype(np.float64),
+        'p_above_threshold': (values > threshold).astype(np.float64),
+        'p_value': values,
+    }
+
+
+def compare_variants(variants, draw_count=15, rounds=10000, seed=None, antithetic=False, threshold=7,
+                     confidence=0.95, characters=None, chunk_size=8192):
+    """
+    用公共随机数模拟多个变体，并与第一个变体配对比较
+
+    Args:
+        variants: 变体字典列表（缺省字段使用VARIANT_DEFAULTS），第一个为基准
+        draw_count: 每轮抽卡次数，默认15次
+        rounds: 每个变体的模拟轮数，默认10000轮
+        seed: 随机种子，默认None（生成新的种子，记录在结果中）
+        antithetic: 是否使用对偶轮次，默认False；为True时rounds与chunk_size须为偶数
+        threshold: 统计p_above_threshold使用的阈值，默认7
+        confidence: 置信水平，默认0.95
+        characters: 参与对比的角色 [(属性, 等级, havetool), ...]，默认None（simulator.DEFAULT_CHARACTERS）
+        chunk_size: 每块同时推进的轮数，默认8192
+
+    Returns:
+        list: 对比表的行（字典），见COMPARISON_COLUMNS
+    """
+    if len(variants) < 2:
+        raise ValueError("至少需要两个变体（第一个为基准）")
+    if antithetic and (rounds % 2 or chunk_size % 2):
+        raise ValueError(f"对偶模式下轮数 '{rounds}' 与块大小 '{chunk_size}' 必须为偶数")
+
+    variants = [normalize_variant(variant) for variant in variants]
+    characters = characters if characters is not None else DEFAULT_CHARACTERS
+    seed = new_seed() if seed is None else seed
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    pair_size = 2 if antithetic else 1
+    value_count = draw_count + 2
+
+    # 所有变体共用一份每轮块数，重新roll子流按最大的重新roll次数预留，保证随机流对齐
+    max_rerolls = max(variant['max_rerolls'] if variant['enable_reroll'] else 0 for variant in variants)
+    blocks = round_blocks(draw_count, max_rerolls > 0, max_rerolls)
+    engines = [
+        BatchEngine(ProDistribution(variant['initial_value'], variant['ratio']), chunk_size, seed,
+                    antithetic=antithetic)
+        for variant in variants
+    ]
+
+    rows = []
+    for i, (attribute, level, havetool) in enumerate(characters):
+        variant_characters = [
+            Character(attribute, level, havetool if variant['havetool'] is None else variant['havetool'])
+            for variant in variants
+        ]
+        statistics = [
+            {
+                'mean_value': PairedStatistic((draw_count,)),
+                'p_above_threshold': PairedStatistic((draw_count,)),
+                'p_value': PairedIndicatorStatistic((draw_count, value_count)),
+            }
+            for _ in variants[1:]
+        ]
+
+        done = 0
+        while done < rounds:
+            size = min(chunk_size, rounds - done)
+            chunk = [
+                _round_statistics(engine.simulate_chunk(
+                    character, size, draw_count, variant['enable_reroll'], variant['max_rerolls'], i, done, blocks
+                )[0], threshold)
+                for engine, variant, character in zip(engines, variants, variant_characters)
+            ]
+            for variant_statistics, variant_chunk in zip(statistics, chunk[1:]):
+                for metric, statistic in variant_statistics.items():
+                    statistic.add(chunk[0][metric], variant_chunk[metric], pair_size)
+            done += size
+
+        for v, variant_statistics in enumerate(statistics, start=1):
+            common = {
+                'variant': v,
+                'label': variant_label(variants[v]),
+                'character': i,
+                'attribute': attribute,
+                'level': level,
+                'baseline_havetool': variant_characters[0].get_havetool(),
+                'havetool': variant_characters[v].get_havetool(),
+                'threshold': threshold,
+                'rounds': rounds,
+                'seed': seed,
+                'antithetic': antithetic,
+            }
+            summaries = {metric: statistic.summary(z) for metric, statistic in variant_statistics.items()}
+            for draw in range(draw_count):
+                cells = [(metric, None, (draw,)) for metric in ('mean_value', 'p_above_threshold')]
+                # 只输出基准或变体中出现过的属性值
+                p_value = summaries['p_value']
+                cells += [
+                    ('p_value', value, (draw, value)) for value in range(value_count)
+                    if p_value['baseline'][draw, value] > 0 or p_value['estimate'][draw, value] > 0
+                ]
+                for metric, value, index in cells:
+                    summary = {name: float(array[index]) for name, array in summaries[metric].items()}
+                    row = dict(common)
+                    row.update({
+                        'draw': draw + 1,
+                        'metric': metric,
+                        'value': value,
+                        'baseline': summary['baseline'],
+                        'estimate': summary['estimate'],
+                        'delta': summary['delta'],
+                        'half_width': summary['half_width'],
+                        'ci_low': summary['delta'] - summary['half_width'],
+                        'ci_high': summary['delta'] + summary['half_width'],
+                        'variance_reduction': summary['variance_reduction'],
+                    })
+                    rows.append(row)
+    return rows
+
+
+def write_comparison_table(filename, rows):
+    """
+    将对比表写入CSV文件
+
+    Args:
+        filename: 输出文件名
+        rows: compare_variants返回的行
+    """
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=COMPARISON_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# 命令行中各变体字段的解析方式
+_FIELD_PARSERS = {
+    'initial_value': float,
+    'ratio': float,
+    'enable_reroll': parse_bool,
+    'max_rerolls': int,
+    'havetool': parse_bool,
+}
+
+
+def parse_variant(text):
+    """
+    解析命令行中的变体，如 "ratio=0.7,max_rerolls=3"；空字符串表示默认配置
+
+    Args:
+        text: 变体文字
+
+    Returns:
+        dict: 变体字典
+    """
+    variant = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, value = item.partition('=')
+        if name not in _FIELD_PARSERS:
+            raise argparse.ArgumentTypeError(f"变体参数 '{name}' 不存在")
+        variant[name] = _FIELD_PARSERS[name](value)
+    return variant
+
+
+def print_summary(rows, draw_count):
+    """
+    打印每个变体、每个角色在最后一次抽卡时的差值
+
+    Args:
+        rows: compare_variants返回的行
+        draw_count: 每轮抽卡次数
+    """
+    for row in rows:
+        if row['draw'] != draw_count or row['metric'] == 'p_value':
+            continue
+        name = "平均属性值" if row['metric'] == 'mean_value' else f"P(属性值>{row['threshold']})"
+        print(
+            f"变体{row['variant']} [{row['label']}] 角色{row['character']} "
+            f"({row['level']}级, havetool={row['havetool']}) {name}: "
+            f"{row['baseline']:.4f} -> {row['estimate']:.4f}, "
+            f"差值 {row['delta']:+.4f} ± {row['half_width']:.4f}, 方差缩减 x{row['variance_reduction']:.1f}"
+        )
+
+
+def build_parser():
+    """
+    构造命令行参数解析器
+
+    Returns:
+        argparse.ArgumentParser: 参数解析器
+    """
+    parser = argparse.ArgumentParser(description="用公共随机数对比多个概率分布与重新roll配置")
+    parser.add_argument('--variant', type=parse_variant, action='append', dest='variants',
+                        help="变体，如 ratio=0.7,max_rerolls=3；可重复，第一个为基准")
+    parser.add_argument('--variants-file', help="变体列表JSON文件（字典列表），给出时忽略--variant")
+    parser.add_argument('--draw-count', type=int, default=15)
+    parser.add_argument('--rounds', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--antithetic', action='store_true', help="使用对偶轮次")
+    parser.add_argument('--threshold', type=int, default=7)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--output', default='compare_results.csv')
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.variants_file:
+        with open(args.variants_file, encoding='utf-8') as file:
+            variants = json.load(file)
+    else:
+        variants = args.variants or []
+    if len(variants) < 2:
+        parser.error("至少需要两个变体（第一个为基准）")
+
+    rows = compare_variants(
+        variants, args.draw_count, args.rounds, args.seed, args.antithetic, args.threshold, args.confidence
+    )
+    print_summary(rows, args.draw_count)
+    write_comparison_table(args.output, rows)
+    print(f"随机种子: {rows[0]['seed']}，结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
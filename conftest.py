@@ -0,0 +1,8 @@
+"""
+pytest配置
+
+功能说明：
+- test_reroll.py是绘制函数曲线的脚本（导入时调用plt.show()，需要matplotlib），不是测试用例，不参与收集
+"""
+
+collect_ignore = ['test_reroll.py']
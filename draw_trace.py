@@ -0,0 +1,236 @@
+import json
+import struct
+import numpy as np
+from type import SkillCatalog
+
+"""
+抽卡过程追踪
+
+功能说明：
+- TraceBuffer：紧凑的二进制追踪缓冲区，每张手牌（包括被重新roll掉的手牌）一条定长记录
+- 流派以SkillCatalog中的整数ID保存，记录时不做任何字符串格式化
+- 记录内容：轮次、角色、抽卡次数、第几次尝试、是否被重新roll、剩余重新roll次数、
+  流派拥有数量、三张卡牌、选中的流派、主攻流派属性值与主攻流派的投放概率
+- 文本、JSON与表格渲染在记录完成后按需进行；完整的流派权重通过回放记录重新计算
+"""
+
+# 定长记录格式（小端、无填充）
+RECORD_FORMAT = '<IHHBBBBHHHhHf'
+RECORD_STRUCT = struct.Struct(RECORD_FORMAT)
+
+# 与RECORD_FORMAT逐字节对应的NumPy结构化类型
+RECORD_DTYPE = np.dtype([
+    ('round', '<u4'),
+    ('character', '<u2'),
+    ('draw', '<u2'),
+    ('attempt', 'u1'),
+    ('rerolled', 'u1'),
+    ('remaining_rerolls', 'u1'),
+    ('style_count', 'u1'),
+    ('card0', '<u2'),
+    ('card1', '<u2'),
+    ('card2', '<u2'),
+    ('selected', '<i2'),
+    ('main_value', '<u2'),
+    ('main_probability', '<f4'),
+])
+
+# 被重新roll掉的手牌没有选中的流派
+NO_SELECTION = -1
+
+
+class TraceBuffer:
+    """抽卡过程的定长二进制追踪缓冲区"""
+
+    def __init__(self, characters=None, catalog=None):
+        """
+        初始化追踪缓冲区
+
+        Args:
+            characters: 角色配置列表 [(attribute, level, havetool), ...]，默认为空
+            catalog: 技能目录，默认为SkillCatalog.default()
+        """
+        self.catalog = catalog if catalog is not None else SkillCatalog.default()
+        self.characters = [tuple(spec) for spec in (characters or [])]
+        self.buffer = bytearray()
+
+    def __len__(self):
+        return len(self.buffer) // RECORD_STRUCT.size
+
+    def record_draw(self, round_idx, char_idx, draw, hands, selected_style, remaining_rerolls, style_count,
+                    main_value, main_probability):
+        """
+        记录一次抽卡：先记录被重新roll掉的手牌，最后记录选中流派的手牌
+
+        Args:
+            round_idx: 轮次
+            char_idx: 角色下标
+            draw: 抽卡次数（从0开始）
+            hands: 本次抽卡的全部手牌，最后一手为最终手牌
+            selected_style: 选中的流派名称
+            remaining_rerolls: 本次抽卡前的剩余重新roll次数
+            style_count: 本次抽卡前的流派拥有数量
+            main_value: 本次抽卡前的主攻流派属性值
+            main_probability: 本次抽卡前主攻流派的投放概率
+        """
+        get_id = self.catalog.ids.__getitem__
+        last = len(hands) - 1
+        for attempt, hand in enumerate(hands):
+            selected = get_id(selected_style) if attempt == last else NO_SELECTION
+            self.buffer += RECORD_STRUCT.pack(
+                round_idx, char_idx, draw, attempt, attempt != last, remaining_rerolls - attempt, style_count,
+                get_id(hand[0]), get_id(hand[1]), get_id(hand[2]), selected, main_value, main_probability
+            )
+
+    def records(self):
+        """
+        获取全部记录
+
+        Returns:
+            ndarray: RECORD_DTYPE结构化数组
+        """
+        return np.frombuffer(bytes(self.buffer), dtype=RECORD_DTYPE)
+
+    def save(self, filename):
+        """
+        保存为.npz文件
+
+        Args:
+            filename: 输出文件名
+        """
+        header = {'characters': self.characters, 'skills': list(self.catalog.names), 'format': RECORD_FORMAT}
+        np.savez(filename, header=np.array(json.dumps(header, ensure_ascii=False)), records=self.records())
+
+    @classmethod
+    def load(cls, filename):
+        """
+        读取.npz文件
+
+        Args:
+            filename: 追踪文件名
+
+        Returns:
+            TraceBuffer: 追踪缓冲区
+        """
+        with np.load(filename, allow_pickle=False) as data:
+            header = json.loads(data['header'].item())
+            if header['format'] != RECORD_FORMAT:
+                raise ValueError(f"追踪记录格式 '{header['format']}' 与当前版本不一致")
+            catalog = SkillCatalog.default()
+            if header['skills'] != list(catalog.names):
+                raise ValueError("追踪文件使用的技能目录与当前版本不一致")
+            trace = cls(header['characters'], catalog)
+            trace.buffer = bytearray(data['records'].tobytes())
+        return trace
+
+    def iter_draws(self):
+        """
+        按记录顺序逐次抽卡地遍历
+
+        Yields:
+            dict: 一次抽卡的信息（流派为名称）
+        """
+        get_name = self.catalog.get_name
+        rerolled_hands = []
+        for record in self.records():
+            hand = [get_name(int(record['card0'])), get_name(int(record['card1'])), get_name(int(record['card2']))]
+            if record['rerolled']:
+                rerolled_hands.append(hand)
+                continue
+            yield {
+                'round': int(record['round']),
+                'character': int(record['character']),
+                'draw': int(record['draw']),
+                'cards': hand,
+                'selected': get_name(int(record['selected'])),
+                'reroll_history': rerolled_hands,
+                'reroll_count': len(rerolled_hands),
+                'remaining_rerolls': int(record['remaining_rerolls']) + len(rerolled_hands),
+                'style_count': int(record['style_count']),
+                'main_value': int(record['main_value']),
+                'main_probability': float(record['main_probability']),
+            }
+            rerolled_hands = []
+
+    def to_json(self):
+        """
+        渲染为JSON字符串（每次抽卡一个对象）
+
+        Returns:
+            str: JSON字符串
+        """
+        return json.dumps(list(self.iter_draws()), ensure_ascii=False)
+
+    def render_table(self):
+        """
+        渲染为定宽表格（每张手牌一行）
+
+        Returns:
+            str: 表格文本
+        """
+        get_name = self.catalog.get_name
+        lines = ["轮次  角色  抽卡  尝试  重roll  剩余  流派数  手牌                          选中      主攻值  主攻概率"]
+        for record in self.records():
+            hand = ",".join(get_name(int(record[field])) for field in ('card0', 'card1', 'card2'))
+            selected = "-" if record['selected'] == NO_SELECTION else get_name(int(record['selected']))
+            lines.append(
+                f"{record['round']:4d}  {record['character']:4d}  {record['draw'] + 1:4d}  {record['attempt']:4d}  "
+                f"{'是' if record['rerolled'] else '否':>5s}  {record['remaining_rerolls']:4d}  "
+                f"{record['style_count']:6d}  {hand:28s}  {selected:8s}  {record['main_value']:6d}  "
+                f"{record['main_probability']:8.3f}"
+            )
+        return "\n".join(lines)
+
+    def render_text(self, pro_distribution=None, enable_reroll=True):
+        """
+        渲染为与原逐次打印一致的文本
+
+        Args:
+            pro_distribution: ProDistribution实例，给定时回放记录并显示每次抽卡前的流派权重，默认None
+            enable_reroll: 是否显示剩余重新roll次数，默认True
+
+        Returns:
+            str: 文本
+        """
+        from character import Character
+
+        lines = []
+        groups = {}
+        for draw in self.iter_draws():
+            groups.setdefault((draw['round'], draw['character']), []).append(draw)
+
+        for (round_idx, char_idx), draws in groups.items():
+            attribute, level, havetool = self.characters[char_idx]
+            character = Character(attribute, level, havetool)
+            lines.append(f"\n第{round_idx + 1}轮 角色 {char_idx + 1} (等级{level}, havetool={havetool}):")
+            initial_style_count = character.get_style_count()
+            lines.append(f"  初始流派拥有数量: {initial_style_count}")
+
+            for draw in draws:
+                if pro_distribution is not None:
+                    probabilities = pro_distribution.get_current_weight(character)
+                    prob_str = ', '.join([f"{k}:{v:.3f}" for k, v in probabilities.items()])
+                    lines.append(f"    第{draw['draw'] + 1}次抽卡前流派权重: {prob_str}")
+                    if enable_reroll:
+                        lines.append(f"    剩余重新roll次数: {draw['remaining_rerolls']}")
+                character.increase_attribute_value(draw['selected'], 1)
+                if (draw['draw'] + 1) % 5 == 0:
+                    lines.append(f"    第{draw['draw'] + 1}次抽卡后: 流派拥有数量 = {character.get_style_count()}")
+
+            final_style_count = character.get_style_count()
+            lines.append(f"  最终流派拥有数量: {final_style_count}")
+            lines.append(f"  流派获得情况:")
+            for style, value in character.attribute_values.items():
+                if value > 0:
+                    lines.append(f"    {style}: {value}")
+
+            lines.append(f"  抽卡历史:")
+            for draw in draws:
+                cards_str = ", ".join(draw['cards'])
+                selected = draw['selected']
+                selection_reason = "优先选择" if selected == attribute else "默认选择"
+                reroll_info = f" (重新roll{draw['reroll_count']}次)" if draw['reroll_count'] > 0 else ""
+                lines.append(f"    第{draw['draw'] + 1:2d}次: [{cards_str}] -> {selected} ({selection_reason}){reroll_info}")
+
+            lines.append(f"  流派数量变化: {initial_style_count} -> {final_style_count}")
+        return "\n".join(lines)
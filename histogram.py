@@ -0,0 +1,82 @@
+import numpy as np
+
+"""
+稠密直方图
+
+功能说明：
+- 每次抽卡后主攻流派属性值的分布保存为预分配的数组：histogram[角色下标, 抽卡次数, 主攻流派属性值] = 轮数
+  （'exact'引擎为概率），与逐轮模拟保持一致，第0次抽卡不记录
+- 每次抽卡主攻流派属性值最多+1，数组宽度取 初始属性值+draw_count+1，模拟过程中不会越界
+- 逐块结果用一次bincount累加；各进程、各批次的结果形状相同，直接相加即可合并
+- 保存结果或生成报告前去掉末尾全为0的属性值列
+"""
+
+# 逐轮模拟时每缓冲这么多轮累加一次直方图
+FLUSH_ROUNDS = 4096
+
+
+def value_capacity(characters, draw_count):
+    """
+    计算直方图需要的属性值个数
+
+    Args:
+        characters: 角色列表
+        draw_count: 每轮抽卡次数
+
+    Returns:
+        int: 最大可能的主攻流派属性值+1
+    """
+    from character import Character
+
+    initial_value = 0
+    for character in characters:
+        # 使用全新角色获取初始属性值，避免读到传入角色的中间状态
+        template = Character(character.attribute, character.get_level(), character.get_havetool())
+        initial_value = max(initial_value, template.attribute_values.get(character.attribute, 0))
+    return initial_value + draw_count + 1
+
+
+def empty_histogram(characters, draw_count, dtype=np.int64):
+    """
+    创建全0的直方图
+
+    Args:
+        characters: 角色列表
+        draw_count: 每轮抽卡次数
+        dtype: 数据类型，计数为int64，'exact'引擎的概率为float64，默认int64
+
+    Returns:
+        ndarray: 直方图 (角色数, draw_count+1, value_capacity)
+    """
+    return np.zeros((len(characters), draw_count + 1, value_capacity(characters, draw_count)), dtype=dtype)
+
+
+def add_main_values(histogram, character_index, main_values):
+    """
+    把一块轮次的主攻流派属性值累加到直方图中
+
+    Args:
+        histogram: 直方图 (角色数, draw_count+1, 属性值个数)
+        character_index: 角色下标
+        main_values: 每一轮每次抽卡后的主攻流派属性值 (轮数, draw_count+1)，第0列不记录
+    """
+    width = histogram.shape[2]
+    draws = main_values.shape[1] - 1
+    # 把 (抽卡次数, 属性值) 展平成一个下标，一次bincount统计所有抽卡次数
+    cells = np.asarray(main_values[:, 1:], dtype=np.int64) + np.arange(draws) * width
+    histogram[character_index, 1:] += np.bincount(cells.ravel(), minlength=draws * width).reshape(draws, width)
+
+
+def trim_histogram(histogram):
+    """
+    去掉末尾全为0的属性值列
+
+    Args:
+        histogram: 直方图 (角色数, draw_count+1, 属性值个数)
+
+    Returns:
+        ndarray: 最后一列至少有一个非0值的直方图（全为0时保留1列）
+    """
+    used = np.flatnonzero(histogram.any(axis=(0, 1)))
+    width = int(used[-1]) + 1 if used.size else 1
+    return histogram[:, :, :width]
@@ -0,0 +1,334 @@
+from statistics import NormalDist
+import argparse
+import warnings
+import numpy as np
+from ProDistribution import ProDistribution
+from batch_engine import BatchEngine
+
+"""
+重要性抽样估计稀有事件概率
+
+功能说明：
+- 抽样时把主攻流派的权重向事件倾斜，每一轮按似然比（原分布概率/倾斜后概率）加权，
+  得到原分布下事件概率的无偏估计
+- 两种倾斜方式：'multiply'把主攻流派的权重乘以tilt（<1偏向拿不到主攻流派）；
+  'share'把主攻流派单张卡的概率提高到至少tilt（偏向高属性值；主攻流派的权重随属性值衰减，
+  固定倍数无法在每个状态下都合适）
+- 重新roll与选卡规则只取决于抽到的卡牌，似然比只需累乘每张卡牌的概率之比
+- 支持的事件：'above'（最后一次抽卡后主攻流派属性值>threshold）、'no_main'（最后没有主攻属性）
+- 报告估计值、标准误、置信区间、有效样本量（ESS），以及普通蒙特卡洛达到相同精度约需的轮数
+- 似然比是重尾分布时样本方差会严重低估真实方差，给出看似很窄但错误的置信区间；
+  发生事件的轮的有效样本量（事件ESS）低于下限时估计值与置信区间为NaN并发出警告
+- tilt='auto'时先用少量试验轮（与正式轮次不重叠）在候选倾斜系数中选事件ESS最大的一个，
+  权重被少数几轮主导（全部权重的ESS过小）的候选视为倾斜过度，不参与选择
+
+用法示例：
+    python importance.py --event above --threshold 12 --character 4 --rounds 200000 --seed 1
+    python importance.py --event no_main --character 0 --tilt 0.3
+"""
+
+# 支持的事件及说明
+EVENTS = {
+    'above': "主攻流派属性值>{threshold}",
+    'no_main': "没有主攻属性",
+}
+
+# 每种事件默认的倾斜方式
+DEFAULT_FAMILIES = {
+    'above': 'share',
+    'no_main': 'multiply',
+}
+
+# tilt='auto'时各倾斜方式的候选倾斜系数
+DEFAULT_TILTS = {
+    'share': (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8),
+    'multiply': tuple(0.5 ** k for k in range(11)),
+}
+
+# 选择倾斜系数时每个候选的试验轮数
+PILOT_ROUNDS = 4096
+
+# 试验轮中全部权重的ESS下限，低于下限的候选倾斜过度
+MIN_PILOT_ESS = 10
+
+# 事件ESS下限，低于下限时估计值与置信区间不可靠，返回NaN
+DEFAULT_MIN_EVENT_ESS = 30
+
+
+def event_indicator(event, final_values, threshold):
+    """
+    判断每一轮是否发生事件
+
+    Args:
+        event: 事件名，见EVENTS
+        final_values: 每一轮最后一次抽卡后的主攻流派属性值
+        threshold: 'above'事件的阈值
+
+    Returns:
+        ndarray: 布尔数组
+    """
+    if event == 'above':
+        return final_values > threshold
+    if event == 'no_main':
+        return final_values == 0
+    raise ValueError(f"事件 '{event}' 不存在")
+
+
+def _weighted_sums(batch_engine, character, character_index, event, threshold, draw_count, rounds, family, tilt,
+                   enable_reroll, max_rerolls, first_round):
+    """
+    以倾斜方式family、倾斜系数tilt模拟并累加似然比
+
+    Returns:
+        dict: 'rounds'、'hits'（发生事件的轮数）、'weight_sum'、'weight_square_sum'、
+            'event_sum'、'event_square_sum'（只累加发生事件的轮）
+    """
+    sums = dict.fromkeys(('weight_sum', 'weight_square_sum', 'event_sum', 'event_square_sum'), 0.0)
+    sums.update(rounds=rounds, hits=0)
+    done = 0
+    while done < rounds:
+        size = min(batch_engine.chunk_size, rounds - done)
+        log_weights = np.zeros(size)
+        main_values, _ = batch_engine.simulate_chunk(
+            character, size, draw_count, enable_reroll, max_rerolls, character_index, first_round + done,
+            tilt=tilt if family == 'multiply' else None, main_share=tilt if family == 'share' else None,
+            log_weights=log_weights
+        )
+        weights = np.exp(log_weights)
+        event_weights = weights[event_indicator(event, main_values[:, -1], threshold)]
+        sums['hits'] += event_weights.size
+        sums['weight_sum'] += weights.sum()
+        sums['weight_square_sum'] += np.square(weights).sum()
+        sums['event_sum'] += event_weights.sum()
+        sums['event_square_sum'] += np.square(event_weights).sum()
+        done += size
+    return sums
+
+
+def _summarize(sums, z, min_event_ess=0):
+    """
+    由累加值计算估计值、标准误与有效样本量
+
+    Args:
+        sums: _weighted_sums的返回值
+        z: 置信水平对应的正态分位数
+        min_event_ess: 事件ESS下限，低于下限时估计值、标准误与约需轮数为NaN，默认0（不检查）
+
+    Returns:
+        dict: 'estimate'、'standard_error'、'half_width'、'relative_error'、'hits'、'ess'、'event_ess'、
+            'mc_rounds'、'reliable'
+    """
+    rounds = sums['rounds']
+    estimate = sums['event_sum'] / rounds
+    variance = max(sums['event_square_sum'] / rounds - estimate * estimate, 0.0) / max(rounds - 1, 1)
+    standard_error = variance ** 0.5
+    result = {
+        'estimate': estimate,
+        'standard_error': standard_error,
+        'half_width': z * standard_error,
+        'relative_error': standard_error / estimate if estimate > 0 else float('inf'),
+        'hits': sums['hits'],
+        # 全部权重的有效样本量（倾斜程度的诊断）与发生事件的轮的有效样本量
+        'ess': sums['weight_sum'] ** 2 / sums['weight_square_sum'] if sums['weight_square_sum'] > 0 else 0.0,
+        'event_ess': sums['event_sum'] ** 2 / sums['event_square_sum'] if sums['event_square_sum'] > 0 else 0.0,
+        # 普通蒙特卡洛达到相同标准误约需的轮数
+        'mc_rounds': estimate * (1 - estimate) / variance if variance > 0 else float('inf'),
+    }
+    # 事件ESS过小时少数几轮的权重决定了估计值，样本方差不能反映真实误差
+    result['reliable'] = result['event_ess'] >= min_event_ess
+    if not result['reliable']:
+        for name in ('estimate', 'standard_error', 'half_width', 'relative_error', 'mc_rounds'):
+            result[name] = float('nan')
+    return result
+
+
+def choose_tilt(batch_engine, character, character_index, event, threshold, draw_count, family, enable_reroll=True,
+                max_rerolls=2, candidates=None, pilot_rounds=PILOT_ROUNDS, first_round=0):
+    """
+    用少量试验轮在候选倾斜系数中选择事件ESS最大的一个
+
+    似然比重尾时，试验轮的样本方差（相对误差）会严重低估倾斜过度的候选的真实方差，因此按事件ESS选择，
+    并跳过全部权重的ESS低于MIN_PILOT_ESS（权重被少数几轮主导）的候选
+
+    Args:
+        batch_engine: BatchEngine实例
+        character: Character类实例
+        character_index: 角色下标
+        event: 事件名，见EVENTS
+        threshold: 'above'事件的阈值
+        draw_count: 每轮抽卡次数
+        family: 倾斜方式，'multiply'或'share'
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        candidates: 候选倾斜系数，默认None（DEFAULT_TILTS[family]）
+        pilot_rounds: 每个候选的试验轮数，默认PILOT_ROUNDS
+        first_round: 试验轮的第一轮轮次（应与正式轮次不重叠），默认0
+
+    Returns:
+        float: 倾斜系数；没有合适的候选时返回第一个（倾斜最小的）候选
+    """
+    candidates = candidates if candidates is not None else DEFAULT_TILTS[family]
+    best_tilt, best_score = candidates[0], 0.0
+    for tilt in candidates:
+        sums = _weighted_sums(batch_engine, character, character_index, event, threshold, draw_count, pilot_rounds,
+                              family, tilt, enable_reroll, max_rerolls, first_round)
+        # 试验轮中事件太少时ESS估计不可靠
+        if sums['hits'] < 10:
+            continue
+        summary = _summarize(sums, 1.0)
+        if summary['ess'] < MIN_PILOT_ESS:
+            continue
+        if summary['event_ess'] > best_score:
+            best_tilt, best_score = tilt, summary['event_ess']
+    return best_tilt
+
+
+def estimate_event(simulator, character_index, event='above', threshold=12, draw_count=15, rounds=100000,
+                   tilt='auto', family=None, enable_reroll=True, max_rerolls=2, seed=None, confidence=0.95,
+                   candidates=None, pilot_rounds=PILOT_ROUNDS, min_event_ess=DEFAULT_MIN_EVENT_ESS):
+    """
+    用重要性抽样估计一个角色在原分布下发生事件的概率
+
+    Args:
+        simulator: Simulator实例，提供概率分布与角色
+        character_index: 角色下标
+        event: 事件名，见EVENTS，默认'above'
+        threshold: 'above'事件的阈值，默认12
+        draw_count: 每轮抽卡次数，默认15次
+        rounds: 正式模拟轮数，默认100000轮
+        tilt: 倾斜系数，'auto'为自动选择，默认'auto'
+        family: 倾斜方式，'multiply'（权重倍数，1.0为普通蒙特卡洛）或'share'（主攻流派单张卡概率的下限），
+            默认None（DEFAULT_FAMILIES[event]）
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        seed: 随机种子，默认None（使用模拟器的种子，都没有时生成新的种子）
+        confidence: 置信水平，默认0.95
+        candidates: tilt='auto'时的候选倾斜系数，默认None（DEFAULT_TILTS[family]）
+        pilot_rounds: tilt='auto'时每个候选的试验轮数，默认PILOT_ROUNDS
+        min_event_ess: 事件ESS下限，低于下限时估计值与置信区间为NaN并发出警告，默认DEFAULT_MIN_EVENT_ESS
+
+    Returns:
+        dict: 'estimate'、'standard_error'、'half_width'、'relative_error'、'hits'、'ess'、'event_ess'、
+            'mc_rounds'（普通蒙特卡洛达到相同精度约需的轮数）、'reliable'（事件ESS是否达到下限）、
+            'family'、'tilt'、'rounds'、'seed'、'confidence'、'event'、'threshold'、'character'
+    """
+    if event not in EVENTS:
+        raise ValueError(f"事件 '{event}' 不存在")
+    family = family if family is not None else DEFAULT_FAMILIES[event]
+    if family not in DEFAULT_TILTS:
+        raise ValueError(f"倾斜方式 '{family}' 不存在")
+    if not 0 <= character_index < len(simulator.characters):
+        raise ValueError(f"角色下标 '{character_index}' 不存在")
+
+    seed = simulator.resolve_seed(seed)
+    character = simulator.characters[character_index]
+    batch_engine = BatchEngine(simulator.pro_distribution, seed=seed)
+    if tilt == 'auto':
+        # 试验轮排在正式轮次之后，避免选择倾斜系数与估计使用同一批随机数
+        tilt = choose_tilt(batch_engine, character, character_index, event, threshold, draw_count, family,
+                           enable_reroll, max_rerolls, candidates, pilot_rounds, first_round=rounds)
+
+    sums = _weighted_sums(batch_engine, character, character_index, event, threshold, draw_count, rounds, family,
+                          tilt, enable_reroll, max_rerolls, 0)
+    result = _summarize(sums, NormalDist().inv_cdf((1 + confidence) / 2), min_event_ess)
+    if not result['reliable']:
+        warnings.warn(
+            f"角色下标 {character_index} 的事件ESS为 {result['event_ess']:.1f}，低于下限 {min_event_ess}，"
+            f"估计值不可靠（倾斜系数 {tilt:g}），请增加轮数或换用其他倾斜方式",
+            RuntimeWarning
+        )
+    result.update({
+        'family': family,
+        'tilt': tilt,
+        'rounds': rounds,
+        'seed': seed,
+        'confidence': confidence,
+        'event': event,
+        'threshold': threshold,
+        'character': character_index,
+    })
+    return result
+
+
+def describe_estimate(simulator, result):
+    """
+    生成估计结果的说明文字
+
+    Args:
+        simulator: Simulator实例
+        result: estimate_event的返回值
+
+    Returns:
+        str: 多行说明文字
+    """
+    character = simulator.characters[result['character']]
+    event = EVENTS[result['event']].format(threshold=result['threshold'])
+    lines = [f"角色 {result['character'] + 1} (等级{character.get_level()}, havetool={character.get_havetool()}):"]
+    if result['reliable']:
+        lines.append(
+            f"  P({event}) = {result['estimate']:.4g} ± {result['half_width']:.2g} "
+            f"({result['confidence']:.0%}置信区间，相对误差{result['relative_error']:.1%})"
+        )
+    else:
+        lines.append(f"  P({event}): 事件ESS不足，不输出估计值")
+    lines += [
+        f"  倾斜方式 = {result['family']}，倾斜系数 = {result['tilt']:g}，发生事件 {result['hits']} 轮，"
+        f"ESS = {result['ess']:.0f}，事件ESS = {result['event_ess']:.0f}",
+    ]
+    if np.isfinite(result['mc_rounds']):
+        lines.append(f"  普通蒙特卡洛约需 {result['mc_rounds']:.3g} 轮（本次 {result['rounds']} 轮）")
+    return "\n".join(lines)
+
+
+def _parse_tilt(text):
+    """解析命令行中的倾斜系数"""
+    return text if text == 'auto' else float(text)
+
+
+def build_parser():
+    """
+    构造命令行参数解析器
+
+    Returns:
+        argparse.ArgumentParser: 参数解析器
+    """
+    parser = argparse.ArgumentParser(description="用重要性抽样估计稀有事件概率")
+    parser.add_argument('--event', default='above', choices=list(EVENTS))
+    parser.add_argument('--threshold', type=int, default=12)
+    parser.add_argument('--character', type=int, nargs='+', default=None, help="角色下标（从0开始），默认全部角色")
+    parser.add_argument('--draw-count', type=int, default=15)
+    parser.add_argument('--rounds', type=int, default=100000)
+    parser.add_argument('--tilt', type=_parse_tilt, default='auto', help="倾斜系数，或auto")
+    parser.add_argument('--family', default=None, choices=list(DEFAULT_TILTS),
+                        help="倾斜方式：multiply为主攻流派权重倍数，share为主攻流派单张卡概率的下限")
+    parser.add_argument('--no-reroll', action='store_true')
+    parser.add_argument('--max-rerolls', type=int, default=2)
+    parser.add_argument('--initial-value', type=float, default=500)
+    parser.add_argument('--ratio', type=float, default=0.6)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--min-event-ess', type=float, default=DEFAULT_MIN_EVENT_ESS,
+                        help="事件ESS下限，低于下限时不输出估计值")
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    from simulator import Simulator
+
+    args = build_parser().parse_args(argv)
+    simulator = Simulator(ProDistribution(args.initial_value, args.ratio))
+    seed = simulator.resolve_seed(args.seed)
+    indices = args.character if args.character is not None else range(len(simulator.characters))
+    for character_index in indices:
+        result = estimate_event(
+            simulator, character_index, args.event, args.threshold, args.draw_count, args.rounds, args.tilt,
+            args.family, not args.no_reroll, args.max_rerolls, seed, args.confidence,
+            min_event_ess=args.min_event_ess
+        )
+        print(describe_estimate(simulator, result))
+    print(f"\n随机种子: {seed}")
+
+
+if __name__ == "__main__":
+    main()
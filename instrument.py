@@ -0,0 +1,190 @@
+import json
+import sys
+import time
+
+"""
+运行插桩与进度报告
+
+功能说明：
+- NullInstrument：默认的空插桩，所有方法都是空操作，关闭时几乎没有开销
+- Instrument：记录分阶段计时（模拟、Excel布局、保存）、计数器（抽卡次数、消耗的重新roll次数、
+  概率缓存命中）与吞吐量
+- 进度与预计剩余时间按固定间隔输出到stderr
+- 汇总结果可以导出为JSON
+"""
+
+
+class _NullPhase:
+    """空的阶段计时上下文"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class NullInstrument:
+    """空插桩 - 不记录任何数据"""
+
+    enabled = False
+
+    _phase = _NullPhase()
+
+    def phase(self, name):
+        """返回空的阶段计时上下文"""
+        return self._phase
+
+    def count(self, name, amount=1):
+        """空操作"""
+
+    def merge(self, counters):
+        """空操作"""
+
+    def progress(self, task, done, total=None):
+        """空操作"""
+
+    def summary(self):
+        """
+        获取汇总结果
+
+        Returns:
+            dict: 空字典
+        """
+        return {}
+
+
+# 共享的空插桩实例
+NULL_INSTRUMENT = NullInstrument()
+
+
+class _PhaseTimer:
+    """阶段计时上下文，退出时把用时累加到插桩的对应阶段"""
+
+    def __init__(self, instrument, name):
+        self.instrument = instrument
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        phases = self.instrument.phases
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class Instrument:
+    """运行插桩 - 分阶段计时、计数器与限频的进度输出"""
+
+    enabled = True
+
+    def __init__(self, stream=None, interval=1.0):
+        """
+        初始化插桩
+
+        Args:
+            stream: 进度输出流，默认sys.stderr
+            interval: 进度输出的最小间隔（秒），默认1.0
+        """
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self.phases = {}
+        self.counters = {}
+        self.created = time.perf_counter()
+        self._progress_start = {}
+        self._last_report = 0.0
+
+    def phase(self, name):
+        """
+        获取阶段计时上下文（同名阶段的用时累加）
+
+        Args:
+            name: 阶段名称，如'simulation'、'layout'、'save'
+
+        Returns:
+            _PhaseTimer: 上下文管理器
+        """
+        return _PhaseTimer(self, name)
+
+    def count(self, name, amount=1):
+        """
+        累加计数器
+
+        Args:
+            name: 计数器名称，如'draws'、'rerolls'
+            amount: 增加量，默认1
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, counters):
+        """
+        累加其他插桩（如工作进程）的计数器
+
+        Args:
+            counters: 计数器字典 {名称: 数量}
+        """
+        for name, amount in counters.items():
+            self.count(name, amount)
+
+    def progress(self, task, done, total=None):
+        """
+        报告任务进度，距上次输出不足interval秒时忽略
+
+        Args:
+            task: 任务名称
+            done: 已完成数量
+            total: 总数量，未知时为None
+        """
+        now = time.perf_counter()
+        start = self._progress_start.setdefault(task, now)
+        finished = total is not None and done >= total
+        if now - self._last_report < self.interval and not finished:
+            return
+        self._last_report = now
+        if finished:
+            # 任务完成后重新计时，同名任务再次运行时速度与剩余时间从头计算
+            del self._progress_start[task]
+
+        elapsed = now - start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        message = f"[{task}] {done}"
+        if total:
+            message += f"/{total} ({done / total:.0%})"
+        message += f"  {rate:,.0f}/s"
+        if total and rate > 0 and not finished:
+            message += f"  剩余约{(total - done) / rate:.1f}s"
+        print(message, file=self.stream, flush=True)
+
+    def summary(self):
+        """
+        获取汇总结果
+
+        Returns:
+            dict: 阶段用时、计数器、吞吐量与总用时
+        """
+        throughput = {}
+        simulation_seconds = self.phases.get('simulation', 0.0)
+        if simulation_seconds > 0 and 'draws' in self.counters:
+            throughput['draws_per_sec'] = self.counters['draws'] / simulation_seconds
+        layout_seconds = self.phases.get('layout', 0.0)
+        if layout_seconds > 0 and 'cells' in self.counters:
+            throughput['cells_per_sec'] = self.counters['cells'] / layout_seconds
+        return {
+            'phases': dict(self.phases),
+            'counters': dict(self.counters),
+            'throughput': throughput,
+            'elapsed': time.perf_counter() - self.created,
+        }
+
+    def save(self, filename):
+        """
+        把汇总结果导出为JSON
+
+        Args:
+            filename: 输出文件名
+        """
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2, ensure_ascii=False)
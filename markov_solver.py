@@ -0,0 +1,174 @@
+from character import Character
+
+"""
+精确马尔可夫链求解器
+
+功能说明：
+- 对主攻流派属性值的逐次抽卡分布进行精确动态规划求解，替代蒙特卡洛模拟
+- 规范状态：(主攻流派属性值, 其他流派属性值的有序多重集, 剩余重新roll次数)
+- 其他流派在权重与选择规则中完全对称，因此只需记录其属性值的多重集
+- 输出可直接作为Simulator._generate_excel_files的数据来源（rounds=1）
+"""
+
+
+class MarkovSolver:
+    """精确马尔可夫链求解器"""
+
+    def __init__(self, pro_distribution):
+        """
+        初始化求解器
+
+        Args:
+            pro_distribution: ProDistribution实例
+        """
+        self.pro_distribution = pro_distribution
+        self._weight_cache = {}
+
+    def _weight(self, value):
+        """
+        获取属性值对应的权重（带缓存）
+
+        Args:
+            value: 流派属性值
+
+        Returns:
+            float: 流派权重值
+        """
+        if value not in self._weight_cache:
+            self._weight_cache[value] = self.pro_distribution.get_style_weight(None, value)
+        return self._weight_cache[value]
+
+    def _initial_state(self, character, max_rerolls):
+        """
+        根据角色构造初始规范状态
+
+        Args:
+            character: Character类实例
+            max_rerolls: 一轮完整模拟中最大重新roll次数
+
+        Returns:
+            tuple: (初始状态, 主攻流派是否在卡池中)
+        """
+        # 使用全新角色获取初始属性值，避免修改传入角色的状态
+        template = Character(character.attribute, character.get_level(), character.get_havetool())
+        has_main = character.attribute in template.attribute_values
+        main_value = template.get_attribute_value(character.attribute)
+        off_values = tuple(sorted(
+            value for style, value in template.attribute_values.items() if style != character.attribute
+        ))
+        return (main_value, off_values, max_rerolls), has_main
+
+    def _transitions(self, state, has_main, enable_reroll):
+        """
+        计算一次抽卡（含重新roll）后的状态转移
+
+        Args:
+            state: 当前规范状态 (main_value, off_values, remaining_rerolls)
+            has_main: 主攻流派是否在卡池中
+            enable_reroll: 是否启用重新roll功能
+
+        Returns:
+            list: [(下一状态, 转移概率), ...]
+        """
+        main_value, off_values, remaining_rerolls = state
+        style_count = (1 if main_value > 0 else 0) + sum(1 for value in off_values if value > 0)
+        restricted = style_count >= 3
+
+        # 卡池与权重，规则与ProDistribution.get_current_weight一致
+        main_in_pool = has_main and not (restricted and main_value == 0)
+        off_groups = {}
+        for value in off_values:
+            if restricted and value == 0:
+                continue
+            off_groups[value] = off_groups.get(value, 0) + 1
+
+        main_weight = self._weight(main_value) if main_in_pool else 0.0
+        off_weights = {value: self._weight(value) for value in off_groups}
+        total_weight = main_weight + sum(off_groups[value] * off_weights[value] for value in off_groups)
+        if total_weight <= 0:
+            # 总权重为0时卡池内流派等概率
+            main_weight = 1.0 if main_in_pool else 0.0
+            off_weights = {value: 1.0 for value in off_groups}
+            total_weight = main_weight + sum(off_groups.values())
+
+        # 单次三张卡牌中至少出现一张主攻流派的概率
+        main_probability = main_weight / total_weight
+        hit = 1.0 - (1.0 - main_probability) ** 3
+
+        # 重新roll条件2在同一次抽卡内不变：已拿到主攻流派或目前还没凑齐三个流派
+        can_reroll = enable_reroll and has_main and (main_value > 0 or style_count < 3)
+        usable_rerolls = remaining_rerolls if can_reroll else 0
+
+        transitions = []
+        miss = 1.0
+        for used in range(usable_rerolls + 1):
+            if hit > 0:
+                transitions.append(((main_value + 1, off_values, remaining_rerolls - used), miss * hit))
+            miss *= 1.0 - hit
+
+        # 所有尝试均未出现主攻流派：选择第一张卡牌，其分布与卡池中其他流派的权重成正比
+        off_total = total_weight - main_weight
+        if miss > 0 and off_total > 0:
+            for value, multiplicity in off_groups.items():
+                probability = miss * multiplicity * off_weights[value] / off_total
+                if probability == 0:
+                    continue
+                next_off = list(off_values)
+                next_off[next_off.index(value)] = value + 1
+                transitions.append(
+                    ((main_value, tuple(sorted(next_off)), remaining_rerolls - usable_rerolls), probability)
+                )
+
+        return transitions
+
+    def solve(self, character, draw_count, enable_reroll=True, max_rerolls=2):
+        """
+        精确求解每次抽卡后主攻流派属性值的分布
+
+        Args:
+            character: Character类实例
+            draw_count: 抽卡次数
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+
+        Returns:
+            list: 长度为draw_count+1的列表，第j项为第j次抽卡后的分布字典 {属性值: 概率}
+        """
+        initial_state, has_main = self._initial_state(character, max_rerolls)
+        states = {initial_state: 1.0}
+        distributions = [{initial_state[0]: 1.0}]
+        transition_cache = {}
+
+        for _ in range(draw_count):
+            next_states = {}
+            for state, probability in states.items():
+                if state not in transition_cache:
+                    transition_cache[state] = self._transitions(state, has_main, enable_reroll)
+                for next_state, transition_probability in transition_cache[state]:
+                    next_states[next_state] = next_states.get(next_state, 0.0) + probability * transition_probability
+            states = next_states
+
+            distribution = {}
+            for (main_value, _, _), probability in states.items():
+                distribution[main_value] = distribution.get(main_value, 0.0) + probability
+            distributions.append(dict(sorted(distribution.items())))
+
+        return distributions
+
+    def fill_character_stats(self, characters, character_stats, draw_count, enable_reroll=True, max_rerolls=2):
+        """
+        求解所有角色并写入character_stats（以概率代替计数，配合rounds=1使用）
+
+        Args:
+            characters: 角色列表
+            character_stats: float64直方图 (角色数, draw_count+1, 属性值个数)，见histogram.empty_histogram
+            draw_count: 抽卡次数
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        """
+        for i, character in enumerate(characters):
+            distributions = self.solve(character, draw_count, enable_reroll, max_rerolls)
+            # 与蒙特卡洛统计保持一致：第0次抽卡不记录
+            for draw in range(1, draw_count + 1):
+                for value, probability in distributions[draw].items():
+                    character_stats[i, draw, value] = probability
@@ -0,0 +1,260 @@
+import io
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from histogram import empty_histogram
+
+"""
+多进程分片模拟
+
+功能说明：
+- 将rounds拆分到ProcessPoolExecutor的多个进程中并行模拟
+- 所有分片共用主种子，各自模拟一段连续的轮次；每一轮的随机流由 (种子, 角色下标, 轮次) 确定
+- 分片只返回紧凑的逐次抽卡直方图或计数，由主进程按分片顺序合并
+- 主模拟器启用插桩时，分片同时返回计数器（消耗的重新roll次数、概率缓存命中等），合并到主进程的插桩中，
+  主进程每完成一个分片报告一次进度
+- 对相同的seed，结果与workers无关，与单进程模拟逐位一致
+"""
+
+
+def split_rounds(rounds, shards):
+    """
+    将总轮数尽量均匀地拆分为若干分片
+
+    Args:
+        rounds: 模拟总轮数
+        shards: 分片数量
+
+    Returns:
+        list: 每个分片的轮数
+    """
+    base, extra = divmod(rounds, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def shard_seeds(seed, shards):
+    """
+    由主种子派生每个分片的独立种子
+
+    Args:
+        seed: 主随机种子，None时使用系统熵
+        shards: 分片数量
+
+    Returns:
+        list: 每个分片的整数种子
+    """
+    children = np.random.SeedSequence(seed).spawn(shards)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+def _build_tasks(simulator, rounds, workers, seed, **options):
+    """
+    构造可以跨进程传递的分片任务
+
+    Args:
+        simulator: Simulator实例，提供概率分布与角色配置
+        rounds: 模拟总轮数
+        workers: 分片（进程）数量
+        seed: 主随机种子，None时使用模拟器的种子或生成新的种子
+        **options: 传递给分片的其他模拟参数
+
+    Returns:
+        list: 分片任务字典列表
+    """
+    characters = [
+        (character.attribute, character.get_level(), character.get_havetool())
+        for character in simulator.characters
+    ]
+    seed = simulator.resolve_seed(seed)
+    first_round = options.pop('first_round', 0)
+    tasks = []
+    for shard_rounds in split_rounds(rounds, workers):
+        task = {
+            'initial_value': simulator.pro_distribution.initial_value,
+            'ratio': simulator.pro_distribution.ratio,
+            'sampler': simulator.sampler_type,
+            'characters': characters,
+            'rounds': shard_rounds,
+            'seed': seed,
+            'first_round': first_round,
+            'instrument': simulator.instrument.enabled,
+        }
+        task.update(options)
+        tasks.append(task)
+        first_round += shard_rounds
+    return tasks
+
+
+def _shard_simulator(task):
+    """
+    在工作进程中根据任务重建模拟器
+
+    Args:
+        task: 分片任务字典
+
+    Returns:
+        Simulator: 使用主种子的模拟器，主模拟器启用插桩时带有只记录计数器的插桩
+    """
+    from simulator import Simulator
+    from ProDistribution import ProDistribution
+    from character import Character
+    from instrument import Instrument
+
+    # 分片的进度输出丢弃，由主进程按分片汇总报告
+    instrument = Instrument(stream=io.StringIO()) if task['instrument'] else None
+    simulator = Simulator(
+        ProDistribution(task['initial_value'], task['ratio']), seed=task['seed'], sampler=task['sampler'],
+        instrument=instrument
+    )
+    simulator.characters = [Character(*spec) for spec in task['characters']]
+    simulator.bind_characters()
+    return simulator
+
+
+def _shard_counters(simulator):
+    """
+    获取分片插桩的计数器，并加上分片概率分布的缓存命中次数
+
+    Args:
+        simulator: _shard_simulator返回的模拟器
+
+    Returns:
+        dict: 计数器字典，未启用插桩时为空字典
+    """
+    instrument = simulator.instrument
+    instrument.count('probability_cache_hits', simulator.pro_distribution.cache_hits)
+    instrument.count('probability_cache_misses', simulator.pro_distribution.cache_misses)
+    return instrument.summary().get('counters', {})
+
+
+def _run_stats_shard(task):
+    """工作进程：统计一个分片的逐次抽卡直方图，需要时同时返回每轮最终状态，以及分片的计数器"""
+    simulator = _shard_simulator(task)
+    final_states = [] if task['final_states'] else None
+    character_stats = simulator.collect_character_stats(
+        task['draw_count'], task['rounds'], task['enable_reroll'], task['max_rerolls'], task['engine'], task['seed'],
+        final_states, task['first_round']
+    )
+    return character_stats, final_states, _shard_counters(simulator)
+
+
+def _run_ratio_shard(task):
+    """工作进程：统计一个分片的达标轮数与没有主攻属性的轮数，以及分片的计数器"""
+    simulator = _shard_simulator(task)
+    ratio_counts = simulator.collect_ratio_counts(
+        task['draw_count'], task['rounds'], task['threshold'], task['enable_reroll'], task['max_rerolls'],
+        task['engine'], task['seed'], task['first_round']
+    )
+    return ratio_counts, _shard_counters(simulator)
+
+
+def _map_shards(function, tasks, workers):
+    """
+    执行所有分片任务，按分片顺序逐个产出结果
+
+    Args:
+        function: 工作进程函数
+        tasks: 分片任务列表
+        workers: 进程数，为1时在当前进程内执行
+
+    Yields:
+        每个分片的结果
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield function(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(function, tasks)
+
+
+def _merge_shard_counters(simulator, counters, done, rounds):
+    """
+    把分片的计数器合并到主模拟器的插桩中，并报告已完成的轮数
+
+    Args:
+        simulator: 主模拟器
+        counters: 分片返回的计数器
+        done: 已完成分片的累计轮数
+        rounds: 模拟总轮数
+    """
+    simulator.instrument.merge(counters)
+    simulator.instrument.progress('simulation', done, rounds)
+
+
+def collect_character_stats_sharded(simulator, draw_count, rounds, enable_reroll=True, max_rerolls=2,
+                                    engine='scalar', workers=1, seed=None, final_states=None, first_round=0):
+    """
+    多进程统计每次抽卡后主攻流派属性值的分布
+
+    Args:
+        simulator: Simulator实例
+        draw_count: 每轮抽卡次数
+        rounds: 模拟总轮数
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        engine: 模拟引擎，'scalar'或'batch'，默认'scalar'
+        workers: 进程数，默认1
+        seed: 主随机种子，默认None
+        final_states: 传入列表时，为每个角色追加按分片顺序拼接的 (流派列表, 最终属性值矩阵)，默认None
+        first_round: 第一轮的轮次，默认0
+
+    Returns:
+        ndarray: 合并后的直方图 (角色数, draw_count+1, 属性值个数)
+    """
+    tasks = _build_tasks(
+        simulator, rounds, workers, seed,
+        draw_count=draw_count, enable_reroll=enable_reroll, max_rerolls=max_rerolls, engine=engine,
+        final_states=final_states is not None, first_round=first_round
+    )
+    # 各分片的直方图形状相同，直接相加
+    character_stats = empty_histogram(simulator.characters, draw_count)
+    shard_final_states = []
+    done = 0
+    for task, (shard_stats, shard_states, counters) in zip(tasks, _map_shards(_run_stats_shard, tasks, workers)):
+        character_stats += shard_stats
+        shard_final_states.append(shard_states)
+        done += task['rounds']
+        _merge_shard_counters(simulator, counters, done, rounds)
+
+    if final_states is not None:
+        for i in range(len(simulator.characters)):
+            styles = shard_final_states[0][i][0]
+            final_states.append((styles, np.concatenate([states[i][1] for states in shard_final_states])))
+    return character_stats
+
+
+def collect_ratio_counts_sharded(simulator, draw_count, rounds, threshold, enable_reroll=True, max_rerolls=2,
+                                 engine='scalar', workers=1, seed=None, first_round=0):
+    """
+    多进程统计每个角色的达标轮数与没有主攻属性的轮数
+
+    Args:
+        simulator: Simulator实例
+        draw_count: 每轮抽卡次数
+        rounds: 模拟总轮数
+        threshold: 阈值
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        engine: 模拟引擎，'scalar'或'batch'，默认'scalar'
+        workers: 进程数，默认1
+        seed: 主随机种子，默认None
+        first_round: 第一轮的轮次，默认0
+
+    Returns:
+        list: 每个角色的 (属性值>threshold的轮数, 没有主攻属性的轮数)
+    """
+    tasks = _build_tasks(
+        simulator, rounds, workers, seed,
+        draw_count=draw_count, threshold=threshold, enable_reroll=enable_reroll, max_rerolls=max_rerolls,
+        engine=engine, first_round=first_round
+    )
+    ratio_counts = [(0, 0)] * len(simulator.characters)
+    done = 0
+    for task, (shard_counts, counters) in zip(tasks, _map_shards(_run_ratio_shard, tasks, workers)):
+        ratio_counts = [
+            (success + shard_success, no_main + shard_no_main)
+            for (success, no_main), (shard_success, shard_no_main) in zip(ratio_counts, shard_counts)
+        ]
+        done += task['rounds']
+        _merge_shard_counters(simulator, counters, done, rounds)
+    return ratio_counts
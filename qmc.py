@@ -0,0 +1,218 @@
+import warnings
+import numpy as np
+from batch_engine import BatchEngine
+from histogram import empty_histogram, trim_histogram
+from round_rng import UNIFORMS_PER_BLOCK
+
+"""
+随机化拟蒙特卡洛（Sobol序列）抽样
+
+功能说明：
+- 用打乱（scrambled）的Sobol低差异序列代替伪随机数驱动批量引擎：每一轮是序列中的一个点，
+  每一维对应一个卡牌位置（第d次抽卡第一手牌的3张卡依次占第3d~3d+2维，其后是重新roll手牌的各维）
+- 总轮数分成若干个独立打乱的重复（replicate），每个重复的打乱由 (种子, 角色下标, 重复序号) 确定；
+  由各重复估计值之间的差异估计每个统计单元格的方差，并与相同轮数的普通蒙特卡洛比较
+- 需要scipy（只在使用'qmc'引擎时导入）；每个重复的轮数取2的幂时序列的均衡性最好
+"""
+
+# 默认的重复数
+DEFAULT_REPLICATES = 8
+
+
+class SobolStream:
+    """随机化Sobol序列 - 提供与RoundRandom.uniforms相同的接口，供批量引擎使用"""
+
+    def __init__(self, seed, rounds_per_replicate):
+        """
+        初始化序列
+
+        Args:
+            seed: 随机种子，决定每个重复的打乱方式
+            rounds_per_replicate: 每个重复的轮数；第r轮属于第r//rounds_per_replicate个重复
+        """
+        self.seed = seed
+        self.rounds_per_replicate = rounds_per_replicate
+        self._engines = {}
+
+    def _engine(self, character_index, replicate, dimensions, point):
+        """获取定位到指定点的Sobol生成器（按顺序使用时复用上一次的生成器）"""
+        from scipy.stats import qmc
+
+        key = (character_index, replicate, dimensions)
+        engine = self._engines.get(key)
+        if engine is None or engine.num_generated != point:
+            rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(character_index, replicate)))
+            engine = qmc.Sobol(dimensions, scramble=True, seed=rng)
+            if point:
+                engine.fast_forward(point)
+            self._engines[key] = engine
+        return engine
+
+    def uniforms(self, character_index, first_round, rounds, blocks):
+        """
+        生成连续若干轮的Sobol点
+
+        Args:
+            character_index: 角色下标
+            first_round: 第一轮的轮次
+            rounds: 轮数
+            blocks: 每轮块数（round_blocks的返回值）
+
+        Returns:
+            tuple: (hands, rerolls)，含义与RoundRandom.uniforms相同
+        """
+        hand_width, reroll_width = (block * UNIFORMS_PER_BLOCK for block in blocks)
+        dimensions = hand_width + reroll_width
+        parts = []
+        round_index, end = first_round, first_round + rounds
+        while round_index < end:
+            replicate, point = divmod(round_index, self.rounds_per_replicate)
+            count = min(end - round_index, self.rounds_per_replicate - point)
+            with warnings.catch_warnings():
+                # 点数不是2的幂时scipy会提示均衡性变差，结果仍然有效
+                warnings.simplefilter('ignore', UserWarning)
+                parts.append(self._engine(character_index, replicate, dimensions, point).random(count))
+            round_index += count
+        points = np.concatenate(parts) if parts else np.zeros((0, dimensions))
+        return points[:, :hand_width], points[:, hand_width:]
+
+
+def _proportions(replicate_stats):
+    """
+    把各重复的直方图按轮数归一化
+
+    Returns:
+        ndarray: 比例 (重复数, 角色数, draw_count+1, 属性值个数)
+    """
+    histograms = np.stack(replicate_stats).astype(np.float64)
+    totals = histograms.sum(axis=3, keepdims=True)
+    return np.divide(histograms, totals, out=np.zeros_like(histograms), where=totals > 0)
+
+
+def replicate_report(proportions, rounds_per_replicate):
+    """
+    由各重复的比例估计值计算标准误，并与普通蒙特卡洛比较
+
+    Args:
+        proportions: 各重复的比例估计值 (重复数, ...)
+        rounds_per_replicate: 每个重复的轮数
+
+    Returns:
+        dict: 'replicates'、'rounds_per_replicate'、
+            'standard_errors'（合并估计值的标准误，形状同单个重复的估计值）、
+            'max_standard_error'、'mean_standard_error'、
+            'median_variance_reduction'（相同总轮数下普通蒙特卡洛方差与本次方差之比的中位数，
+            即普通蒙特卡洛达到相同精度约需的轮数倍数；没有可比较的单元格时为None）
+    """
+    replicates = proportions.shape[0]
+    mean = proportions.mean(axis=0)
+    variance = proportions.var(axis=0, ddof=1) / replicates if replicates > 1 else np.full(mean.shape, np.nan)
+    binomial_variance = mean * (1 - mean) / (replicates * rounds_per_replicate)
+    comparable = (variance > 0) & (binomial_variance > 0)
+    standard_errors = np.sqrt(variance)
+    return {
+        'replicates': replicates,
+        'rounds_per_replicate': rounds_per_replicate,
+        'standard_errors': standard_errors.tolist(),
+        'max_standard_error': float(np.nanmax(standard_errors, initial=0.0)),
+        'mean_standard_error': float(np.nanmean(standard_errors)) if standard_errors.size else 0.0,
+        'median_variance_reduction': (
+            float(np.median(binomial_variance[comparable] / variance[comparable])) if comparable.any() else None
+        ),
+    }
+
+
+def qmc_character_stats(simulator, draw_count, rounds, enable_reroll=True, max_rerolls=2, seed=None,
+                        replicates=DEFAULT_REPLICATES, final_states=None):
+    """
+    用随机化Sobol序列统计每次抽卡后主攻流派属性值的分布
+
+    Args:
+        simulator: Simulator实例
+        draw_count: 每轮抽卡次数
+        rounds: 模拟轮数，向上取整为replicates的倍数
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        seed: 随机种子，默认None（使用模拟器的种子，都没有时生成新的种子）
+        replicates: 独立打乱的重复数，默认DEFAULT_REPLICATES
+        final_states: 传入列表时，为每个角色追加 (流派列表, 最终属性值矩阵 (轮数, 流派数))，默认None
+
+    Returns:
+        tuple: (character_stats, 实际轮数, 重复报告)，重复报告见replicate_report，
+            标准误的形状为 (角色数, draw_count+1, 属性值个数)
+    """
+    if replicates < 1:
+        raise ValueError(f"重复数 '{replicates}' 必须为正整数")
+    seed = simulator.resolve_seed(seed)
+    rounds_per_replicate = -(-rounds // replicates)
+    batch_engine = BatchEngine(
+        simulator.pro_distribution, seed=seed, instrument=simulator.instrument,
+        stream=SobolStream(seed, rounds_per_replicate)
+    )
+
+    character_stats = empty_histogram(simulator.characters, draw_count)
+    replicate_stats = []
+    replicate_states = [] if final_states is not None else None
+    for r in range(replicates):
+        stats = empty_histogram(simulator.characters, draw_count)
+        states = [] if final_states is not None else None
+        batch_engine.fill_character_stats(
+            simulator.characters, stats, draw_count, rounds_per_replicate, enable_reroll, max_rerolls, states,
+            r * rounds_per_replicate
+        )
+        character_stats += stats
+        replicate_stats.append(stats)
+        if states is not None:
+            replicate_states.append(states)
+
+    if final_states is not None:
+        for i, (styles, _) in enumerate(replicate_states[0]):
+            final_states.append((styles, np.concatenate([states[i][1] for states in replicate_states])))
+
+    # 标准误与保存的结果一样去掉末尾全为0的属性值列
+    width = trim_histogram(character_stats).shape[2]
+    report = replicate_report(_proportions(replicate_stats)[..., :width], rounds_per_replicate)
+    return character_stats, rounds_per_replicate * replicates, report
+
+
+def qmc_ratio_counts(simulator, draw_count, rounds, threshold, enable_reroll=True, max_rerolls=2, seed=None,
+                     replicates=DEFAULT_REPLICATES):
+    """
+    用随机化Sobol序列统计每个角色的达标轮数与没有主攻属性的轮数
+
+    Args:
+        simulator: Simulator实例
+        draw_count: 每轮抽卡次数
+        rounds: 模拟轮数，向上取整为replicates的倍数
+        threshold: 阈值
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+        seed: 随机种子，默认None（使用模拟器的种子，都没有时生成新的种子）
+        replicates: 独立打乱的重复数，默认DEFAULT_REPLICATES
+
+    Returns:
+        tuple: (ratio_counts, 实际轮数, 重复报告)，标准误为每个角色达标比例的标准误 (角色数,)
+    """
+    if replicates < 1:
+        raise ValueError(f"重复数 '{replicates}' 必须为正整数")
+    seed = simulator.resolve_seed(seed)
+    rounds_per_replicate = -(-rounds // replicates)
+    batch_engine = BatchEngine(
+        simulator.pro_distribution, seed=seed, instrument=simulator.instrument,
+        stream=SobolStream(seed, rounds_per_replicate)
+    )
+
+    # 每个重复、每个角色的 (达标轮数, 没有主攻属性的轮数)
+    counts = np.zeros((replicates, len(simulator.characters), 2), dtype=np.int64)
+    for r in range(replicates):
+        for i, character in enumerate(simulator.characters):
+            for main_values, _ in batch_engine.iter_chunks(
+                character, draw_count, rounds_per_replicate, enable_reroll, max_rerolls, i, r * rounds_per_replicate
+            ):
+                final_values = main_values[:, -1]
+                counts[r, i, 0] += int((final_values > threshold).sum())
+                counts[r, i, 1] += int((final_values == 0).sum())
+
+    ratio_counts = [(int(success), int(no_main)) for success, no_main in counts.sum(axis=0)]
+    report = replicate_report(counts[:, :, 0] / rounds_per_replicate, rounds_per_replicate)
+    return ratio_counts, rounds_per_replicate * replicates, report
@@ -0,0 +1,265 @@
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from instrument import NULL_INSTRUMENT
+from write import (register_style, apply_registered_style, write_registered_cell, get_max_value_style_key,
+                   get_gacha_legend_rows, apply_data_bars, HEADER_STYLE_KEY, PERCENTAGE_STYLE_KEY)
+
+"""
+Excel报告生成
+
+功能说明：
+- 先计算每个等级工作表中所有单元格的最终位置与最终样式
+- 每个单元格只写入一次，不再经过DataFrame、插入行和二次改写
+- 生成的工作簿与原先DataFrame方式生成的结果一致
+- 可选流式写入模式（openpyxl write_only）：按行号顺序逐行输出，内存占用与表格大小无关
+"""
+
+# 需要标记最大值的gacha次数
+GACHA_HIGHLIGHTS = [12, 15, 20]
+
+# 工作表处理顺序
+LEVEL_ORDER = [35, 18, 5]
+
+# 角色信息样式
+INFO_STYLE = {
+    'font': {
+        'name': '微软雅黑',
+        'size': 12,
+        'bold': True
+    },
+    'fill': {
+        'type': 'solid',
+        'color': 'E6E6FA'
+    }
+}
+
+# 无灵器/有灵器标题样式
+TOOL_TITLE_STYLES = {
+    "无灵器": {
+        'font': {
+            'name': '微软雅黑',
+            'size': 12,
+            'bold': True
+        },
+        'fill': {
+            'type': 'solid',
+            'color': 'FFE6CC'
+        }
+    },
+    "有灵器": {
+        'font': {
+            'name': '微软雅黑',
+            'size': 12,
+            'bold': True
+        },
+        'fill': {
+            'type': 'solid',
+            'color': 'E6F3FF'
+        }
+    }
+}
+
+INFO_STYLE_KEY = register_style(INFO_STYLE)
+TOOL_TITLE_STYLE_KEYS = {text: register_style(style) for text, style in TOOL_TITLE_STYLES.items()}
+
+# 表头所在行与数据起始行
+HEADER_ROW = 4
+DATA_START_ROW = 5
+
+
+class LevelSheetLayout:
+    """单个等级工作表的布局"""
+
+    def __init__(self, level, characters, histogram, draw_count, rounds, precision=None):
+        """
+        计算工作表布局
+
+        Args:
+            level: 等级
+            characters: 该等级的 [(角色下标, 角色), ...]
+            histogram: 直方图 (角色数, draw_count+1, 属性值个数)
+            draw_count: 抽卡次数
+            rounds: 模拟轮数
+            precision: 自适应模拟的精度报告（见adaptive模块），默认None
+        """
+        self.level = level
+        self.sheet_name = f"等级{level}"
+        self.draw_count = draw_count
+        self.rounds = rounds
+        self.ratios = histogram / rounds
+
+        # 第3行记录本表角色达到的精度
+        self.precision_text = None
+        if precision is not None:
+            half_width = max(precision['half_widths'][char_idx] for char_idx, _ in characters)
+            status = "已达到" if half_width <= precision['half_width'] else "未达到"
+            self.precision_text = (
+                f"{precision['confidence']:.0%}置信区间最大半宽 ±{half_width:.2%}"
+                f"（{precision['rounds']}轮，目标±{precision['half_width']:.2%}，{status}）"
+            )
+
+        # 获取该等级所有角色可能的属性值
+        indices = [char_idx for char_idx, _ in characters]
+        self.all_values = np.flatnonzero(histogram[indices].any(axis=(0, 1))).tolist()
+
+        # 列名：第一列为标签，之后每列对应一次抽卡
+        self.columns = [''] + [f"The {j}th gacha" for j in range(draw_count + 1)]
+
+        # 每种tool状态对应的角色（同一状态有多个角色时以最后一个为准）
+        tool_characters = {}
+        for char_idx, character in characters:
+            havetool_text = "有灵器" if character.get_havetool() else "无灵器"
+            tool_characters[havetool_text] = char_idx
+
+        # 上下摆放：无灵器在上，有灵器在下，中间空一行
+        self.blocks = []
+        current_row = DATA_START_ROW
+        for havetool_text in ("无灵器", "有灵器"):
+            if havetool_text not in tool_characters:
+                continue
+            if self.blocks:
+                current_row += 1
+            self.blocks.append((havetool_text, tool_characters[havetool_text], current_row))
+            current_row += 1 + len(self.all_values)
+
+        self.data_end_row = current_row - 1
+        self.data_end_col = len(self.columns)
+        self.legend_start_row = self.data_end_row + 3
+
+        # 每个块在gacha=12, 15, 20列的最大值
+        self.max_values = {}
+        for _, char_idx, _ in self.blocks:
+            for gacha_num in GACHA_HIGHLIGHTS:
+                if gacha_num <= draw_count:
+                    ratios = [self.get_ratio(char_idx, gacha_num, value) for value in self.all_values]
+                    self.max_values[(char_idx, gacha_num)] = max(ratios, default=0)
+
+    def get_ratio(self, char_idx, draw, value):
+        """
+        获取某角色第draw次抽卡后主攻流派属性值为value的比例
+
+        Args:
+            char_idx: 角色下标
+            draw: 抽卡次数
+            value: 主攻流派属性值
+
+        Returns:
+            float: 比例
+        """
+        return self.ratios[char_idx, draw, value].item()
+
+    def iter_rows(self):
+        """
+        按行号顺序生成工作表的所有单元格（包括表格下方的图例）
+
+        Yields:
+            tuple: (行号, [(列号, 内容, 样式键), ...])，每行内按列号升序，样式键为None表示不设置样式
+        """
+        yield 1, [(1, f"等级 {self.level} 角色数据", INFO_STYLE_KEY)]
+        yield 2, [(1, f"包含无灵器和有灵器两种状态", INFO_STYLE_KEY)]
+        if self.precision_text is not None:
+            yield 3, [(1, self.precision_text, None)]
+        yield HEADER_ROW, [(col_idx, col_name, HEADER_STYLE_KEY) for col_idx, col_name in enumerate(self.columns, 1)]
+
+        for havetool_text, char_idx, title_row in self.blocks:
+            yield title_row, [(1, havetool_text, TOOL_TITLE_STYLE_KEYS[havetool_text])]
+
+            for row_offset, value in enumerate(self.all_values, 1):
+                cells = [(1, f"aimming_level{value}", None)]
+                for draw in range(self.draw_count + 1):
+                    ratio = self.get_ratio(char_idx, draw, value)
+                    if (char_idx, draw) in self.max_values and ratio == self.max_values[(char_idx, draw)]:
+                        cells.append((draw + 2, ratio, get_max_value_style_key(draw)))
+                    else:
+                        cells.append((draw + 2, ratio, PERCENTAGE_STYLE_KEY))
+                yield title_row + row_offset, cells
+
+        for row_offset, cells in enumerate(get_gacha_legend_rows(1)):
+            yield self.legend_start_row + row_offset, cells
+
+
+def _write_layout_sheet(worksheet, layout):
+    """
+    按单元格地址写入一个工作表（普通模式）
+
+    Args:
+        worksheet: openpyxl工作表对象
+        layout: LevelSheetLayout实例
+    """
+    for row, cells in layout.iter_rows():
+        for col, content, style_key in cells:
+            write_registered_cell(worksheet, f"{get_column_letter(col)}{row}", content, style_key)
+
+
+def _stream_layout_sheet(worksheet, layout):
+    """
+    按行号顺序逐行追加一个工作表（流式模式），空行与空单元格以None占位
+
+    Args:
+        worksheet: write_only工作簿中的工作表对象
+        layout: LevelSheetLayout实例
+    """
+    next_row = 1
+    for row, cells in layout.iter_rows():
+        while next_row < row:
+            worksheet.append([])
+            next_row += 1
+
+        values = [None] * cells[-1][0]
+        for col, content, style_key in cells:
+            cell = WriteOnlyCell(worksheet, content)
+            if style_key is not None:
+                apply_registered_style(cell, style_key)
+            values[col - 1] = cell
+        worksheet.append(values)
+        next_row += 1
+
+
+def write_report(filename, characters, histogram, draw_count, rounds, write_only=False, precision=None,
+                 instrument=None):
+    """
+    生成Excel文件，包含所有角色的抽卡统计数据
+
+    Args:
+        filename: 输出文件名
+        characters: 角色列表（需提供get_level()与get_havetool()）
+        histogram: 直方图 (角色数, draw_count+1, 属性值个数)，见SimulationArtifact
+        draw_count: 抽卡次数
+        rounds: 模拟轮数
+        write_only: 是否使用流式写入模式，默认False
+        precision: 自适应模拟的精度报告，给定时写入每个工作表的第3行，默认None
+        instrument: Instrument实例，记录'layout'与'save'阶段的用时及写入的单元格数，默认None
+    """
+    instrument = instrument if instrument is not None else NULL_INSTRUMENT
+
+    # 按等级分组角色
+    level_groups = {}
+    for i, character in enumerate(characters):
+        level_groups.setdefault(character.get_level(), []).append((i, character))
+
+    with instrument.phase('layout'):
+        workbook = Workbook(write_only=write_only)
+        if not write_only:
+            workbook.remove(workbook.active)
+
+        # 按指定顺序处理等级：35, 18, 5
+        for level in LEVEL_ORDER:
+            if level not in level_groups:
+                continue
+            layout = LevelSheetLayout(level, level_groups[level], histogram, draw_count, rounds, precision)
+            worksheet = workbook.create_sheet(layout.sheet_name)
+
+            # 添加数据条（条件格式在保存时写出，可以先于数据添加）
+            apply_data_bars(worksheet, DATA_START_ROW, 2, layout.data_end_row, layout.data_end_col)
+
+            # 写入数据与图例
+            if write_only:
+                _stream_layout_sheet(worksheet, layout)
+            else:
+                _write_layout_sheet(worksheet, layout)
+            instrument.count('cells', len(layout.blocks) * len(layout.all_values) * (draw_count + 1))
+
+    with instrument.phase('save'):
+        workbook.save(filename)
@@ -0,0 +1,446 @@
+from statistics import NormalDist
+import argparse
+import csv
+import json
+import numpy as np
+from ProDistribution import ProDistribution
+from batch_engine import BatchEngine
+
+"""
+似然比重新加权
+
+功能说明：
+- 单张卡牌的概率为 ratio**v / Σ(卡池内 ratio**v_s)（属性值0的权重initial_value与 initial_value*ratio**0 相同），
+  initial_value在分子分母中抵消，结果对initial_value的灵敏度恒为0
+- 批量模拟时可以记录每一轮抽到的全部手牌（含重新roll）在一组ratio网格下的对数概率，以及对ratio的得分
+  d log p / d ratio；重新roll与选卡规则只取决于抽到的卡牌，不影响似然比
+- 对网格范围内任意ratio，每一轮的对数概率按相邻网格点插值，用自归一化权重重新加权已保存的结果，
+  得到该ratio下的分布，无需重新模拟；有效样本量（ESS）低于阈值时不输出估计值
+- 灵敏度 d 结果 / d ratio 用得分函数估计：Cov(结果, 得分)
+- 模拟结果可以保存为.npz文件（不依赖pickle），之后用 --from 读取并换一组目标ratio重新加权，无需重新模拟
+
+用法示例：
+    python reweight.py --ratio 0.6 --rounds 200000 --target 0.58 0.62 0.65 --seed 1 --output reweight_results.csv
+    python reweight.py --ratio 0.6 --rounds 200000 --seed 1 --artifact reweight_run.npz
+    python reweight.py --from reweight_run.npz --target 0.57 0.63 --threshold 9
+"""
+
+# 默认的ratio网格：基准值两侧各DEFAULT_SPAN，间隔DEFAULT_STEP
+DEFAULT_SPAN = 0.05
+DEFAULT_STEP = 0.01
+
+# 默认的有效样本量下限（占轮数的比例）
+DEFAULT_MIN_ESS_FRACTION = 0.1
+
+# 插值使用的相邻网格点数
+INTERPOLATION_POINTS = 4
+
+# 汇总表的列
+SUMMARY_COLUMNS = [
+    'ratio', 'character', 'attribute', 'level', 'havetool', 'rounds', 'ess', 'reliable',
+    'mean_value', 'p_zero', 'threshold', 'p_above_threshold',
+]
+
+
+def ratio_grid(base_ratio, span=DEFAULT_SPAN, step=DEFAULT_STEP):
+    """
+    生成包含基准值的ratio网格
+
+    Args:
+        base_ratio: 基准ratio
+        span: 两侧的范围，默认DEFAULT_SPAN
+        step: 间隔，默认DEFAULT_STEP
+
+    Returns:
+        ndarray: 升序的ratio网格（只保留(0, 1]内的值）
+    """
+    steps = int(round(span / step))
+    grid = base_ratio + step * np.arange(-steps, steps + 1)
+    return grid[(grid > 0) & (grid <= 1)]
+
+
+class LikelihoodRecord:
+    """对数概率记录 - 批量引擎在抽卡时累加每一轮手牌在一组ratio下的对数概率与得分"""
+
+    def __init__(self, ratios, base_ratio):
+        """
+        初始化记录
+
+        Args:
+            ratios: ratio网格
+            base_ratio: 模拟使用的ratio（得分在此处计算），须在网格中
+        """
+        self.ratios = np.asarray(ratios, dtype=np.float64)
+        self.base_ratio = base_ratio
+        self.base_index = int(np.argmin(np.abs(self.ratios - base_ratio)))
+        if not np.isclose(self.ratios[self.base_index], base_ratio):
+            raise ValueError(f"ratio网格中没有基准值 '{base_ratio}'")
+        self.log_ratios = np.log(self.ratios)
+        self._powers = np.ones((1, self.ratios.size))
+        self.log_probabilities = None
+        self.scores = None
+
+    def _power_table(self, max_value):
+        """获取 ratio**属性值 的查找表 (属性值个数, 网格点数)"""
+        if self._powers.shape[0] <= max_value:
+            self._powers = np.power.outer(self.ratios, np.arange(max_value + 1)).T
+        return self._powers
+
+    def begin_chunk(self, size):
+        """
+        开始记录一块轮次
+
+        Args:
+            size: 本块轮数
+        """
+        self.log_probabilities = np.zeros((size, self.ratios.size))
+        self.scores = np.zeros(size)
+
+    def begin_draw(self, pool_values, pool_mask):
+        """
+        计算本次抽卡每一轮卡池的归一化常数
+
+        Args:
+            pool_values: 每个流派的属性值 (轮数, 流派数)
+            pool_mask: 流派是否在卡池中 (轮数, 流派数)
+        """
+        powers = self._power_table(int(pool_values.max(initial=0)))[pool_values] * pool_mask[:, :, None]
+        normalizer = powers.sum(axis=1)
+        self._log_normalizer = np.log(normalizer)
+        base = powers[:, :, self.base_index]
+        # d/d ratio log Σ ratio**v = Σ v*ratio**(v-1) / Σ ratio**v
+        self._score_normalizer = (pool_values * base).sum(axis=1) / (normalizer[:, self.base_index] * self.base_ratio)
+
+    def add_hands(self, rows, card_values):
+        """
+        累加一手牌（三张）的对数概率与得分
+
+        Args:
+            rows: 抽这手牌的轮的下标
+            card_values: 抽到的三张卡牌的属性值 (len(rows), 3)
+        """
+        value_sum = card_values.sum(axis=1)
+        self.log_probabilities[rows] += value_sum[:, None] * self.log_ratios - 3 * self._log_normalizer[rows]
+        self.scores[rows] += value_sum / self.base_ratio - 3 * self._score_normalizer[rows]
+
+
+class ReweightedRun:
+    """可重新加权的模拟结果 - 保存逐轮主攻流派属性值与对数似然比，估计附近ratio下的分布与灵敏度"""
+
+    def __init__(self, characters, draw_count, initial_value, base_ratio, ratios, main_values, log_likelihoods,
+                 scores, seed=None):
+        """
+        初始化结果
+
+        Args:
+            characters: 角色规格列表 [(属性, 等级, havetool), ...]
+            draw_count: 每轮抽卡次数
+            initial_value: 模拟使用的initial_value
+            base_ratio: 模拟使用的ratio
+            ratios: ratio网格
+            main_values: 每个角色的主攻流派属性值矩阵 (轮数, draw_count+1)
+            log_likelihoods: 每个角色每一轮在各网格点与基准之间的对数似然比 (轮数, 网格点数)
+            scores: 每个角色每一轮的得分 d log p / d ratio (轮数,)
+            seed: 随机种子，默认None
+        """
+        self.characters = characters
+        self.draw_count = draw_count
+        self.initial_value = initial_value
+        self.base_ratio = base_ratio
+        self.ratios = np.asarray(ratios, dtype=np.float64)
+        self.main_values = main_values
+        self.log_likelihoods = log_likelihoods
+        self.scores = scores
+        self.seed = seed
+        self.value_count = max(int(values.max(initial=0)) for values in main_values) + 1
+
+    @classmethod
+    def simulate(cls, simulator, draw_count=15, rounds=100000, ratios=None, enable_reroll=True, max_rerolls=2,
+                 seed=None, chunk_size=8192):
+        """
+        用批量引擎模拟并记录每一轮的对数概率
+
+        Args:
+            simulator: Simulator实例，提供概率分布（基准ratio）与角色
+            draw_count: 每轮抽卡次数，默认15次
+            rounds: 模拟轮数，默认100000轮
+            ratios: ratio网格，默认None（ratio_grid(基准ratio)），基准值会自动加入
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            seed: 随机种子，默认None（使用模拟器的种子，都没有时生成新的种子）
+            chunk_size: 每块同时推进的轮数，默认8192
+
+        Returns:
+            ReweightedRun: 模拟结果
+        """
+        pro_distribution = simulator.pro_distribution
+        base_ratio = pro_distribution.ratio
+        grid = ratio_grid(base_ratio) if ratios is None else np.asarray(ratios, dtype=np.float64)
+        if not np.isclose(grid, base_ratio).any():
+            grid = np.append(grid, base_ratio)
+        grid = np.sort(grid)
+        seed = simulator.resolve_seed(seed)
+        batch_engine = BatchEngine(pro_distribution, chunk_size, seed, simulator.instrument)
+
+        main_values, log_likelihoods, scores = [], [], []
+        for i, character in enumerate(simulator.characters):
+            record = LikelihoodRecord(grid, base_ratio)
+            value_chunks, log_chunks, score_chunks = [], [], []
+            for first_round in range(0, rounds, chunk_size):
+                size = min(chunk_size, rounds - first_round)
+                values, _ = batch_engine.simulate_chunk(
+                    character, size, draw_count, enable_reroll, max_rerolls, i, first_round, likelihood=record
+                )
+                value_chunks.append(values.astype(np.int16))
+                log_chunks.append(record.log_probabilities - record.log_probabilities[:, [record.base_index]])
+                score_chunks.append(record.scores)
+            main_values.append(np.concatenate(value_chunks))
+            log_likelihoods.append(np.concatenate(log_chunks))
+            scores.append(np.concatenate(score_chunks))
+
+        characters = [(c.attribute, c.get_level(), c.get_havetool()) for c in simulator.characters]
+        return cls(characters, draw_count, pro_distribution.initial_value, base_ratio, grid, main_values,
+                   log_likelihoods, scores, seed)
+
+    def save(self, filename):
+        """
+        以NumPy .npz格式保存结果（不依赖pickle）
+
+        Args:
+            filename: 输出文件名
+        """
+        header = {
+            'characters': self.characters,
+            'draw_count': self.draw_count,
+            'initial_value': self.initial_value,
+            'base_ratio': self.base_ratio,
+            'seed': self.seed,
+        }
+        arrays = {'header': np.array(json.dumps(header, ensure_ascii=False)), 'ratios': self.ratios}
+        for i in range(len(self.characters)):
+            arrays[f'main_values_{i}'] = self.main_values[i]
+            arrays[f'log_likelihoods_{i}'] = self.log_likelihoods[i]
+            arrays[f'scores_{i}'] = self.scores[i]
+        np.savez(filename, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        读取save保存的结果
+
+        Args:
+            filename: 结果文件名
+
+        Returns:
+            ReweightedRun: 模拟结果
+        """
+        with np.load(filename, allow_pickle=False) as data:
+            header = json.loads(data['header'].item())
+            count = len(header['characters'])
+            return cls(
+                [tuple(spec) for spec in header['characters']], header['draw_count'], header['initial_value'],
+                header['base_ratio'], data['ratios'], [data[f'main_values_{i}'] for i in range(count)],
+                [data[f'log_likelihoods_{i}'] for i in range(count)], [data[f'scores_{i}'] for i in range(count)],
+                header['seed']
+            )
+
+    @property
+    def rounds(self):
+        """模拟轮数"""
+        return self.main_values[0].shape[0] if self.main_values else 0
+
+    def log_weights(self, character_index, ratio):
+        """
+        每一轮从基准ratio到目标ratio的对数似然比（在相邻网格点之间插值）
+
+        Args:
+            character_index: 角色下标
+            ratio: 目标ratio，须在网格范围内
+
+        Returns:
+            ndarray: 对数似然比 (轮数,)
+        """
+        if not self.ratios[0] - 1e-12 <= ratio <= self.ratios[-1] + 1e-12:
+            raise ValueError(f"ratio '{ratio}' 超出网格范围 [{self.ratios[0]:g}, {self.ratios[-1]:g}]")
+        # 取最近的若干个网格点做拉格朗日插值，目标在网格点上时结果精确
+        nearest = np.sort(np.argsort(np.abs(self.ratios - ratio))[:INTERPOLATION_POINTS])
+        points = self.ratios[nearest]
+        coefficients = np.array([
+            np.prod([(ratio - points[k]) / (points[j] - points[k]) for k in range(points.size) if k != j])
+            for j in range(points.size)
+        ])
+        return self.log_likelihoods[character_index][:, nearest] @ coefficients
+
+    def weights(self, character_index, ratio):
+        """
+        自归一化的重新加权权重
+
+        Args:
+            character_index: 角色下标
+            ratio: 目标ratio
+
+        Returns:
+            tuple: (权重 (轮数,)，和为1, 有效样本量)
+        """
+        log_weights = self.log_weights(character_index, ratio)
+        weights = np.exp(log_weights - log_weights.max())
+        weights /= weights.sum()
+        return weights, 1.0 / np.square(weights).sum()
+
+    def distribution(self, ratio, min_ess_fraction=DEFAULT_MIN_ESS_FRACTION):
+        """
+        估计目标ratio下每次抽卡后主攻流派属性值的分布
+
+        Args:
+            ratio: 目标ratio
+            min_ess_fraction: 有效样本量下限（占轮数的比例），低于下限的角色估计值为NaN，默认DEFAULT_MIN_ESS_FRACTION
+
+        Returns:
+            tuple: (比例 (角色数, draw_count+1, 属性值个数), 每个角色的有效样本量 (角色数,))
+        """
+        proportions = np.full((len(self.characters), self.draw_count + 1, self.value_count), np.nan)
+        ess = np.zeros(len(self.characters))
+        for i, values in enumerate(self.main_values):
+            weights, ess[i] = self.weights(i, ratio)
+            if ess[i] < min_ess_fraction * self.rounds:
+                continue
+            for draw in range(self.draw_count + 1):
+                proportions[i, draw] = np.bincount(values[:, draw], weights=weights, minlength=self.value_count)
+        return proportions, ess
+
+    def sensitivity(self, outcome, confidence=0.95):
+        """
+        用得分函数估计基准ratio处 d E[结果] / d ratio
+
+        Args:
+            outcome: 函数，接收主攻流派属性值矩阵 (轮数, draw_count+1)，返回每一轮的结果 (轮数,)
+            confidence: 置信水平，默认0.95
+
+        Returns:
+            list: 每个角色的 (导数估计值, 置信区间半宽)
+        """
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        results = []
+        for values, scores in zip(self.main_values, self.scores):
+            outcomes = np.asarray(outcome(values), dtype=np.float64)
+            products = (outcomes - outcomes.mean()) * (scores - scores.mean())
+            results.append((float(products.mean()), z * float(products.std(ddof=1) / np.sqrt(products.size))))
+        return results
+
+    def summarize(self, ratios, threshold=7, min_ess_fraction=DEFAULT_MIN_ESS_FRACTION):
+        """
+        汇总每个目标ratio下每个角色最后一次抽卡后的指标
+
+        Args:
+            ratios: 目标ratio列表
+            threshold: 统计p_above_threshold使用的阈值，默认7
+            min_ess_fraction: 有效样本量下限（占轮数的比例），默认DEFAULT_MIN_ESS_FRACTION
+
+        Returns:
+            list: 汇总表的行（字典），见SUMMARY_COLUMNS
+        """
+        values = np.arange(self.value_count)
+        rows = []
+        for ratio in ratios:
+            proportions, ess = self.distribution(ratio, min_ess_fraction)
+            for i, (attribute, level, havetool) in enumerate(self.characters):
+                final = proportions[i, self.draw_count]
+                rows.append({
+                    'ratio': float(ratio),
+                    'character': i,
+                    'attribute': attribute,
+                    'level': level,
+                    'havetool': havetool,
+                    'rounds': self.rounds,
+                    'ess': float(ess[i]),
+                    'reliable': bool(ess[i] >= min_ess_fraction * self.rounds),
+                    'mean_value': float(final @ values),
+                    'p_zero': float(final[0]),
+                    'threshold': threshold,
+                    'p_above_threshold': float(final[values > threshold].sum()),
+                })
+        return rows
+
+
+def write_summary_table(filename, rows):
+    """
+    将汇总表写入CSV文件
+
+    Args:
+        filename: 输出文件名
+        rows: ReweightedRun.summarize返回的行
+    """
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def build_parser():
+    """
+    构造命令行参数解析器
+
+    Returns:
+        argparse.ArgumentParser: 参数解析器
+    """
+    parser = argparse.ArgumentParser(description="一次模拟后，用似然比重新加权估计附近ratio下的结果")
+    parser.add_argument('--initial-value', type=float, default=500)
+    parser.add_argument('--ratio', type=float, default=0.6, help="模拟使用的基准ratio")
+    parser.add_argument('--target', type=float, nargs='+', default=None, help="目标ratio，默认为整个网格")
+    parser.add_argument('--span', type=float, default=DEFAULT_SPAN, help="ratio网格在基准值两侧的范围")
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP, help="ratio网格的间隔")
+    parser.add_argument('--draw-count', type=int, default=15)
+    parser.add_argument('--rounds', type=int, default=100000)
+    parser.add_argument('--no-reroll', action='store_true')
+    parser.add_argument('--max-rerolls', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--threshold', type=int, default=7)
+    parser.add_argument('--min-ess-fraction', type=float, default=DEFAULT_MIN_ESS_FRACTION)
+    parser.add_argument('--output', default='reweight_results.csv')
+    parser.add_argument('--artifact', default=None, help="把模拟结果保存为.npz文件")
+    parser.add_argument('--from', dest='source', default=None,
+                        help="读取已保存的模拟结果（.npz）重新加权，忽略模拟参数")
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    from simulator import Simulator
+
+    args = build_parser().parse_args(argv)
+    if args.source is not None:
+        # 目标ratio须在已保存的网格范围内，不在网格点上时插值
+        run = ReweightedRun.load(args.source)
+    else:
+        simulator = Simulator(ProDistribution(args.initial_value, args.ratio))
+        # 目标ratio加入网格，在网格点上的估计不依赖插值
+        grid = ratio_grid(args.ratio, args.span, args.step)
+        if args.target is not None:
+            grid = np.union1d(grid, args.target)
+        run = ReweightedRun.simulate(
+            simulator, args.draw_count, args.rounds, grid, not args.no_reroll, args.max_rerolls, args.seed
+        )
+    if args.artifact is not None:
+        run.save(args.artifact)
+    targets = args.target if args.target is not None else run.ratios
+    rows = run.summarize(targets, args.threshold, args.min_ess_fraction)
+    for row in rows:
+        status = "" if row['reliable'] else "（ESS不足，不输出估计值）"
+        print(f"ratio={row['ratio']:.4g} 角色{row['character'] + 1} (等级{row['level']}, havetool={row['havetool']}): "
+              f"平均属性值 {row['mean_value']:.4f}，P(属性值>{args.threshold}) {row['p_above_threshold']:.4f}，"
+              f"ESS {row['ess']:.0f}{status}")
+
+    print(f"\n基准ratio={run.base_ratio}处的灵敏度（initial_value在概率中抵消，灵敏度恒为0）：")
+    threshold = args.threshold
+    mean_sensitivity = run.sensitivity(lambda values: values[:, -1])
+    above_sensitivity = run.sensitivity(lambda values: values[:, -1] > threshold)
+    for i, ((mean_d, mean_hw), (above_d, above_hw)) in enumerate(zip(mean_sensitivity, above_sensitivity)):
+        print(f"  角色{i + 1}: d平均属性值/d ratio = {mean_d:+.3f} ± {mean_hw:.3f}，"
+              f"dP(属性值>{threshold})/d ratio = {above_d:+.3f} ± {above_hw:.3f}")
+
+    write_summary_table(args.output, rows)
+    print(f"\n随机种子: {run.seed}，结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
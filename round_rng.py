@@ -0,0 +1,208 @@
+from bisect import bisect
+from itertools import accumulate
+import numpy as np
+
+"""
+基于计数器的逐轮随机流
+
+功能说明：
+- 使用NumPy的Philox计数器随机数生成器，随机流由 (种子, 角色下标, 轮次) 唯一确定
+- 密钥由种子派生；计数器第1个字为轮次，第2个字为角色下标，第3个字为 子流*2**32 + 块偏移，子流
+  0为每次抽卡的第一手牌（第d次抽卡固定使用第3d~3d+2个随机数），1为重新roll的手牌（按使用顺序）
+- 每轮预留固定数量的均匀随机数（每手牌3个，draw_count手与max_rerolls手），
+  任意一轮都可以单独重新生成，与模拟的总轮数、分片方式和进程数无关
+- 每轮第k块随机数与每轮预留的块数无关：抽卡次数不同的配置在前若干次抽卡上使用相同的随机数
+  （参数扫描截取最大抽卡次数的前缀，与单独模拟的结果相同）；两条子流分开后，重新roll次数不同的配置
+  在每次抽卡的第一手牌上也使用相同的随机数（公共随机数）
+- 可选对偶模式：第2k+1轮使用第2k轮随机数的对偶 1-u
+- 同一块偏移的相邻轮次在计数器上连续，批量引擎每个块偏移一次调用即可生成整块轮次的随机数
+"""
+
+# Philox4x64每个计数器值产生的64位随机数个数（每个随机数对应一个[0, 1)均匀数）
+UNIFORMS_PER_BLOCK = 4
+
+# 逐轮模拟时一次预取的轮数
+PREFETCH_ROUNDS = 256
+
+# 子流编号（计数器第3个字）
+HAND_STREAM = 0
+REROLL_STREAM = 1
+
+# 对偶随机数的上限，保证 1-u 仍在[0, 1)内
+_BELOW_ONE = 1.0 - 2.0 ** -53
+
+
+def new_seed():
+    """
+    由系统熵生成新的种子，用于没有指定种子的运行（记录后可以重放）
+
+    Returns:
+        int: 种子
+    """
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def round_blocks(draw_count, enable_reroll=True, max_rerolls=2):
+    """
+    计算每轮预留的计数器块数
+
+    Args:
+        draw_count: 每轮抽卡次数
+        enable_reroll: 是否启用重新roll功能，默认True
+        max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+
+    Returns:
+        tuple: (第一手牌子流的块数, 重新roll子流的块数)，每块UNIFORMS_PER_BLOCK个均匀随机数
+    """
+    rerolls = max_rerolls if enable_reroll else 0
+    return max(-(-3 * draw_count // UNIFORMS_PER_BLOCK), 1), -(-3 * rerolls // UNIFORMS_PER_BLOCK)
+
+
+class RoundRandom:
+    """逐轮随机流 - 提供与random.Random兼容的random()与choices()"""
+
+    def __init__(self, seed=None, antithetic=False):
+        """
+        初始化随机流
+
+        Args:
+            seed: 随机种子，默认None（由系统熵生成，可从self.seed读取）
+            antithetic: 是否使用对偶轮次（第2k+1轮使用第2k轮随机数的对偶），默认False
+        """
+        self.seed = new_seed() if seed is None else seed
+        self.antithetic = antithetic
+        self.key = np.random.SeedSequence(self.seed).generate_state(2, np.uint64)
+        self._prefetch = {}
+        self._buffer = []
+        self._position = 0
+        self._overflow = None
+        self._reroll = False
+        self._inactive = ([], 0, None)
+        self.start_round(0, 0, (1, 0))
+
+    def _generator(self, character_index, round_index, stream=HAND_STREAM, block=0):
+        """获取从指定轮次开始、沿轮次生成指定子流中一个块偏移的生成器"""
+        return np.random.Generator(np.random.Philox(
+            key=self.key, counter=[round_index, character_index, (stream << 32) + block, 0]
+        ))
+
+    def _block_uniforms(self, character_index, stream, first_round, rounds, blocks):
+        """按块偏移逐列生成连续若干轮的均匀随机数矩阵 (rounds, blocks*UNIFORMS_PER_BLOCK)"""
+        uniforms = np.empty((rounds, blocks * UNIFORMS_PER_BLOCK))
+        for block in range(blocks):
+            generator = self._generator(character_index, first_round, stream, block)
+            columns = slice(block * UNIFORMS_PER_BLOCK, (block + 1) * UNIFORMS_PER_BLOCK)
+            uniforms[:, columns] = generator.random(rounds * UNIFORMS_PER_BLOCK).reshape(rounds, UNIFORMS_PER_BLOCK)
+        return uniforms
+
+    def _stream_uniforms(self, character_index, stream, first_round, rounds, blocks):
+        """生成一条子流连续若干轮的均匀随机数矩阵 (rounds, blocks*UNIFORMS_PER_BLOCK)"""
+        if not self.antithetic:
+            return self._block_uniforms(character_index, stream, first_round, rounds, blocks)
+
+        # 对偶模式：第r轮使用第r//2个基础轮次，奇数轮取对偶
+        first_base = first_round // 2
+        base_rounds = (first_round + rounds - 1) // 2 - first_base + 1
+        base = self._block_uniforms(character_index, stream, first_base, base_rounds, blocks)
+        round_indices = np.arange(first_round, first_round + rounds)
+        rows = base[round_indices // 2 - first_base]
+        odd = round_indices % 2 == 1
+        rows[odd] = np.minimum(1.0 - rows[odd], _BELOW_ONE)
+        return rows
+
+    def uniforms(self, character_index, first_round, rounds, blocks):
+        """
+        生成连续若干轮预留的全部均匀随机数
+
+        Args:
+            character_index: 角色下标
+            first_round: 第一轮的轮次
+            rounds: 轮数
+            blocks: 每轮块数（round_blocks的返回值）
+
+        Returns:
+            tuple: (hands, rerolls)，第r行属于第first_round+r轮
+                hands: 第一手牌的均匀随机数矩阵 (rounds, blocks[0]*UNIFORMS_PER_BLOCK)
+                rerolls: 重新roll手牌的均匀随机数矩阵 (rounds, blocks[1]*UNIFORMS_PER_BLOCK)
+        """
+        hand_blocks, reroll_blocks = blocks
+        return (
+            self._stream_uniforms(character_index, HAND_STREAM, first_round, rounds, hand_blocks),
+            self._stream_uniforms(character_index, REROLL_STREAM, first_round, rounds, reroll_blocks),
+        )
+
+    def start_round(self, character_index, round_index, blocks):
+        """
+        把随机流定位到指定角色、指定轮次的开头（第一手牌子流）
+
+        Args:
+            character_index: 角色下标
+            round_index: 轮次（从0开始）
+            blocks: 每轮块数（round_blocks的返回值）
+        """
+        # 逐轮模拟按轮次顺序推进，每个角色一次预取后续若干轮
+        first_round, hands, rerolls = self._prefetch.get((character_index, blocks), (0, None, None))
+        if hands is None or not first_round <= round_index < first_round + len(hands):
+            first_round = round_index
+            hands, rerolls = self.uniforms(character_index, round_index, PREFETCH_ROUNDS, blocks)
+            self._prefetch[(character_index, blocks)] = (first_round, hands, rerolls)
+        self._buffer = hands[round_index - first_round].tolist()
+        self._position = 0
+        self._overflow = (character_index, round_index, HAND_STREAM, blocks[0])
+        self._reroll = False
+        self._inactive = (
+            rerolls[round_index - first_round].tolist(), 0,
+            (character_index, round_index, REROLL_STREAM, blocks[1])
+        )
+
+    def select_stream(self, reroll):
+        """
+        切换后续random()使用的子流
+
+        Args:
+            reroll: True为重新roll子流，False为第一手牌子流
+        """
+        if reroll != self._reroll:
+            active = (self._buffer, self._position, self._overflow)
+            self._buffer, self._position, self._overflow = self._inactive
+            self._inactive = active
+            self._reroll = reroll
+
+    def random(self):
+        """
+        获取下一个[0, 1)均匀随机数
+
+        Returns:
+            float: 均匀随机数
+        """
+        if self._position >= len(self._buffer):
+            # 超出本轮预留的随机数时，从预留块之后的块偏移沿计数器继续生成
+            # （会与后续轮次的同一块偏移重叠，对偶模式下不取对偶）
+            if not isinstance(self._overflow, np.random.Generator):
+                self._overflow = self._generator(*self._overflow)
+            self._buffer = self._overflow.random(64).tolist()
+            self._position = 0
+        value = self._buffer[self._position]
+        self._position += 1
+        return value
+
+    def choices(self, population, weights=None, *, cum_weights=None, k=1):
+        """
+        有放回地加权抽样，与random.Random.choices的选择方式一致
+
+        Args:
+            population: 候选序列
+            weights: 相对权重，默认None
+            cum_weights: 累积权重，默认None
+            k: 抽取数量，默认为1
+
+        Returns:
+            list: 抽取结果
+        """
+        n = len(population)
+        if cum_weights is None:
+            if weights is None:
+                return [population[int(self.random() * n)] for _ in range(k)]
+            cum_weights = list(accumulate(weights))
+        total = cum_weights[-1] + 0.0
+        return [population[bisect(cum_weights, self.random() * total, 0, n - 1)] for _ in range(k)]
@@ -0,0 +1,222 @@
+"""
+动态加权抽样器
+
+功能说明：
+- FenwickSampler：基于树状数组（Fenwick树）的加权抽样，单点更新与抽样均为O(log n)
+- StyleSampler：把角色的流派权重挂到Fenwick树上，属性值变化时只更新一个节点
+- 流派拥有数量达到3时，批量移除属性值为0的流派
+"""
+
+
+class FenwickSampler:
+    """基于树状数组的动态加权抽样器"""
+
+    def __init__(self, weights):
+        """
+        以O(n)建树
+
+        Args:
+            weights: 初始权重序列
+        """
+        self.rebuild(weights)
+
+    def rebuild(self, weights):
+        """
+        用新的权重序列重建整棵树，O(n)
+
+        Args:
+            weights: 权重序列
+        """
+        self.weights = [float(weight) for weight in weights]
+        size = len(self.weights)
+        self.tree = [0.0] + self.weights
+        for index in range(1, size + 1):
+            parent = index + (index & -index)
+            if parent <= size:
+                self.tree[parent] += self.tree[index]
+
+        # 抽样时二分下降的最高位
+        self._top_bit = 1
+        while self._top_bit * 2 <= size:
+            self._top_bit *= 2
+
+    def __len__(self):
+        return len(self.weights)
+
+    def update(self, index, weight):
+        """
+        修改单个位置的权重，O(log n)
+
+        Args:
+            index: 位置下标（从0开始）
+            weight: 新的权重
+        """
+        delta = weight - self.weights[index]
+        if delta == 0:
+            return
+        self.weights[index] = weight
+        position = index + 1
+        while position < len(self.tree):
+            self.tree[position] += delta
+            position += position & -position
+
+    def remove_many(self, indices):
+        """
+        批量把若干位置的权重置为0，O(n)重建
+
+        Args:
+            indices: 位置下标序列
+        """
+        weights = list(self.weights)
+        for index in indices:
+            weights[index] = 0.0
+        self.rebuild(weights)
+
+    def prefix_sum(self, count):
+        """
+        计算前count个位置的权重之和，O(log n)
+
+        Args:
+            count: 位置数量
+
+        Returns:
+            float: 权重之和
+        """
+        total = 0.0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    def total(self):
+        """
+        获取全部权重之和
+
+        Returns:
+            float: 权重之和
+        """
+        return self.prefix_sum(len(self.weights))
+
+    def find(self, target):
+        """
+        查找满足 前缀和(i) <= target < 前缀和(i+1) 的位置i，O(log n)
+
+        与bisect_right作用于累积权重的结果一致，权重为0的位置不会被选中
+
+        Args:
+            target: 目标值，取值范围[0, total)
+
+        Returns:
+            int: 位置下标（从0开始）
+        """
+        position = 0
+        step = self._top_bit
+        size = len(self.weights)
+        while step > 0:
+            next_position = position + step
+            if next_position <= size and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            step //= 2
+
+        if position >= size:
+            # 浮点误差导致越界时，退回到最后一个权重为正的位置
+            position = size - 1
+            while position > 0 and self.weights[position] <= 0:
+                position -= 1
+        return position
+
+    def sample(self, rng, k=1):
+        """
+        有放回地按权重抽取k个位置
+
+        Args:
+            rng: 提供random()方法的随机数生成器（random模块或random.Random实例）
+            k: 抽取数量，默认为1
+
+        Returns:
+            list: 位置下标列表
+        """
+        total = self.total()
+        return [self.find(rng.random() * total) for _ in range(k)]
+
+
+class StyleSampler:
+    """角色流派抽样器 - 随属性值变化增量维护的Fenwick树"""
+
+    def __init__(self, character, pro_distribution):
+        """
+        初始化流派抽样器
+
+        Args:
+            character: Character类实例
+            pro_distribution: ProDistribution实例
+        """
+        self.character = character
+        self.pro_distribution = pro_distribution
+        self.styles = []
+        self.positions = {}
+        self.restricted = False
+        self.tree = FenwickSampler([])
+        self.rebuild()
+
+    def rebuild(self):
+        """按角色当前属性值全量重建，O(n)"""
+        attribute_values = self.character.attribute_values
+        self.styles = list(attribute_values.keys())
+        self.positions = {style: position for position, style in enumerate(self.styles)}
+        self.restricted = self.character.get_style_count() >= 3
+        self.tree.rebuild([self._style_weight(attribute_values[style]) for style in self.styles])
+
+    def _style_weight(self, value):
+        """
+        计算流派在当前卡池中的权重
+
+        Args:
+            value: 流派属性值
+
+        Returns:
+            float: 权重，被卡池排除的流派为0
+        """
+        if self.restricted and value == 0:
+            return 0.0
+        return self.pro_distribution.get_style_weight(None, value)
+
+    def on_value_changed(self, style_name, new_value):
+        """
+        单个流派属性值变化后更新，O(log n)；拥有数量刚达到3时批量移除未拥有的流派
+
+        Args:
+            style_name: 流派名称
+            new_value: 变化后的数值
+        """
+        self.tree.update(self.positions[style_name], self._style_weight(new_value))
+
+        restricted = self.character.get_style_count() >= 3
+        if restricted != self.restricted:
+            self.restricted = restricted
+            if restricted:
+                attribute_values = self.character.attribute_values
+                self.tree.remove_many(
+                    [position for position, style in enumerate(self.styles) if attribute_values[style] == 0]
+                )
+            else:
+                self.rebuild()
+
+    def sample(self, rng, k=3):
+        """
+        按当前权重有放回地抽取k个流派
+
+        Args:
+            rng: 提供random()与choices()方法的随机数生成器
+            k: 抽取数量，默认为3
+
+        Returns:
+            list: 流派名称列表
+        """
+        if self.tree.total() <= 0:
+            # 与ProDistribution保持一致：总权重为0时卡池内流派等概率
+            attribute_values = self.character.attribute_values
+            pool = [style for style in self.styles if not (self.restricted and attribute_values[style] == 0)]
+            return rng.choices(pool, k=k)
+        return [self.styles[position] for position in self.tree.sample(rng, k)]
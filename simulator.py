@@ -1,9 +1,10 @@
-from character import Character
+from character import Character, CharacterPopulation
 from ProDistribution import ProDistribution
 from type import Style
-import random
-import pandas as pd
-from write import write_header_cell, write_percentage_cell, write_max_value_cell, write_gacha_legend, apply_data_bars
+from histogram import FLUSH_ROUNDS, add_main_values, empty_histogram
+from instrument import NULL_INSTRUMENT
+from round_rng import RoundRandom, new_seed, round_blocks
+import numpy as np
 
 """
 游戏模拟器系统
@@ -12,14 +13,39 @@ from write import write_header_cell, write_percentage_cell, write_max_value_cell
 - 模拟角色抽卡过程
 - 支持多轮统计和Excel文件生成
 - 提供概率分布计算和数据分析
+- 各引擎（批量、精确求解、多进程、自适应、QMC）、结果缓存与追踪只在使用它们的分支内导入，
+  逐轮模拟不为用不到的模块付出启动开销
 """
 
+# 默认的六个角色 (属性, 等级, havetool)：两个5级，两个18级，两个35级，
+# 每种等级分别设置havetool为true和false，属性均为熔岩球
+DEFAULT_CHARACTERS = [
+    ("熔岩球", 5, False), ("熔岩球", 5, True),
+    ("熔岩球", 18, False), ("熔岩球", 18, True),
+    ("熔岩球", 35, False), ("熔岩球", 35, True),
+]
+
 class Simulator:
     """游戏模拟器"""
     
-    def __init__(self):
-        """初始化模拟器"""
-        self.pro_distribution = ProDistribution()
+    def __init__(self, pro_distribution=None, seed=None, sampler='cumulative', instrument=None):
+        """
+        初始化模拟器
+        
+        Args:
+            pro_distribution: ProDistribution实例，默认为ProDistribution()
+            seed: 随机种子，默认None（由系统熵生成）；每一轮的随机流由 (种子, 角色下标, 轮次) 确定
+            sampler: 逐轮模拟的抽样方式，'cumulative'为缓存的累积权重，
+                'fenwick'为基于Fenwick树的O(log n)抽样（适合技能很多的卡池），默认'cumulative'
+            instrument: Instrument实例，记录分阶段计时、计数器与进度，默认None（不记录）
+        """
+        if sampler not in ('cumulative', 'fenwick'):
+            raise ValueError(f"抽样方式 '{sampler}' 不存在")
+        self.pro_distribution = pro_distribution if pro_distribution is not None else ProDistribution()
+        self.seed = seed
+        self.rng = RoundRandom(seed)
+        self.sampler_type = sampler
+        self.instrument = instrument if instrument is not None else NULL_INSTRUMENT
         self.characters = []
         self.initialize_characters()
     
@@ -27,27 +53,22 @@ class Simulator:
         """初始化六个角色"""
         # 创建六个角色：两个5级，两个18级，两个35级
         # 每种等级分别设置havetool为true和false，属性均为熔岩球
-        
-        # 5级角色
-        char_5_false = Character("熔岩球", 5, havetool=False)
-        char_5_true = Character("熔岩球", 5, havetool=True)
-        
-        # 18级角色
-        char_18_false = Character("熔岩球", 18, havetool=False)
-        char_18_true = Character("熔岩球", 18, havetool=True)
-        
-        # 35级角色
-        char_35_false = Character("熔岩球", 35, havetool=False)
-        char_35_true = Character("熔岩球", 35, havetool=True)
-        
-        # 添加到角色列表
         self.characters = [
-            char_5_false, char_5_true,
-            char_18_false, char_18_true,
-            char_35_false, char_35_true
+            Character(attribute, level, havetool=havetool) for attribute, level, havetool in DEFAULT_CHARACTERS
         ]
+        
+        self.bind_characters()
+    
+    def bind_characters(self):
+        """为所有角色绑定概率分布，并按抽样方式挂接抽样器"""
+        for character in self.characters:
+            # 绑定概率分布，使角色增量维护权重之和
+            character.bind_distribution(self.pro_distribution)
+            if self.sampler_type == 'fenwick':
+                from sampler import StyleSampler
+                character.attach_sampler(StyleSampler(character, self.pro_distribution))
     
-    def _perform_single_draw(self, character, enable_reroll=True, remaining_rerolls=0):
+    def _perform_single_draw(self, character, enable_reroll=True, remaining_rerolls=0, rng=None):
         """
         执行单次抽卡，包含重新roll功能
         
@@ -55,21 +76,27 @@ class Simulator:
             character: 角色对象
             enable_reroll: 是否启用重新roll功能，默认True
             remaining_rerolls: 剩余重新roll次数，默认0次
+            rng: 随机流，默认None（使用self.rng）
             
         Returns:
             tuple: (selected_style, three_cards, reroll_count, reroll_history, remaining_rerolls)
         """
+        rng = rng if rng is not None else self.rng
         reroll_count = 0
         reroll_history = []
         
         while True:
-            # 获取当前概率分布
-            probabilities = self.pro_distribution.get_current_weight(character)
-            styles = list(probabilities.keys())
-            probs = list(probabilities.values())
-            
-            # 使用random.choices进行加权随机选择三个流派
-            three_cards = random.choices(styles, weights=probs, k=3)
+            # 第一手牌与重新roll的手牌使用不同的子流
+            rng.select_stream(reroll_count > 0)
+            if character.sampler is not None:
+                # 使用Fenwick树进行O(log n)加权随机选择三个流派
+                three_cards = character.sampler.sample(rng, 3)
+            else:
+                # 获取当前卡池及缓存的累积权重
+                styles, cum_weights = self.pro_distribution.get_cumulative_weights(character)
+                
+                # 使用random.choices进行加权随机选择三个流派
+                three_cards = rng.choices(styles, cum_weights=cum_weights, k=3)
             
             # 角色选择逻辑：优先选择和自身属性相同的流派
             character_attribute = character.attribute
@@ -107,15 +134,133 @@ class Simulator:
         
         return selected_style, three_cards, reroll_count, reroll_history, remaining_rerolls
 
-    def simulate_card_drawing(self, draw_count=15, enable_reroll=True, max_rerolls=2):
+    def _main_style_probability(self, character):
         """
-        模拟抽卡过程
+        计算主攻流派在当前卡牌投放中的概率（单张卡牌）
+        
+        Args:
+            character: 角色对象
+            
+        Returns:
+            float: 概率，主攻流派不在卡池中时为0
+        """
+        value = character.attribute_values.get(character.attribute)
+        if value is None or (value == 0 and character.get_style_count() >= 3):
+            return 0.0
+        if character.pro_distribution is not self.pro_distribution:
+            return self.pro_distribution.get_current_weight(character).get(character.attribute, 0.0)
+        total_weight = character.get_total_weight()
+        if total_weight <= 0:
+            return 0.0
+        return self.pro_distribution.get_style_weight(character.attribute, value) / total_weight
+    
+    def simulate_card_drawing(self, draw_count=15, enable_reroll=True, max_rerolls=2, rounds=1, render='text'):
+        """
+        模拟抽卡过程，把每张手牌记录到追踪缓冲区，结束后按需渲染
         
         Args:
             draw_count: 抽卡次数，默认15次
             enable_reroll: 是否启用重新roll功能，默认True
             max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            rounds: 模拟轮数，每轮开始时重置角色属性，默认1轮
+            render: 结束后的输出方式，'text'为逐次抽卡的文本，'json'为JSON，'table'为表格，
+                None为不输出，默认'text'
+            
+        Returns:
+            TraceBuffer: 追踪缓冲区
+        """
+        if render not in (None, 'text', 'json', 'table'):
+            raise ValueError(f"输出方式 '{render}' 不存在")
+        
+        trace = self._new_trace()
+        for round_idx in range(rounds):
+            for i in range(len(self.characters)):
+                self._trace_round(trace, self.rng, i, round_idx, draw_count, enable_reroll, max_rerolls)
+        
+        self._render_trace(trace, draw_count, enable_reroll, max_rerolls, render)
+        return trace
+    
+    def replay_round(self, character_index, round_index, draw_count=15, enable_reroll=True, max_rerolls=2, seed=None,
+                     render='text'):
+        """
+        单独重新生成某次运行中的一轮并逐次追踪
+        
+        每一轮的随机流只由 (种子, 角色下标, 轮次) 确定，与该次运行的总轮数、分片与进程数无关；
+        使用'cumulative'抽样方式时，结果与逐轮和批量引擎中的同一轮相同
+        
+        Args:
+            character_index: 角色下标
+            round_index: 轮次（从0开始）
+            draw_count: 每轮抽卡次数，默认15次
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            seed: 该次运行的种子（见结果元数据'seed'），默认None（使用模拟器的种子）
+            render: 输出方式，同simulate_card_drawing，默认'text'
+            
+        Returns:
+            TraceBuffer: 只包含这一轮的追踪缓冲区
         """
+        if render not in (None, 'text', 'json', 'table'):
+            raise ValueError(f"输出方式 '{render}' 不存在")
+        if not 0 <= character_index < len(self.characters):
+            raise ValueError(f"角色下标 '{character_index}' 不存在")
+        
+        rng = RoundRandom(seed) if seed is not None else self.rng
+        trace = self._new_trace()
+        self._trace_round(trace, rng, character_index, round_index, draw_count, enable_reroll, max_rerolls)
+        self._render_trace(trace, draw_count, enable_reroll, max_rerolls, render)
+        return trace
+    
+    def _new_trace(self):
+        """创建记录当前角色配置的追踪缓冲区"""
+        from draw_trace import TraceBuffer
+        
+        return TraceBuffer([
+            (character.attribute, character.get_level(), character.get_havetool()) for character in self.characters
+        ])
+    
+    def _trace_round(self, trace, rng, character_index, round_idx, draw_count, enable_reroll, max_rerolls):
+        """
+        模拟一个角色的一轮抽卡，把每张手牌记录到追踪缓冲区
+        
+        Args:
+            trace: TraceBuffer实例
+            rng: RoundRandom实例
+            character_index: 角色下标
+            round_idx: 轮次
+            draw_count: 抽卡次数
+            enable_reroll: 是否启用重新roll功能
+            max_rerolls: 一轮完整模拟中最大重新roll次数
+        """
+        character = self.characters[character_index]
+        # 每轮从初始状态开始，渲染时才能按记录回放
+        character.reset_all_attributes()
+        rng.start_round(character_index, round_idx, round_blocks(draw_count, enable_reroll, max_rerolls))
+        remaining_rerolls = max_rerolls  # 初始化剩余重新roll次数
+        
+        for draw in range(draw_count):
+            # 记录抽卡前的状态
+            style_count = character.get_style_count()
+            main_value = character.get_attribute_value(character.attribute)
+            main_probability = self._main_style_probability(character)
+            
+            # 执行单次抽卡
+            selected_style, three_cards, _, reroll_history, remaining_after = self._perform_single_draw(
+                character, enable_reroll, remaining_rerolls, rng
+            )
+            trace.record_draw(
+                round_idx, character_index, draw, reroll_history + [three_cards], selected_style, remaining_rerolls,
+                style_count, main_value, main_probability
+            )
+            remaining_rerolls = remaining_after
+            
+            # 增加对应流派的value
+            character.increase_attribute_value(selected_style, 1)
+    
+    def _render_trace(self, trace, draw_count, enable_reroll, max_rerolls, render):
+        """按输出方式打印追踪缓冲区，render为None时不输出"""
+        if render is None:
+            return
         print(f"\n=== 模拟{draw_count}次抽卡 ===")
         if enable_reroll:
             print(f"重新roll功能: 启用 (一轮最多{max_rerolls}次)")
@@ -123,70 +268,15 @@ class Simulator:
             print("重新roll功能: 禁用")
         print("=" * 80)
         
-        for i, character in enumerate(self.characters, 1):
-            print(f"\n角色 {i} (等级{character.get_level()}, havetool={character.get_havetool()}):")
-            
-            # 记录初始状态
-            initial_style_count = character.get_style_count()
-            print(f"  初始流派拥有数量: {initial_style_count}")
-            
-            # 模拟抽卡过程
-            draw_results = []
-            remaining_rerolls = max_rerolls  # 初始化剩余重新roll次数
-            
-            for draw in range(draw_count):
-                # 获取当前概率分布
-                probabilities = self.pro_distribution.get_current_weight(character)
-                # 展示当前各个流派的权重
-                prob_str = ', '.join([f"{k}:{v:.3f}" for k, v in probabilities.items()])
-                print(f"    第{draw+1}次抽卡前流派权重: {prob_str}")
-                if enable_reroll:
-                    print(f"    剩余重新roll次数: {remaining_rerolls}")
-                
-                # 执行单次抽卡
-                selected_style, three_cards, reroll_count, reroll_history, remaining_rerolls = self._perform_single_draw(
-                    character, enable_reroll, remaining_rerolls
-                )
-                
-                # 记录抽卡结果
-                draw_result = {
-                    'cards': three_cards,
-                    'selected': selected_style,
-                    'reroll_count': reroll_count,
-                    'reroll_history': reroll_history
-                }
-                draw_results.append(draw_result)
-                
-                # 增加对应流派的value
-                character.increase_attribute_value(selected_style, 1)
-                
-                # 每5次抽卡显示一次进度
-                if (draw + 1) % 5 == 0:
-                    current_style_count = character.get_style_count()
-                    print(f"    第{draw + 1}次抽卡后: 流派拥有数量 = {current_style_count}")
-            
-            # 显示最终结果
-            final_style_count = character.get_style_count()
-            print(f"  最终流派拥有数量: {final_style_count}")
-            print(f"  流派获得情况:")
-            
-            # 显示所有流派的最终值
-            for style, value in character.attribute_values.items():
-                if value > 0:
-                    print(f"    {style}: {value}")
-            
-            # 显示抽卡历史
-            print(f"  抽卡历史:")
-            for j, result in enumerate(draw_results, 1):
-                cards_str = ", ".join(result['cards'])
-                selected = result['selected']
-                selection_reason = "优先选择" if selected == character.attribute else "默认选择"
-                reroll_info = f" (重新roll{result['reroll_count']}次)" if result['reroll_count'] > 0 else ""
-                print(f"    第{j:2d}次: [{cards_str}] -> {selected} ({selection_reason}){reroll_info}")
-            
-            print(f"  流派数量变化: {initial_style_count} -> {final_style_count}")
+        if render == 'text':
+            print(trace.render_text(self.pro_distribution, enable_reroll))
+        elif render == 'json':
+            print(trace.to_json())
+        else:
+            print(trace.render_table())
     
-    def simulate_attribute_value_ratio(self, draw_count=15, rounds=10, threshold=7, enable_reroll=True, max_rerolls=2):
+    def simulate_attribute_value_ratio(self, draw_count=15, rounds=10, threshold=7, enable_reroll=True, max_rerolls=2,
+                                       engine='scalar', workers=1, seed=None, precision=None, replicates=None):
         """
         模拟多轮并统计角色自身流派属性值大于threshold的比例
         
@@ -196,40 +286,167 @@ class Simulator:
             threshold: 阈值，默认7
             enable_reroll: 是否启用重新roll功能，默认True
             max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            engine: 模拟引擎，'scalar'、'batch'或'qmc'（随机化Sobol序列，需要scipy，单进程），默认'scalar'
+            workers: 并行进程数，默认1
+            seed: 随机种子，给定时结果完全可复现（与workers无关），默认None（使用模拟器的种子，
+                都没有时生成新的种子并打印）
+            precision: PrecisionTarget实例，给定时分批模拟直到达到精度目标（忽略rounds），默认None
+            replicates: 'qmc'引擎独立打乱的重复数，用于估计标准误，默认None（qmc.DEFAULT_REPLICATES）
         """
-        print(f"\n=== 模拟{rounds}轮，每轮{draw_count}次抽卡，统计自身流派属性值>{threshold}的比例 ===")
+        if precision is not None:
+            print(f"\n=== 自适应模拟至置信区间半宽±{precision.half_width}，每轮{draw_count}次抽卡，"
+                  f"统计自身流派属性值>{threshold}的比例 ===")
+        else:
+            print(f"\n=== 模拟{rounds}轮，每轮{draw_count}次抽卡，统计自身流派属性值>{threshold}的比例 ===")
         if enable_reroll:
             print(f"重新roll功能: 启用 (一轮最多{max_rerolls}次)")
         else:
             print("重新roll功能: 禁用")
         print("=" * 80)
+        
+        if engine not in ('scalar', 'batch', 'qmc'):
+            raise ValueError(f"模拟引擎 '{engine}' 不存在")
+        if engine == 'qmc' and precision is not None:
+            raise ValueError("模拟引擎 'qmc' 不支持自适应模拟")
+        
+        seed = self.resolve_seed(seed)
+        report = None
+        qmc_report = None
+        if engine == 'qmc':
+            from qmc import qmc_ratio_counts
+            
+            ratio_counts, rounds, qmc_report = qmc_ratio_counts(
+                self, draw_count, rounds, threshold, enable_reroll, max_rerolls, seed,
+                self._resolve_replicates(engine, replicates)
+            )
+        elif precision is not None:
+            from adaptive import adaptive_ratio_counts
+            
+            ratio_counts, rounds, report = adaptive_ratio_counts(
+                self, draw_count, threshold, precision, enable_reroll, max_rerolls, engine, workers, seed
+            )
+        elif workers > 1:
+            from parallel import collect_ratio_counts_sharded
+            
+            ratio_counts = collect_ratio_counts_sharded(
+                self, draw_count, rounds, threshold, enable_reroll, max_rerolls, engine, workers, seed
+            )
+        else:
+            ratio_counts = self.collect_ratio_counts(
+                draw_count, rounds, threshold, enable_reroll, max_rerolls, engine, seed
+            )
+        
         for i, character in enumerate(self.characters, 1):
-            success_count = 0
-            no_main_attribute_count = 0  # 统计没有主攻属性的轮数
+            success_count, no_main_attribute_count = ratio_counts[i - 1]
             print(f"\n角色 {i} (等级{character.get_level()}, havetool={character.get_havetool()}):")
-            for round_idx in range(1, rounds+1):
-                character.reset_all_attributes()
-                remaining_rerolls = max_rerolls  # 初始化剩余重新roll次数
-                for _ in range(draw_count):
-                    # 执行单次抽卡
-                    selected_style, _, _, _, remaining_rerolls = self._perform_single_draw(
-                        character, enable_reroll, remaining_rerolls
-                    )
-                    character.increase_attribute_value(selected_style, 1)
-                
-                # 检查本轮结束时是否有主攻属性
-                if character.get_attribute_value(character.attribute) == 0:
-                    no_main_attribute_count += 1
-                
-                if character.get_attribute_value(character.attribute) > threshold:
-                    success_count += 1
-            
             ratio = success_count / rounds
             no_main_ratio = no_main_attribute_count / rounds
             print(f"  自身流派属性值>{threshold}的比例 = {ratio:.3f}")
             print(f"  属性池没有主攻属性的比例 = {no_main_ratio:.3f}")
+            if report is not None:
+                print(f"  {report['confidence']:.0%}置信区间半宽 = ±{report['half_widths'][i - 1]:.4f}")
+            if qmc_report is not None:
+                print(f"  标准误（{qmc_report['replicates']}个重复估计） = ±{qmc_report['standard_errors'][i - 1]:.4f}")
+        
+        if qmc_report is not None:
+            print(f"\n{self._describe_qmc(qmc_report)}")
+        if report is not None:
+            status = "已达到" if report['converged'] else "未达到"
+            print(f"\n共模拟{rounds}轮，用时{report['elapsed']:.1f}秒，精度目标±{report['half_width']}{status}")
+        print(f"\n随机种子: {seed}")
+    
+    def _describe_qmc(self, report):
+        """生成随机化QMC重复报告的说明文字"""
+        text = (f"随机化QMC: {report['replicates']}个重复 × {report['rounds_per_replicate']}轮，"
+                f"最大标准误 {report['max_standard_error']:.4g}")
+        if report['median_variance_reduction'] is not None:
+            text += f"，方差约为普通蒙特卡洛的 1/{report['median_variance_reduction']:.1f}（中位数）"
+        return text
+    
+    def resolve_seed(self, seed):
+        """
+        获取一次运行使用的种子
+        
+        Args:
+            seed: 调用方指定的种子
+            
+        Returns:
+            int: 指定的种子，未指定时为模拟器的种子，都没有时生成新的种子（记录后可以重放任意一轮）
+        """
+        if seed is not None:
+            return seed
+        if self.seed is not None:
+            return self.seed
+        return new_seed()
+    
+    def _resolve_replicates(self, engine, replicates):
+        """获取'qmc'引擎的重复数，未指定时为qmc.DEFAULT_REPLICATES；其他引擎不使用，返回None"""
+        if engine != 'qmc':
+            return None
+        if replicates is None:
+            from qmc import DEFAULT_REPLICATES
+            return DEFAULT_REPLICATES
+        return replicates
+
+    def collect_ratio_counts(self, draw_count, rounds, threshold, enable_reroll=True, max_rerolls=2, engine='scalar',
+                             seed=None, first_round=0):
+        """
+        模拟多轮并统计每个角色的达标轮数与没有主攻属性的轮数
+        
+        Args:
+            draw_count: 每轮抽卡次数
+            rounds: 模拟轮数
+            threshold: 阈值
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            engine: 模拟引擎，'scalar'或'batch'，默认'scalar'
+            seed: 随机种子，默认None（使用模拟器的随机流）
+            first_round: 第一轮的轮次，默认0
+            
+        Returns:
+            list: 每个角色的 (属性值>threshold的轮数, 没有主攻属性的轮数)
+        """
+        ratio_counts = []
+        rng = RoundRandom(seed) if seed is not None else self.rng
+        blocks = round_blocks(draw_count, enable_reroll, max_rerolls)
+        batch_engine = None
+        if engine == 'batch':
+            from batch_engine import BatchEngine
+            batch_engine = BatchEngine(self.pro_distribution, seed=rng.seed)
+        for i, character in enumerate(self.characters):
+            success_count = 0
+            no_main_attribute_count = 0  # 统计没有主攻属性的轮数
+            if batch_engine is not None:
+                for main_values, _ in batch_engine.iter_chunks(
+                    character, draw_count, rounds, enable_reroll, max_rerolls, i, first_round
+                ):
+                    final_values = main_values[:, -1]
+                    success_count += int((final_values > threshold).sum())
+                    no_main_attribute_count += int((final_values == 0).sum())
+            else:
+                for round_idx in range(first_round, first_round + rounds):
+                    character.reset_all_attributes()
+                    rng.start_round(i, round_idx, blocks)
+                    remaining_rerolls = max_rerolls  # 初始化剩余重新roll次数
+                    for _ in range(draw_count):
+                        # 执行单次抽卡
+                        selected_style, _, _, _, remaining_rerolls = self._perform_single_draw(
+                            character, enable_reroll, remaining_rerolls, rng
+                        )
+                        character.increase_attribute_value(selected_style, 1)
+                    
+                    # 检查本轮结束时是否有主攻属性
+                    if character.get_attribute_value(character.attribute) == 0:
+                        no_main_attribute_count += 1
+                    
+                    if character.get_attribute_value(character.attribute) > threshold:
+                        success_count += 1
+            ratio_counts.append((success_count, no_main_attribute_count))
+        return ratio_counts
 
-    def simulate_and_generate_excel(self, draw_count=15, rounds=1000, enable_reroll=True, max_rerolls=2):
+    def simulate_and_generate_excel(self, draw_count=15, rounds=1000, enable_reroll=True, max_rerolls=2, engine='scalar',
+                                    workers=1, seed=None, write_only=False, artifact=None, final_states=False,
+                                    excel=True, cache=None, precision=None, replicates=None):
         """
         模拟多轮抽卡并生成Excel文件
         
@@ -238,375 +455,336 @@ class Simulator:
             rounds: 模拟轮数，默认1000轮
             enable_reroll: 是否启用重新roll功能，默认True
             max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            engine: 模拟引擎，'scalar'为逐轮模拟，'batch'为向量化批量模拟，
+                'qmc'为随机化Sobol序列驱动的批量模拟（需要scipy，单进程，轮数取整为replicates的倍数），
+                'exact'为马尔可夫链精确求解（忽略rounds），默认'scalar'
+            workers: 并行进程数，默认1
+            seed: 随机种子，给定时结果完全可复现（与workers无关），默认None（使用模拟器的种子，
+                都没有时生成新的种子，记录在结果元数据'seed'中）
+            write_only: 是否以流式模式写出Excel（内存占用与表格大小无关），默认False
+            artifact: 列式结果文件名（.npz 或 .parquet），默认None（不保存）
+            final_states: 是否在结果中保存每轮的最终属性值，默认False
+            excel: 是否由结果渲染Excel报告，默认True
+            cache: ResultCache实例，给定时可复现的运行直接复用缓存结果，默认None
+            precision: PrecisionTarget实例，给定时分批模拟直到达到精度目标（忽略rounds），
+                达到的精度写入报告第3行，默认None
+            replicates: 'qmc'引擎独立打乱的重复数，用于估计每个单元格的标准误，默认None（qmc.DEFAULT_REPLICATES）
             
         Returns:
-            None，生成Excel文件到当前目录
+            SimulationArtifact: 本次运行的结果，同时按参数生成文件到当前目录
         """
-        print(f"\n=== 模拟{rounds}轮，每轮{draw_count}次抽卡，生成Excel文件 ===")
+        if precision is not None:
+            print(f"\n=== 自适应模拟至置信区间半宽±{precision.half_width}，每轮{draw_count}次抽卡，生成Excel文件 ===")
+        else:
+            print(f"\n=== 模拟{rounds}轮，每轮{draw_count}次抽卡，生成Excel文件 ===")
         if enable_reroll:
             print(f"重新roll功能: 启用 (一轮最多{max_rerolls}次)")
         else:
             print("重新roll功能: 禁用")
         print("=" * 80)
         
-        # 初始化统计数据
-        character_stats = []
-        for i in range(len(self.characters)):
-            character_stats.append({})
-            for j in range(draw_count + 1):
-                character_stats[i][j] = {}
+        result = self.run_simulation(
+            draw_count, rounds, enable_reroll, max_rerolls, engine, workers, seed, final_states, cache, precision,
+            replicates
+        )
+        if 'qmc' in result.metadata:
+            print(f"  {self._describe_qmc(result.metadata['qmc'])}")
         
-        # 执行多轮模拟
-        for round_idx in range(rounds):
-            # 重置所有角色属性
-            for character in self.characters:
-                character.reset_all_attributes()
+        # 保存列式结果
+        if artifact is not None:
+            print(f"  保存结果: {artifact}")
+            result.save(artifact)
+        
+        # 由结果渲染Excel文件
+        if excel:
+            self._render_excel(result, write_only)
+            print("Excel文件生成完成！")
+        
+        return result
+    
+    def run_simulation(self, draw_count=15, rounds=1000, enable_reroll=True, max_rerolls=2, engine='scalar',
+                       workers=1, seed=None, final_states=False, cache=None, precision=None,
+                       replicates=None):
+        """
+        模拟多轮抽卡，返回带运行元数据的列式结果
+        
+        Args:
+            draw_count: 每轮抽卡次数，默认15次
+            rounds: 模拟轮数，默认1000轮
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            engine: 模拟引擎，'scalar'、'batch'、'qmc'或'exact'，默认'scalar'
+            workers: 并行进程数，默认1（'qmc'引擎忽略）
+            seed: 随机种子，默认None
+            final_states: 是否记录每轮的最终属性值，默认False
+            cache: ResultCache实例，给定时可复现的运行直接复用缓存结果，默认None
+            precision: PrecisionTarget实例，给定时分批模拟直到达到精度目标（忽略rounds），默认None
+            replicates: 'qmc'引擎独立打乱的重复数，默认None（qmc.DEFAULT_REPLICATES）
             
-            # 初始化每个角色的剩余重新roll次数
-            remaining_rerolls_per_character = [max_rerolls] * len(self.characters)
+        Returns:
+            SimulationArtifact: 模拟结果，自适应模拟时metadata['precision']为精度报告，
+                'qmc'引擎时metadata['qmc']为重复报告（见qmc.replicate_report）
+        """
+        from artifact import SimulationArtifact
+        
+        if engine not in ('scalar', 'batch', 'qmc', 'exact'):
+            raise ValueError(f"模拟引擎 '{engine}' 不存在")
+        if engine == 'qmc' and precision is not None:
+            raise ValueError("模拟引擎 'qmc' 不支持自适应模拟")
+        
+        if seed is None:
+            seed = self.seed
+        
+        replicates = self._resolve_replicates(engine, replicates)
+        
+        # 只有可复现的运行才使用缓存
+        cache_key = None
+        if cache is not None:
+            from cache import config_key, is_cacheable
             
-            # 执行抽卡过程
-            for draw in range(draw_count):
-                for i, character in enumerate(self.characters):
-                    # 执行单次抽卡
-                    selected_style, _, _, _, remaining_rerolls_per_character[i] = self._perform_single_draw(
-                        character, enable_reroll, remaining_rerolls_per_character[i]
-                    )
-                    
-                    # 增加对应流派的value
-                    character.increase_attribute_value(selected_style, 1)
-                    
-                    # 记录当前状态
-                    current_value = character.get_attribute_value(character.attribute)
-                    if current_value not in character_stats[i][draw + 1]:
-                        character_stats[i][draw + 1][current_value] = 0
-                    character_stats[i][draw + 1][current_value] += 1
+            config = self.describe_run(draw_count, rounds, enable_reroll, max_rerolls, engine, seed,
+                                       final_states, precision, replicates)
+            if is_cacheable(config):
+                cache_key = config_key(config)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    # 进程数不在缓存键中，元数据按本次调用记录
+                    cached.metadata['workers'] = workers
+                    return cached
+        
+        # 记录实际使用的种子，之后可以用replay_round重放任意一轮
+        if seed is None and engine != 'exact':
+            seed = new_seed()
+        
+        states = [] if final_states else None
+        report = None
+        qmc_report = None
+        cache_hits, cache_misses = self.pro_distribution.cache_hits, self.pro_distribution.cache_misses
+        with self.instrument.phase('simulation'):
+            if precision is not None and engine != 'exact':
+                from adaptive import adaptive_character_stats
+                
+                character_stats, rounds, report = adaptive_character_stats(
+                    self, draw_count, precision, enable_reroll, max_rerolls, engine, workers, seed, states
+                )
+            elif engine == 'qmc':
+                from qmc import qmc_character_stats
+                
+                character_stats, rounds, qmc_report = qmc_character_stats(
+                    self, draw_count, rounds, enable_reroll, max_rerolls, seed, replicates, states
+                )
+            elif engine == 'exact':
+                # 精确求解，统计数据中保存的是概率，相当于只模拟了1轮
+                character_stats = self.collect_character_stats(draw_count, 1, enable_reroll, max_rerolls, engine,
+                                                               final_states=states)
+                rounds = 1
+            elif workers > 1:
+                from parallel import collect_character_stats_sharded
+                
+                character_stats = collect_character_stats_sharded(
+                    self, draw_count, rounds, enable_reroll, max_rerolls, engine, workers, seed, states
+                )
+            else:
+                character_stats = self.collect_character_stats(draw_count, rounds, enable_reroll, max_rerolls,
+                                                               engine, seed, states)
         
-        # 生成Excel文件
-        self._generate_excel_files(character_stats, draw_count, rounds)
+        if engine != 'exact':
+            self.instrument.count('draws', rounds * draw_count * len(self.characters))
+        self.instrument.count('probability_cache_hits', self.pro_distribution.cache_hits - cache_hits)
+        self.instrument.count('probability_cache_misses', self.pro_distribution.cache_misses - cache_misses)
         
-        print("Excel文件生成完成！")
+        metadata = {
+            'initial_value': self.pro_distribution.initial_value,
+            'ratio': self.pro_distribution.ratio,
+            'enable_reroll': enable_reroll,
+            'max_rerolls': max_rerolls,
+            'engine': engine,
+            'sampler': self.sampler_type,
+            'workers': workers,
+            'seed': seed,
+        }
+        if report is not None:
+            metadata['precision'] = report
+        if qmc_report is not None:
+            metadata['qmc'] = qmc_report
+        result = SimulationArtifact.from_histogram(
+            self.characters, character_stats, draw_count, rounds, metadata, states
+        )
+        if cache_key is not None:
+            cache.put(cache_key, result)
+        return result
     
-    def _generate_excel_files(self, character_stats, draw_count, rounds):
+    def describe_run(self, draw_count, rounds, enable_reroll=True, max_rerolls=2, engine='scalar', seed=None,
+                     final_states=False, precision=None, replicates=None):
         """
-        生成Excel文件，包含所有角色的抽卡统计数据
+        获取决定一次运行结果的完整配置（用于缓存键）
+        
+        相同种子下分片模拟与单进程模拟逐位一致，进程数不影响结果，因此不包含在配置中
         
         Args:
-            character_stats: 角色统计数据字典
-            draw_count: 抽卡次数
+            与run_simulation相同（没有workers）
+            
+        Returns:
+            dict: 可JSON序列化的配置字典
+        """
+        return {
+            'characters': [
+                [character.attribute, character.get_level(), character.get_havetool()]
+                for character in self.characters
+            ],
+            'initial_value': self.pro_distribution.initial_value,
+            'ratio': self.pro_distribution.ratio,
+            'sampler': self.sampler_type,
+            'draw_count': draw_count,
+            # 精确求解与轮数和种子无关
+            'rounds': 1 if engine == 'exact' else rounds,
+            'enable_reroll': enable_reroll,
+            'max_rerolls': max_rerolls,
+            'engine': engine,
+            'seed': None if engine == 'exact' else seed,
+            'final_states': final_states,
+            'precision': precision.describe() if precision is not None and engine != 'exact' else None,
+            'replicates': self._resolve_replicates(engine, replicates),
+        }
+    
+    def collect_character_stats(self, draw_count, rounds, enable_reroll=True, max_rerolls=2, engine='scalar', seed=None,
+                                final_states=None, first_round=0):
+        """
+        模拟多轮抽卡并统计每次抽卡后主攻流派属性值的分布
+        
+        Args:
+            draw_count: 每轮抽卡次数
             rounds: 模拟轮数
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            engine: 模拟引擎，'scalar'、'batch'或'exact'，默认'scalar'
+            seed: 随机种子，默认None（使用模拟器的随机流）
+            final_states: 传入列表时，为每个角色追加 (流派列表, 最终属性值矩阵 (轮数, 流派数))，默认None
+            first_round: 第一轮的轮次，默认0
             
         Returns:
-            None，生成Excel文件到当前目录
+            ndarray: 直方图 character_stats[角色下标, 抽卡次数, 主攻流派属性值] = 轮数（'exact'引擎为float64概率），
+                宽度为histogram.value_capacity，第0次抽卡不记录
         """
-        filename = "simulation_results.xlsx"
-        print(f"  生成文件: {filename}")
+        if engine == 'exact':
+            if final_states is not None:
+                raise ValueError("精确求解没有逐轮最终状态")
+            from markov_solver import MarkovSolver
+            
+            character_stats = empty_histogram(self.characters, draw_count, np.float64)
+            MarkovSolver(self.pro_distribution).fill_character_stats(
+                self.characters, character_stats, draw_count, enable_reroll, max_rerolls
+            )
+            return character_stats
         
-        # 按等级分组角色
-        level_groups = {}
-        for i, character in enumerate(self.characters):
-            level = character.get_level()
-            if level not in level_groups:
-                level_groups[level] = []
-            level_groups[level].append((i, character))
-        
-        # 创建Excel写入器
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            # 按指定顺序处理等级：35, 18, 5
-            level_order = [35, 18, 5]
-            for level in level_order:
-                if level not in level_groups:
-                    continue
-                characters = level_groups[level]
-                # 创建工作表名称
-                sheet_name = f"等级{level}"
-                
-                # 获取该等级所有角色可能的属性值
-                all_values = set()
-                for char_idx, character in characters:
-                    for draw in range(draw_count + 1):
-                        all_values.update(character_stats[char_idx][draw].keys())
-                all_values = sorted(list(all_values))
-                
-                # 创建列名（包含两种tool状态）
-                columns = [''] + [f"The {j}th gacha" for j in range(draw_count + 1)]
-                
-                # 为每个tool状态创建数据
-                tool_data = {}
-                for char_idx, character in characters:
-                    havetool_text = "有灵器" if character.get_havetool() else "无灵器"
-                    
-                    data = []
-                    for value in all_values:
-                        row = [f"aimming_level{value}"]
-                        for draw in range(draw_count + 1):
-                            count = character_stats[char_idx][draw].get(value, 0)
-                            ratio = count / rounds
-                            row.append(ratio)
-                        data.append(row)
-                    
-                    tool_data[havetool_text] = data
-                
-                # 创建上下摆放的DataFrame
-                merged_data = []
-                merged_columns = [''] + [f"The {j}th gacha" for j in range(draw_count + 1)]
-                
-                # 添加无灵器数据
-                if "无灵器" in tool_data:
-                    # 添加无灵器标题行
-                    title_row = ["无灵器"] + [""] * draw_count
-                    merged_data.append(title_row)
-                    
-                    # 添加无灵器数据
-                    for value in all_values:
-                        row = [f"aimming_level{value}"]
-                        row.extend(tool_data["无灵器"][all_values.index(value)][1:])
-                        merged_data.append(row)
-                    
-                    # 添加空行分隔
-                    if "有灵器" in tool_data:
-                        empty_row = [""] * (draw_count + 1)
-                        merged_data.append(empty_row)
-                
-                # 添加有灵器数据
-                if "有灵器" in tool_data:
-                    # 添加有灵器标题行
-                    title_row = ["有灵器"] + [""] * draw_count
-                    merged_data.append(title_row)
-                    
-                    # 添加有灵器数据
-                    for value in all_values:
-                        row = [f"aimming_level{value}"]
-                        row.extend(tool_data["有灵器"][all_values.index(value)][1:])
-                        merged_data.append(row)
-                
-                # 创建DataFrame
-                df = pd.DataFrame(merged_data, columns=merged_columns)
-                
-                # 写入Excel工作表
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-                
-                # 获取工作表对象进行格式化
-                worksheet = writer.sheets[sheet_name]
-                
-                # 插入角色信息行
-                worksheet.insert_rows(1, 3)
-                
-                # 写入角色信息
-                from openpyxl.utils import get_column_letter
-                
-                # 角色信息样式
-                info_style = {
-                    'font': {
-                        'name': '微软雅黑',
-                        'size': 12,
-                        'bold': True
-                    },
-                    'fill': {
-                        'type': 'solid',
-                        'color': 'E6E6FA'
-                    }
-                }
-                
-                from write import write_and_format_cell
-                write_and_format_cell(worksheet, 'A1', f"等级 {level} 角色数据", info_style)
-                write_and_format_cell(worksheet, 'A2', f"包含无灵器和有灵器两种状态", info_style)
-                
-                # 写入表头
-                for col_idx, col_name in enumerate(merged_columns, 1):
-                    cell_address = f"{get_column_letter(col_idx)}4"
-                    write_header_cell(worksheet, cell_address, col_name)
-                
-                # 写入数据并格式化
-                data_start_row = 5
-                data_start_col = 2  # 从B列开始（跳过第一列标签）
-                
-                # 找到gacha=12, 15, 20对应的列索引
-                gacha_columns = {}
-                for col_idx, col_name in enumerate(merged_columns):
-                    if any(gacha in col_name for gacha in ["12th", "15th", "20th"]):
-                        # 从列名中提取gacha数字
-                        for gacha_num in [12, 15, 20]:
-                            if f"{gacha_num}th" in col_name:
-                                gacha_columns[gacha_num] = col_idx
-                                break
-                
-                # 分别收集无灵器和有灵器在gacha=12, 15, 20列的最大值
-                max_values = {}
-                
-                # 直接从tool_data中获取数据，避免索引问题
-                for gacha_num in [12, 15, 20]:
-                    if gacha_num in gacha_columns:
-                        col_idx = gacha_columns[gacha_num]
-                        max_values[gacha_num] = {'no_tool': None, 'has_tool': None}
-                        
-                        # 找无灵器最大值
-                        if "无灵器" in tool_data:
-                            no_tool_max_value = 0
-                            no_tool_max_cells = []
-                            for row_idx, row_data in enumerate(tool_data["无灵器"]):
-                                ratio = row_data[col_idx]
-                                # 确保ratio是数值类型
-                                if isinstance(ratio, str):
-                                    try:
-                                        ratio = float(ratio)
-                                    except ValueError:
-                                        continue
-                                if ratio > no_tool_max_value:
-                                    no_tool_max_value = ratio
-                                    # 计算实际的行号（跳过标题行）
-                                    actual_row = data_start_row + 1 + row_idx
-                                    no_tool_max_cells = [f"{get_column_letter(col_idx + 1)}{actual_row}"]
-                                elif ratio == no_tool_max_value:
-                                    actual_row = data_start_row + 1 + row_idx
-                                    no_tool_max_cells.append(f"{get_column_letter(col_idx + 1)}{actual_row}")
-                            
-                            max_values[gacha_num]['no_tool'] = {
-                                'value': no_tool_max_value,
-                                'cells': no_tool_max_cells
-                            }
-                        
-                        # 找有灵器最大值
-                        if "有灵器" in tool_data:
-                            has_tool_max_value = 0
-                            has_tool_max_cells = []
-                            for row_idx, row_data in enumerate(tool_data["有灵器"]):
-                                ratio = row_data[col_idx]
-                                # 确保ratio是数值类型
-                                if isinstance(ratio, str):
-                                    try:
-                                        ratio = float(ratio)
-                                    except ValueError:
-                                        continue
-                                if ratio > has_tool_max_value:
-                                    has_tool_max_value = ratio
-                                    # 计算实际的行号（跳过标题行、数据行、空行、标题行）
-                                    actual_row = data_start_row + 1 + len(all_values) + 2 + row_idx
-                                    has_tool_max_cells = [f"{get_column_letter(col_idx + 1)}{actual_row}"]
-                                elif ratio == has_tool_max_value:
-                                    actual_row = data_start_row + 1 + len(all_values) + 2 + row_idx
-                                    has_tool_max_cells.append(f"{get_column_letter(col_idx + 1)}{actual_row}")
-                            
-                            max_values[gacha_num]['has_tool'] = {
-                                'value': has_tool_max_value,
-                                'cells': has_tool_max_cells
-                            }
-                
-                # 写入数据行
-                current_row = data_start_row
-                
-                # 处理无灵器数据
-                if "无灵器" in tool_data:
-                    # 写入无灵器标题
-                    title_cell = f"A{current_row}"
-                    title_style = {
-                        'font': {
-                            'name': '微软雅黑',
-                            'size': 12,
-                            'bold': True
-                        },
-                        'fill': {
-                            'type': 'solid',
-                            'color': 'FFE6CC'
-                        }
-                    }
-                    write_and_format_cell(worksheet, title_cell, "无灵器", title_style)
-                    current_row += 1
+        character_stats = empty_histogram(self.characters, draw_count)
+        rng = RoundRandom(seed) if seed is not None else self.rng
+        if engine == 'batch':
+            from batch_engine import BatchEngine
+            
+            # 向量化批量模拟
+            BatchEngine(self.pro_distribution, seed=rng.seed, instrument=self.instrument).fill_character_stats(
+                self.characters, character_stats, draw_count, rounds, enable_reroll, max_rerolls, final_states,
+                first_round
+            )
+        else:
+            # 记录最终状态时每个角色预先分配一个紧凑的角色群体，每轮结束时写入一行
+            if final_states is not None:
+                populations = [
+                    CharacterPopulation(character.attribute, character.get_level(), character.get_havetool(), rounds)
+                    for character in self.characters
+                ]
+            
+            # 每轮的主攻流派属性值先写入缓冲区，每FLUSH_ROUNDS轮一次性累加到直方图
+            buffer_rounds = max(min(rounds, FLUSH_ROUNDS), 1)
+            main_buffers = np.zeros((len(self.characters), buffer_rounds, draw_count + 1), dtype=np.int64)
+            buffered = 0
+            
+            # 执行多轮模拟
+            rerolls_used = 0
+            blocks = round_blocks(draw_count, enable_reroll, max_rerolls)
+            for round_idx in range(first_round, first_round + rounds):
+                for i, character in enumerate(self.characters):
+                    # 重置角色属性，并定位到本角色本轮的随机流
+                    character.reset_all_attributes()
+                    rng.start_round(i, round_idx, blocks)
+                    remaining_rerolls = max_rerolls  # 初始化剩余重新roll次数
+                    main_values = [0] * (draw_count + 1)
                     
-                    # 写入无灵器数据
-                    for row_idx, value in enumerate(all_values):
-                        # 写入行标签
-                        label_cell = f"A{current_row}"
-                        write_and_format_cell(worksheet, label_cell, f"aimming_level{value}")
+                    # 执行抽卡过程
+                    for draw in range(draw_count):
+                        # 执行单次抽卡
+                        selected_style, _, _, _, remaining_rerolls = self._perform_single_draw(
+                            character, enable_reroll, remaining_rerolls, rng
+                        )
                         
-                        for col_idx, col_name in enumerate(merged_columns[1:], 1):  # 跳过第一列
-                            cell_address = f"{get_column_letter(col_idx + 1)}{current_row}"
-                            ratio = merged_data[current_row - data_start_row][col_idx]
-                            
-                            # 检查是否为gacha=12, 15, 20的列
-                            gacha_num = None
-                            for gacha_col in gacha_columns:
-                                if col_idx == gacha_columns[gacha_col]:
-                                    gacha_num = gacha_col
-                                    break
-                            
-                            # 写入数据
-                            if gacha_num is not None:
-                                # 先写入普通格式，稍后更新为最大值格式
-                                write_percentage_cell(worksheet, cell_address, ratio)
-                            else:
-                                write_percentage_cell(worksheet, cell_address, ratio)
+                        # 增加对应流派的value
+                        character.increase_attribute_value(selected_style, 1)
                         
-                        current_row += 1
-                    
-                    # 添加空行分隔
-                    if "有灵器" in tool_data:
-                        current_row += 1
-                
-                # 处理有灵器数据
-                if "有灵器" in tool_data:
-                    # 写入有灵器标题
-                    title_cell = f"A{current_row}"
-                    title_style = {
-                        'font': {
-                            'name': '微软雅黑',
-                            'size': 12,
-                            'bold': True
-                        },
-                        'fill': {
-                            'type': 'solid',
-                            'color': 'E6F3FF'
-                        }
-                    }
-                    write_and_format_cell(worksheet, title_cell, "有灵器", title_style)
-                    current_row += 1
+                        # 记录当前状态
+                        main_values[draw + 1] = character.get_attribute_value(character.attribute)
                     
-                    # 写入有灵器数据
-                    for row_idx, value in enumerate(all_values):
-                        # 写入行标签
-                        label_cell = f"A{current_row}"
-                        write_and_format_cell(worksheet, label_cell, f"aimming_level{value}")
-                        
-                        for col_idx, col_name in enumerate(merged_columns[1:], 1):  # 跳过第一列
-                            cell_address = f"{get_column_letter(col_idx + 1)}{current_row}"
-                            ratio = merged_data[current_row - data_start_row][col_idx]
-                            
-                            # 检查是否为gacha=12, 15, 20的列
-                            gacha_num = None
-                            for gacha_col in gacha_columns:
-                                if col_idx == gacha_columns[gacha_col]:
-                                    gacha_num = gacha_col
-                                    break
-                            
-                            # 写入数据
-                            if gacha_num is not None:
-                                # 先写入普通格式，稍后更新为最大值格式
-                                write_percentage_cell(worksheet, cell_address, ratio)
-                            else:
-                                write_percentage_cell(worksheet, cell_address, ratio)
-                        
-                        current_row += 1
-                
-                # 重新写入最大值单元格并设置颜色
-                for gacha_num, max_info in max_values.items():
-                    # 设置无灵器最大值
-                    if max_info['no_tool']:
-                        for cell_address in max_info['no_tool']['cells']:
-                            write_max_value_cell(worksheet, cell_address, max_info['no_tool']['value'], gacha_num)
+                    main_buffers[i, buffered] = main_values
+                    if final_states is not None:
+                        populations[i].store(round_idx - first_round, character)
                     
-                    # 设置有灵器最大值
-                    if max_info['has_tool']:
-                        for cell_address in max_info['has_tool']['cells']:
-                            write_max_value_cell(worksheet, cell_address, max_info['has_tool']['value'], gacha_num)
+                    # 统计消耗的重新roll次数
+                    rerolls_used += max_rerolls - remaining_rerolls
                 
-                # 添加数据条
-                data_end_row = current_row - 1
-                data_end_col = len(merged_columns)
-                apply_data_bars(worksheet, data_start_row, data_start_col, data_end_row, data_end_col)
+                buffered += 1
+                if buffered == buffer_rounds:
+                    for i in range(len(self.characters)):
+                        add_main_values(character_stats, i, main_buffers[i])
+                    buffered = 0
                 
-                # 添加图例
-                legend_start_row = data_end_row + 3
-                write_gacha_legend(worksheet, legend_start_row, 1)
+                # 每轮结束时报告进度
+                self.instrument.progress('simulation', round_idx - first_round + 1, rounds)
+            
+            for i in range(len(self.characters)):
+                add_main_values(character_stats, i, main_buffers[i, :buffered])
+            self.instrument.count('rerolls', rerolls_used)
+            
+            if final_states is not None:
+                for population in populations:
+                    final_states.append((population.get_style_names(), population.counts))
+        
+        return character_stats
+    
+    def _generate_excel_files(self, character_stats, draw_count, rounds, write_only=False):
+        """
+        生成Excel文件，包含所有角色的抽卡统计数据
+        
+        Args:
+            character_stats: 直方图 (角色数, draw_count+1, 属性值个数)
+            draw_count: 抽卡次数
+            rounds: 模拟轮数
+            write_only: 是否以流式模式写出，默认False
+            
+        Returns:
+            None，生成Excel文件到当前目录
+        """
+        from artifact import SimulationArtifact
+        
+        self._render_excel(
+            SimulationArtifact.from_histogram(self.characters, character_stats, draw_count, rounds), write_only
+        )
+    
+    def _render_excel(self, result, write_only=False):
+        """
+        由列式结果渲染Excel文件
+        
+        Args:
+            result: SimulationArtifact实例
+            write_only: 是否以流式模式写出，默认False
+            
+        Returns:
+            None，生成Excel文件到当前目录
+        """
+        filename = "simulation_results.xlsx"
+        print(f"  生成文件: {filename}")
+        
+        # 报告是基于结果的渲染步骤，每个单元格只以最终样式写入一次
+        result.render_report(filename, write_only, self.instrument)
 
 
 
@@ -0,0 +1,278 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import csv
+import itertools
+import json
+import numpy as np
+from parallel import shard_seeds
+
+"""
+参数扫描
+
+功能说明：
+- 对ProDistribution(initial_value, ratio)、重新roll设置与抽卡次数的网格或配置列表批量模拟
+- 只有draw_count不同的配置共享同一前缀：按最大draw_count只模拟一次，再截取前若干次抽卡的直方图
+  （每轮随机数与抽卡次数无关，相同种子下与单独模拟每个draw_count的结果相同）
+- 各组配置在多个进程中并行运行
+- 输出一张汇总表（CSV），每个配置的每个角色一行
+
+用法示例：
+    python sweep.py --ratio 0.5 0.6 0.7 --max-rerolls 0 1 2 --draw-count 12 15 20 \\
+        --rounds 100000 --engine batch --workers 4 --seed 1 --output sweep_results.csv
+"""
+
+# 配置字段及默认值
+CONFIG_DEFAULTS = {
+    'initial_value': 500,
+    'ratio': 0.6,
+    'enable_reroll': True,
+    'max_rerolls': 2,
+    'draw_count': 15,
+}
+
+# 共享前缀的配置字段（除draw_count以外全部相同即可复用）
+GROUP_FIELDS = ('initial_value', 'ratio', 'enable_reroll', 'max_rerolls')
+
+# 汇总表的列
+RESULT_COLUMNS = list(CONFIG_DEFAULTS) + [
+    'rounds', 'engine', 'seed', 'character', 'attribute', 'level', 'havetool',
+    'mean_value', 'p_zero', 'threshold', 'p_above_threshold',
+]
+
+
+def expand_grid(**axes):
+    """
+    将各参数的取值列表展开为配置列表（笛卡尔积）
+
+    Args:
+        **axes: 参数名 -> 取值列表，未给出的参数使用默认值
+
+    Returns:
+        list: 配置字典列表
+    """
+    for name in axes:
+        if name not in CONFIG_DEFAULTS:
+            raise ValueError(f"扫描参数 '{name}' 不存在")
+    names = list(axes)
+    return [dict(CONFIG_DEFAULTS, **dict(zip(names, values))) for values in itertools.product(*axes.values())]
+
+
+def normalize_config(config):
+    """
+    补全配置中缺省的字段
+
+    Args:
+        config: 配置字典
+
+    Returns:
+        dict: 完整的配置字典
+    """
+    for name in config:
+        if name not in CONFIG_DEFAULTS:
+            raise ValueError(f"扫描参数 '{name}' 不存在")
+    return dict(CONFIG_DEFAULTS, **config)
+
+
+def group_configs(configs):
+    """
+    按共享前缀将配置分组
+
+    Args:
+        configs: 完整配置字典列表
+
+    Returns:
+        dict: 分组键 -> 组内配置列表（保持输入顺序）
+    """
+    groups = {}
+    for config in configs:
+        groups.setdefault(tuple(config[field] for field in GROUP_FIELDS), []).append(config)
+    return groups
+
+
+def _run_group(task):
+    """
+    工作进程：按组内最大的draw_count模拟一次
+
+    Args:
+        task: (分组键, 最大抽卡次数, 轮数, 引擎, 种子, 缓存目录)
+
+    Returns:
+        SimulationArtifact: 模拟结果
+    """
+    from simulator import Simulator
+    from ProDistribution import ProDistribution
+    from cache import ResultCache
+
+    group_key, draw_count, rounds, engine, seed, cache_dir = task
+    initial_value, ratio, enable_reroll, max_rerolls = group_key
+    simulator = Simulator(ProDistribution(initial_value, ratio))
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    return simulator.run_simulation(draw_count, rounds, enable_reroll, max_rerolls, engine, seed=seed, cache=cache)
+
+
+def summarize(artifact, draw_count, threshold):
+    """
+    计算结果在第draw_count次抽卡时每个角色的汇总指标
+
+    Args:
+        artifact: SimulationArtifact实例
+        draw_count: 抽卡次数（不超过artifact.draw_count）
+        threshold: 阈值
+
+    Returns:
+        list: 每个角色的 (平均属性值, 属性值为0的比例, 属性值>threshold的比例)
+    """
+    summaries = []
+    values = np.arange(artifact.histogram.shape[2])
+    for char_histogram in artifact.histogram:
+        histogram = char_histogram[draw_count].astype(np.float64)
+        total = histogram.sum()
+        if total == 0:
+            # 第0次抽卡不记录，没有数据
+            summaries.append((float('nan'), float('nan'), float('nan')))
+            continue
+        probabilities = histogram / total
+        summaries.append((
+            float(probabilities @ values),
+            float(probabilities[0]),
+            float(probabilities[values > threshold].sum()),
+        ))
+    return summaries
+
+
+def run_sweep(configs, rounds=1000, engine='batch', workers=1, seed=None, threshold=7, cache_dir=None):
+    """
+    批量运行参数扫描
+
+    Args:
+        configs: 配置字典列表（缺省字段使用CONFIG_DEFAULTS）
+        rounds: 每个配置的模拟轮数，默认1000
+        engine: 模拟引擎，'scalar'、'batch'或'exact'，默认'batch'
+        workers: 并行进程数，默认1
+        seed: 随机种子，给定时每组都使用相同的种子（公共随机数，便于比较配置）；
+            默认None，每组使用独立的系统熵
+        threshold: 统计p_above_threshold使用的阈值，默认7
+        cache_dir: 结果缓存目录，给定种子（或精确求解）时直接复用缓存结果，默认None
+
+    Returns:
+        list: 汇总表的行（字典），按输入配置顺序、每个配置的每个角色一行
+    """
+    if engine not in ('scalar', 'batch', 'exact'):
+        raise ValueError(f"模拟引擎 '{engine}' 不存在")
+
+    configs = [normalize_config(config) for config in configs]
+    groups = group_configs(configs)
+    keys = list(groups)
+    if seed is not None:
+        seeds = [seed] * len(keys)
+    else:
+        # 不固定种子时也为每组派生不同的种子，避免fork出的进程共享随机状态
+        seeds = shard_seeds(None, len(keys))
+        # 派生的种子不会再次出现，写入的缓存条目永远不会命中
+        if engine != 'exact':
+            cache_dir = None
+    tasks = [
+        (key, max(config['draw_count'] for config in groups[key]), rounds, engine, group_seed, cache_dir)
+        for key, group_seed in zip(keys, seeds)
+    ]
+
+    if workers <= 1:
+        artifacts = [_run_group(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            artifacts = list(executor.map(_run_group, tasks))
+    results = dict(zip(keys, artifacts))
+
+    rows = []
+    for config in configs:
+        artifact = results[tuple(config[field] for field in GROUP_FIELDS)]
+        summaries = summarize(artifact, config['draw_count'], threshold)
+        for i, ((attribute, level, havetool), summary) in enumerate(zip(artifact.characters, summaries)):
+            mean_value, p_zero, p_above = summary
+            row = dict(config)
+            row.update({
+                'rounds': artifact.rounds,
+                'engine': engine,
+                'seed': artifact.metadata['seed'],
+                'character': i,
+                'attribute': attribute,
+                'level': level,
+                'havetool': havetool,
+                'mean_value': mean_value,
+                'p_zero': p_zero,
+                'threshold': threshold,
+                'p_above_threshold': p_above,
+            })
+            rows.append(row)
+    return rows
+
+
+def write_sweep_table(filename, rows):
+    """
+    将汇总表写入CSV文件
+
+    Args:
+        filename: 输出文件名
+        rows: run_sweep返回的行
+    """
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_bool(text):
+    """解析命令行中的布尔值"""
+    if text.lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if text.lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise argparse.ArgumentTypeError(f"无法解析布尔值 '{text}'")
+
+
+def build_parser():
+    """
+    构造命令行参数解析器
+
+    Returns:
+        argparse.ArgumentParser: 参数解析器
+    """
+    parser = argparse.ArgumentParser(description="对抽卡概率分布与重新roll设置进行参数扫描")
+    parser.add_argument('--configs', help="配置列表JSON文件（字典列表），给出时忽略网格参数")
+    parser.add_argument('--initial-value', type=float, nargs='+', default=[CONFIG_DEFAULTS['initial_value']])
+    parser.add_argument('--ratio', type=float, nargs='+', default=[CONFIG_DEFAULTS['ratio']])
+    parser.add_argument('--enable-reroll', type=parse_bool, nargs='+', default=[CONFIG_DEFAULTS['enable_reroll']])
+    parser.add_argument('--max-rerolls', type=int, nargs='+', default=[CONFIG_DEFAULTS['max_rerolls']])
+    parser.add_argument('--draw-count', type=int, nargs='+', default=[CONFIG_DEFAULTS['draw_count']])
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--engine', default='batch', choices=['scalar', 'batch', 'exact'])
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--threshold', type=int, default=7)
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--cache-dir', default=None, help="结果缓存目录（只缓存给定种子或精确求解的运行）")
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    if args.configs:
+        with open(args.configs, encoding='utf-8') as file:
+            configs = json.load(file)
+    else:
+        configs = expand_grid(
+            initial_value=args.initial_value,
+            ratio=args.ratio,
+            enable_reroll=args.enable_reroll,
+            max_rerolls=args.max_rerolls,
+            draw_count=args.draw_count,
+        )
+
+    rows = run_sweep(configs, args.rounds, args.engine, args.workers, args.seed, args.threshold, args.cache_dir)
+    write_sweep_table(args.output, rows)
+    print(f"共{len(configs)}个配置，结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+import adaptive
+from adaptive import PrecisionTarget, adaptive_character_stats, adaptive_ratio_counts, wilson_half_width
+from ProDistribution import ProDistribution
+from simulator import Simulator
+
+"""
+自适应模拟测试
+
+功能说明：
+- 最差单元格的Wilson半宽达到目标的第一批之后停止
+- 轮数上限与时间预算得到遵守，每批轮数不超过已模拟的轮数（总轮数最多翻倍）
+- 分批模拟的结果与用同一种子一次模拟相同轮数一致
+"""
+
+
+def _run(target, proportion=0.3, clock=None):
+    """用固定比例的假计数运行主循环，返回每批轮数与精度报告"""
+    batches = []
+
+    def run_batch(rounds, first_round):
+        assert first_round == sum(batches)
+        batches.append(rounds)
+        if clock is not None:
+            clock.advance(rounds)
+
+    def tracked_counts():
+        return [np.array([proportion * sum(batches), 0.5 * sum(batches)])]
+
+    rounds, report = adaptive._run_adaptive(target, run_batch, tracked_counts)
+    assert rounds == sum(batches) == report['rounds']
+    return batches, report
+
+
+def _assert_at_most_doubles(batches):
+    for k in range(1, len(batches)):
+        assert batches[k] <= sum(batches[:k])
+
+
+def test_stops_when_target_met():
+    target = PrecisionTarget(half_width=0.01, initial_rounds=500)
+    batches, report = _run(target)
+    assert report['converged']
+    assert report['max_half_width'] <= 0.01
+    # 上一批结束时尚未达到目标
+    previous = sum(batches[:-1])
+    assert wilson_half_width(0.5 * previous, previous, target.z) > 0.01
+    _assert_at_most_doubles(batches)
+
+
+def test_respects_max_rounds():
+    target = PrecisionTarget(half_width=0.001, initial_rounds=300, max_rounds=5000)
+    batches, report = _run(target)
+    assert sum(batches) == 5000
+    assert not report['converged']
+    _assert_at_most_doubles(batches)
+
+    # 上限小于第一批时只模拟上限轮数
+    batches, _ = _run(PrecisionTarget(half_width=0.001, initial_rounds=1000, max_rounds=200))
+    assert batches == [200]
+
+
+class _FakeClock:
+    """每模拟一轮前进固定时间的假时钟"""
+
+    def __init__(self, seconds_per_round):
+        self.now = 0.0
+        self.seconds_per_round = seconds_per_round
+
+    def advance(self, rounds):
+        self.now += rounds * self.seconds_per_round
+
+    def __call__(self):
+        return self.now
+
+
+def test_respects_time_budget(monkeypatch):
+    clock = _FakeClock(1e-4)
+    monkeypatch.setattr(adaptive.time, 'perf_counter', clock)
+    target = PrecisionTarget(half_width=0.0001, initial_rounds=500, time_budget=2.0)
+    batches, report = _run(target, clock=clock)
+    assert not report['converged']
+    # 按目前的速度估算剩余时间，最后一批不会超出预算
+    assert report['elapsed'] == pytest.approx(2.0, abs=2e-4)
+    assert sum(batches) <= 20001
+    _assert_at_most_doubles(batches)
+
+
+def test_batches_match_single_run():
+    simulator = Simulator(ProDistribution(500, 0.6))
+    target = PrecisionTarget(half_width=0.02, initial_rounds=200, tracked_draws=(8,))
+    counts, rounds, report = adaptive_ratio_counts(simulator, 8, 3, target, seed=4)
+    assert report['converged'] and report['max_half_width'] <= 0.02
+    assert counts == simulator.collect_ratio_counts(8, rounds, 3, engine='batch', seed=4)
+
+    stats, rounds, report = adaptive_character_stats(simulator, 8, target, engine='scalar', seed=4)
+    assert report['converged']
+    single = simulator.collect_character_stats(8, rounds, engine='scalar', seed=4)
+    np.testing.assert_array_equal(stats, single)
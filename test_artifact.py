@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from simulator import Simulator
+from artifact import SimulationArtifact
+
+"""
+列式模拟结果测试
+
+功能说明：
+- .npz格式保存后读取，直方图、元数据、角色配置与int16最终状态不变
+- .parquet格式（需要pyarrow）保存后读取，直方图、元数据与角色配置不变
+"""
+
+
+@pytest.fixture(scope='module')
+def result():
+    simulator = Simulator(ProDistribution(500, 0.6))
+    return simulator.run_simulation(10, 200, engine='batch', seed=9, final_states=True)
+
+
+def _assert_same_header(loaded, result):
+    assert loaded.characters == result.characters
+    assert (loaded.draw_count, loaded.rounds) == (result.draw_count, result.rounds)
+    assert loaded.metadata == result.metadata
+
+
+def test_npz_round_trip(result, tmp_path):
+    filename = str(tmp_path / 'run.npz')
+    result.save(filename)
+    loaded = SimulationArtifact.load(filename)
+    _assert_same_header(loaded, result)
+    np.testing.assert_array_equal(loaded.histogram, result.histogram)
+    assert loaded.histogram.dtype == result.histogram.dtype
+    assert len(loaded.final_states) == len(result.final_states)
+    for (styles, counts), (saved_styles, saved_counts) in zip(loaded.final_states, result.final_states):
+        assert styles == saved_styles
+        assert counts.dtype == np.int16
+        np.testing.assert_array_equal(counts, saved_counts)
+
+
+def test_parquet_round_trip(result, tmp_path):
+    pytest.importorskip('pyarrow')
+    filename = str(tmp_path / 'run.parquet')
+    # Parquet格式只保存直方图
+    with pytest.raises(ValueError):
+        result.save(filename)
+    histogram_only = SimulationArtifact(
+        result.characters, result.histogram, result.draw_count, result.rounds, result.metadata
+    )
+    histogram_only.save(filename)
+    loaded = SimulationArtifact.load(filename)
+    _assert_same_header(loaded, result)
+    np.testing.assert_array_equal(loaded.histogram, result.histogram)
+
+
+def test_unknown_format(result, tmp_path):
+    with pytest.raises(ValueError):
+        result.save(str(tmp_path / 'run.csv'))
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from simulator import Simulator
+
+"""
+批量引擎测试
+
+功能说明：
+- 相同种子下，批量引擎与逐轮模拟的直方图和每轮最终状态逐位一致
+"""
+
+
+def run(engine, draw_count=20, rounds=600, enable_reroll=True, max_rerolls=2, seed=42):
+    simulator = Simulator(ProDistribution(500, 0.6))
+    return simulator.run_simulation(draw_count, rounds, enable_reroll, max_rerolls, engine, seed=seed,
+                                    final_states=True)
+
+
+@pytest.mark.parametrize('enable_reroll, max_rerolls', [(True, 2), (False, 2), (True, 5)])
+def test_batch_matches_scalar(enable_reroll, max_rerolls):
+    scalar = run('scalar', enable_reroll=enable_reroll, max_rerolls=max_rerolls)
+    batch = run('batch', enable_reroll=enable_reroll, max_rerolls=max_rerolls)
+    assert batch.histogram.dtype == scalar.histogram.dtype
+    np.testing.assert_array_equal(batch.histogram, scalar.histogram)
+    for (scalar_styles, scalar_counts), (batch_styles, batch_counts) in zip(scalar.final_states, batch.final_states):
+        assert batch_styles == scalar_styles
+        np.testing.assert_array_equal(batch_counts, scalar_counts)
+
+
+def test_batch_counts_every_round():
+    result = run('batch', draw_count=15, rounds=1000)
+    # 第0次抽卡不记录，之后每次抽卡每个角色都恰好统计全部轮
+    assert not result.histogram[:, 0].any()
+    np.testing.assert_array_equal(result.histogram[:, 1:].sum(axis=2), 1000)
@@ -0,0 +1,48 @@
+import numpy as np
+from ProDistribution import ProDistribution
+from simulator import Simulator
+from cache import ResultCache
+
+"""
+磁盘结果缓存测试
+
+功能说明：
+- 进程数不影响结果，不同进程数的相同运行命中同一个缓存结果，命中时元数据记录本次调用的进程数
+- 损坏的缓存文件视为未命中，重新模拟后覆盖
+"""
+
+
+def test_workers_share_cache_entry(tmp_path):
+    simulator = Simulator(ProDistribution(500, 0.6))
+    cache = ResultCache(str(tmp_path))
+    single = simulator.run_simulation(12, 200, engine='batch', workers=1, seed=5, cache=cache)
+    sharded = simulator.run_simulation(12, 200, engine='batch', workers=2, seed=5, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_array_equal(sharded.histogram, single.histogram)
+    # 命中时元数据记录本次调用的进程数，其余字段与第一次运行相同
+    assert (single.metadata['workers'], sharded.metadata['workers']) == (1, 2)
+    assert {**sharded.metadata, 'workers': 1} == single.metadata
+
+
+def test_cache_hit_metadata_follows_call(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    Simulator(ProDistribution(500, 0.6)).run_simulation(12, 200, engine='batch', workers=2, seed=5, cache=cache)
+    hit = Simulator(ProDistribution(500, 0.6)).run_simulation(12, 200, engine='batch', seed=5, cache=cache)
+    assert cache.hits == 1
+    assert hit.metadata['workers'] == 1
+    assert hit.metadata['sampler'] == 'cumulative'
+    assert hit.metadata['seed'] == 5
+
+
+def test_corrupted_entry_is_a_miss(tmp_path):
+    simulator = Simulator(ProDistribution(500, 0.6))
+    cache = ResultCache(str(tmp_path))
+    first = simulator.run_simulation(12, 200, engine='batch', seed=5, cache=cache)
+    (entry,) = tmp_path.glob('*.npz')
+    # 以zip文件头开头的截断文件，np.load会抛出zipfile.BadZipFile
+    entry.write_bytes(entry.read_bytes()[:64])
+
+    assert cache.get(entry.stem) is None
+    second = simulator.run_simulation(12, 200, engine='batch', seed=5, cache=cache)
+    np.testing.assert_array_equal(second.histogram, first.histogram)
+    assert cache.get(entry.stem) is not None
@@ -0,0 +1,109 @@
+import random
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from character import Character, CharacterPopulation
+
+"""
+角色增量状态测试
+
+功能说明：
+- 随机修改属性值后，增量维护的属性值多重集、升序属性值、已拥有流派、权重之和、卡池顺序与规范签名
+  与从头重建的结果一致
+- get_current_weight按流派的字典插入顺序返回概率
+- 角色群体与Character互相转换不丢失属性值，批量引擎生成的群体与运行结果中的最终状态一致
+"""
+
+
+def _rebuilt(character, pro_distribution):
+    """用当前属性值从头重建一个角色"""
+    fresh = Character(character.attribute, character.level, character.havetool)
+    fresh.attribute_values = dict(character.attribute_values)
+    fresh.bind_distribution(pro_distribution)
+    return fresh
+
+
+def _assert_same_state(character, fresh, pro_distribution):
+    values = list(character.attribute_values.values())
+    assert character.value_counts == fresh.value_counts
+    assert character.get_value_signature() == fresh.get_value_signature() == tuple(sorted(values))
+    assert character.owned_styles == fresh.owned_styles
+    assert character.get_style_count() == fresh.get_style_count() == sum(1 for value in values if value > 0)
+    assert character.owned_weight == pytest.approx(fresh.owned_weight)
+    assert character.get_total_weight() == pytest.approx(fresh.get_total_weight())
+    assert character.get_pool_order() == fresh.get_pool_order()
+    assert pro_distribution.get_state_signature(character) == pro_distribution.get_state_signature(fresh)
+
+
+@pytest.mark.parametrize('level', [5, 18, 35])
+def test_incremental_state_matches_rebuild(level):
+    pro_distribution = ProDistribution(500, 0.6)
+    character = Character("熔岩球", level, havetool=True)
+    character.bind_distribution(pro_distribution)
+    rng = random.Random(level)
+    styles = list(character.attribute_values)
+    for step in range(300):
+        # 先取一次卡池顺序，使之后的属性值变化走增量调整
+        character.get_pool_order()
+        style = rng.choice(styles)
+        if rng.random() < 0.2:
+            # 清零会使已拥有流派减少，卡池可能在两种模式之间切换
+            character.set_attribute_value(style, 0)
+        else:
+            character.increase_attribute_value(style, rng.choice([1, 1, 2]))
+        _assert_same_state(character, _rebuilt(character, pro_distribution), pro_distribution)
+
+
+@pytest.mark.parametrize('restricted', [False, True])
+def test_current_weight_keeps_insertion_order(restricted):
+    pro_distribution = ProDistribution(500, 0.6)
+    character = Character("熔岩球", 18)
+    character.bind_distribution(pro_distribution)
+    styles = list(character.attribute_values)
+    owned = styles[-1:] + styles[:3 if restricted else 1]
+    for value, style in enumerate(owned, start=1):
+        character.set_attribute_value(style, 4 - value % 3)
+
+    probabilities = pro_distribution.get_current_weight(character)
+    expected = [style for style in styles if not restricted or character.attribute_values[style] > 0]
+    assert list(probabilities) == expected
+    weights = {style: pro_distribution.get_style_weight(style, character.attribute_values[style]) for style in expected}
+    total = sum(weights.values())
+    assert probabilities == pytest.approx({style: weight / total for style, weight in weights.items()})
+    # 卡池顺序（属性值升序）只由get_pool_order提供
+    assert sorted(character.get_pool_order()) == sorted(expected)
+
+
+def test_population_round_trip():
+    character = Character("熔岩球", 18, havetool=True)
+    population = CharacterPopulation("熔岩球", 18, True, 4)
+    assert not hasattr(population, '__dict__')
+    assert population.get_style_names() == list(character.attribute_values)
+    assert population.nbytes == 4 * len(character.attribute_values) * 2
+    assert population.get_attribute_values("熔岩球").tolist() == [1, 1, 1, 1]
+
+    for step, style in enumerate(["电球", "黑洞", "电球", "岩崩"]):
+        character.increase_attribute_value(style, step + 1)
+    population.store(2, character)
+    restored = population.to_character(2)
+    assert restored == character
+    assert population.get_style_counts().tolist() == [1, 1, 4, 1]
+    with pytest.raises(ValueError):
+        population.get_slot("暗影之爪")
+    with pytest.raises(ValueError):
+        CharacterPopulation.from_counts(character, population.counts[:, 1:])
+
+
+def test_batch_population_matches_final_states():
+    from batch_engine import BatchEngine
+    from simulator import Simulator
+
+    simulator = Simulator(ProDistribution(500, 0.6))
+    run = simulator.run_simulation(10, 300, engine='batch', seed=4, final_states=True)
+    engine = BatchEngine(simulator.pro_distribution, chunk_size=128, seed=4)
+    for i, character in enumerate(simulator.characters):
+        population = engine.simulate_population(character, 10, 300, character_index=i)
+        styles, counts = run.final_states[i]
+        assert population.get_style_names() == styles
+        assert population.counts.dtype == counts.dtype
+        np.testing.assert_array_equal(population.counts, counts)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from compare import PairedStatistic, PairedIndicatorStatistic
+
+"""
+公共随机数对比测试
+
+功能说明：
+- 属性值指示量的bincount累加与逐轮展开成独热数组的结果一致（含对偶模式）
+"""
+
+
+@pytest.mark.parametrize('pair_size', [1, 2])
+def test_indicator_statistic_matches_one_hot(pair_size):
+    rng = np.random.default_rng(0)
+    shape = (6, 9)
+    indicator = PairedIndicatorStatistic(shape)
+    one_hot = PairedStatistic(shape)
+    for _ in range(3):
+        baseline = rng.integers(0, 5, size=(40, shape[0]))
+        # 变体与基准部分相同，覆盖差值为0的格
+        variant = np.where(rng.random(baseline.shape) < 0.5, baseline, rng.integers(0, 9, size=baseline.shape))
+        indicator.add(baseline, variant, pair_size)
+        one_hot.add(np.eye(shape[1])[baseline], np.eye(shape[1])[variant], pair_size)
+
+    expected = one_hot.summary(1.96)
+    for name, values in indicator.summary(1.96).items():
+        np.testing.assert_allclose(values, expected[name], rtol=1e-12, equal_nan=True)
@@ -0,0 +1,46 @@
+import warnings
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from simulator import Simulator
+from importance import estimate_event
+
+"""
+重要性抽样测试
+
+功能说明：
+- 与精确求解器的结果在置信区间内一致
+- 事件ESS不足时不给出错误的窄置信区间，而是返回NaN并发出警告
+"""
+
+
+@pytest.fixture(scope='module')
+def simulator():
+    return Simulator(ProDistribution(500, 0.6))
+
+
+@pytest.fixture(scope='module')
+def exact(simulator):
+    return simulator.run_simulation(15, engine='exact').histogram
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_estimate_matches_exact(simulator, exact, seed):
+    result = estimate_event(simulator, 4, 'above', 9, 15, 50000, seed=seed)
+    probability = exact[4, 15, 10:].sum()
+    assert result['reliable']
+    assert abs(result['estimate'] - probability) <= 4 * result['standard_error']
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_rare_event_is_consistent_with_exact(simulator, exact, seed):
+    # 角色4属性值>12的精确概率约3e-14，似然比重尾，曾经估计为1e-30~1e-19且置信区间很窄
+    probability = exact[4, 15, 13:].sum()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        result = estimate_event(simulator, 4, 'above', 12, 15, 50000, seed=seed)
+    if result['reliable']:
+        assert abs(result['estimate'] - probability) <= 4 * result['standard_error']
+    else:
+        assert np.isnan(result['estimate']) and np.isnan(result['half_width'])
+        assert any(issubclass(item.category, RuntimeWarning) and "事件ESS" in str(item.message) for item in caught)
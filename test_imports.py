@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+"""
+启动开销测试
+
+功能说明：
+- 导入simulator与逐轮模拟不会导入各引擎、结果缓存与追踪模块（只在使用它们的分支内导入）
+"""
+
+# 只在对应分支内导入的模块
+LAZY_MODULES = (
+    'batch_engine', 'markov_solver', 'parallel', 'adaptive', 'qmc', 'cache', 'draw_trace', 'sampler',
+    'concurrent.futures.process',
+)
+
+
+def _loaded_modules(code):
+    """在新的解释器中执行代码，返回其中已导入的LAZY_MODULES"""
+    script = code + f"\nimport sys\nprint(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    ).stdout
+    return [name for name in output.splitlines()[-1].split(',') if name]
+
+
+def test_import_is_lazy():
+    assert _loaded_modules("import simulator") == []
+
+
+def test_scalar_ratio_imports_no_engine():
+    code = "import cli\ncli.main(['ratio', '--draw-count', '5', '--rounds', '20', '--seed', '1'])"
+    assert _loaded_modules(code) == []
+    code = "import cli\ncli.main(['ratio', '--draw-count', '5', '--rounds', '20', '--seed', '1', '--engine', 'batch'])"
+    assert _loaded_modules(code) == ['batch_engine']
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from simulator import Simulator
+
+"""
+精确求解器测试
+
+功能说明：
+- 每次抽卡后的概率分布之和为1
+- 与大量轮次的蒙特卡洛结果在抽样误差范围内一致
+"""
+
+
+@pytest.fixture(scope='module')
+def simulator():
+    return Simulator(ProDistribution(500, 0.6))
+
+
+@pytest.mark.parametrize('enable_reroll', [True, False])
+def test_exact_matches_monte_carlo(simulator, enable_reroll):
+    draw_count, rounds = 12, 20000
+    exact = simulator.run_simulation(draw_count, enable_reroll=enable_reroll, engine='exact')
+    sampled = simulator.run_simulation(draw_count, rounds, enable_reroll=enable_reroll, engine='batch', seed=11)
+
+    assert exact.histogram.dtype == np.float64
+    np.testing.assert_allclose(exact.histogram[:, 1:].sum(axis=2), 1.0)
+
+    width = max(exact.histogram.shape[2], sampled.histogram.shape[2])
+    probabilities = np.pad(exact.histogram, ((0, 0), (0, 0), (0, width - exact.histogram.shape[2])))
+    proportions = np.pad(sampled.histogram, ((0, 0), (0, 0), (0, width - sampled.histogram.shape[2]))) / rounds
+    # 每个单元格的二项分布标准误，加上很小的下限避免概率接近0时过严
+    standard_errors = np.sqrt(probabilities * (1 - probabilities) / rounds) + 1e-4
+    assert np.all(np.abs(proportions - probabilities) <= 5 * standard_errors)
@@ -0,0 +1,54 @@
+import io
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from simulator import Simulator
+from parallel import collect_ratio_counts_sharded, split_rounds
+from instrument import Instrument
+
+"""
+多进程分片测试
+
+功能说明：
+- 相同种子下，结果与进程数无关，与单进程模拟逐位一致
+- 分片的计数器合并到主进程的插桩中
+"""
+
+
+@pytest.fixture(scope='module')
+def simulator():
+    return Simulator(ProDistribution(500, 0.6))
+
+
+def test_split_rounds():
+    assert split_rounds(10, 3) == [4, 3, 3]
+    assert sum(split_rounds(1001, 4)) == 1001
+
+
+@pytest.mark.parametrize('engine', ['scalar', 'batch'])
+def test_sharded_matches_single_process(simulator, engine):
+    single = simulator.run_simulation(12, 400, engine=engine, workers=1, seed=7, final_states=True)
+    sharded = simulator.run_simulation(12, 400, engine=engine, workers=3, seed=7, final_states=True)
+    np.testing.assert_array_equal(sharded.histogram, single.histogram)
+    for (_, single_counts), (_, sharded_counts) in zip(single.final_states, sharded.final_states):
+        np.testing.assert_array_equal(sharded_counts, single_counts)
+
+
+def test_sharded_ratio_counts_match_single_process(simulator):
+    single = simulator.collect_ratio_counts(12, 400, 5, engine='batch', seed=7)
+    sharded = collect_ratio_counts_sharded(simulator, 12, 400, 5, engine='batch', workers=2, seed=7)
+    assert sharded == single
+
+
+def test_sharded_counters_merge_into_parent_instrument():
+    counters = []
+    for workers in (1, 2):
+        simulator = Simulator(ProDistribution(500, 0.6), instrument=Instrument(stream=io.StringIO()))
+        simulator.run_simulation(12, 300, engine='scalar', workers=workers, seed=7)
+        counters.append(simulator.instrument.counters)
+    single, sharded = counters
+    assert sharded['draws'] == single['draws']
+    assert sharded['rerolls'] == single['rerolls'] > 0
+    # 各分片使用独立的概率缓存，命中与未命中的分配不同，但查找总次数相同
+    assert (sharded['probability_cache_hits'] + sharded['probability_cache_misses']
+            == single['probability_cache_hits'] + single['probability_cache_misses'])
@@ -0,0 +1,46 @@
+from ProDistribution import ProDistribution
+from character import Character
+
+"""
+累积权重缓存测试
+
+功能说明：
+- cache_info的命中、未命中、淘汰次数与当前大小符合LRU规则
+- 属性值多重集相同的角色共享同一个缓存条目
+"""
+
+
+def test_cache_info_follows_lru():
+    pro_distribution = ProDistribution(500, 0.6, cache_size=2)
+    character = Character("熔岩球", 5)
+    styles = list(character.attribute_values)
+
+    def lookup(*values):
+        for style, value in zip(styles, values):
+            character.set_attribute_value(style, value)
+        return pro_distribution.get_cumulative_weights(character)[1]
+
+    first = lookup(0, 0)
+    assert lookup(0, 0) is first
+    lookup(1, 0)
+    # 流派名称不影响签名：属性值多重集相同即命中
+    lookup(0, 1)
+    assert pro_distribution.cache_info() == {'hits': 2, 'misses': 2, 'evictions': 0, 'size': 2, 'maxsize': 2}
+
+    # 最近使用的是(1, 0)，插入第三个签名时淘汰最久未使用的(0, 0)
+    lookup(2, 0)
+    assert pro_distribution.cache_info() == {'hits': 2, 'misses': 3, 'evictions': 1, 'size': 2, 'maxsize': 2}
+    lookup(1, 0)
+    lookup(0, 0)
+    assert pro_distribution.cache_info() == {'hits': 3, 'misses': 4, 'evictions': 2, 'size': 2, 'maxsize': 2}
+
+    pro_distribution.clear_cache()
+    assert pro_distribution.cache_info() == {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'maxsize': 2}
+
+
+def test_cache_disabled():
+    pro_distribution = ProDistribution(500, 0.6, cache_size=0)
+    character = Character("熔岩球", 5)
+    pro_distribution.get_cumulative_weights(character)
+    pro_distribution.get_cumulative_weights(character)
+    assert pro_distribution.cache_info() == {'hits': 0, 'misses': 2, 'evictions': 0, 'size': 0, 'maxsize': 0}
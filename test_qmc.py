@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from simulator import Simulator
+from qmc import qmc_character_stats, qmc_ratio_counts
+
+"""
+随机化拟蒙特卡洛测试
+
+功能说明：
+- 小配置下与精确求解器的结果在重复报告给出的标准误范围内一致
+- 达标比例与每个统计单元格分别检查
+"""
+
+pytest.importorskip('scipy')
+
+DRAW_COUNT = 8
+ROUNDS = 2048
+REPLICATES = 8
+
+
+@pytest.fixture(scope='module')
+def simulator():
+    return Simulator(ProDistribution(500, 0.6))
+
+
+@pytest.fixture(scope='module')
+def exact(simulator):
+    return simulator.run_simulation(DRAW_COUNT, engine='exact').histogram
+
+
+def _tolerance(standard_errors, rounds):
+    # 重复数不多时标准误本身也有误差，取6倍；另加两个计数的余量
+    return 6 * np.asarray(standard_errors) + 2.0 / rounds
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_ratio_counts_match_exact(simulator, exact, seed):
+    threshold = 4
+    ratio_counts, rounds, report = qmc_ratio_counts(
+        simulator, DRAW_COUNT, ROUNDS, threshold, seed=seed, replicates=REPLICATES
+    )
+    assert rounds == ROUNDS
+    assert report['replicates'] == REPLICATES
+    assert report['rounds_per_replicate'] == ROUNDS // REPLICATES
+
+    estimate = np.array([success for success, _ in ratio_counts]) / rounds
+    no_main = np.array([count for _, count in ratio_counts]) / rounds
+    probability = exact[:, DRAW_COUNT, threshold + 1:].sum(axis=1)
+    assert len(report['standard_errors']) == len(simulator.characters)
+    assert np.all(np.abs(estimate - probability) <= _tolerance(report['standard_errors'], rounds))
+    # 没有主攻属性的比例与直方图中属性值为0的单元格一致
+    no_main_probability = exact[:, DRAW_COUNT, 0]
+    assert np.all(np.abs(no_main - no_main_probability) <= 5 * np.sqrt(no_main_probability / rounds) + 2.0 / rounds)
+
+
+def test_character_stats_match_exact(simulator, exact):
+    # 单元格数以千计，用更多重复让每个单元格的标准误估计足够稳定
+    character_stats, rounds, report = qmc_character_stats(simulator, DRAW_COUNT, 4096, seed=5, replicates=32)
+    assert rounds == 4096
+    assert np.all(character_stats[:, 1:].sum(axis=2) == rounds)
+
+    standard_errors = np.asarray(report['standard_errors'])[:, 1:]
+    width = standard_errors.shape[2]
+    estimate = character_stats[:, 1:, :width] / rounds
+    probability = np.zeros_like(estimate)
+    columns = min(width, exact.shape[2])
+    probability[..., :columns] = exact[:, 1:, :columns]
+    # 所有重复都没有命中的稀有单元格标准误为0，改用二项分布的标准误
+    tolerance = _tolerance(standard_errors, rounds)
+    tolerance += 5 * np.sqrt(probability * (1 - probability) / rounds) * (standard_errors == 0)
+    assert np.all(np.abs(estimate - probability) <= tolerance)
+    # 模拟中没有出现的属性值精确概率也很小
+    assert exact[:, 1:, width:].sum() < 1e-3
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from character import Character
+from simulator import Simulator
+import cli
+
+"""
+单轮重放测试
+
+功能说明：
+- replay_round重放的任意一轮，与逐轮和批量引擎在同一次运行中的该轮逐位一致
+- 'qmc'与'exact'引擎的结果文件不能重放
+"""
+
+
+@pytest.mark.parametrize('engine', ['scalar', 'batch'])
+@pytest.mark.parametrize('enable_reroll', [True, False])
+def test_replay_matches_run(engine, enable_reroll):
+    simulator = Simulator(ProDistribution(500, 0.6))
+    result = simulator.run_simulation(12, 50, enable_reroll, 2, engine=engine, seed=3, final_states=True)
+
+    for character_index in (0, 3, len(simulator.characters) - 1):
+        styles, final_counts = result.final_states[character_index]
+        spec = simulator.characters[character_index]
+        for round_index in (0, 17, 49):
+            trace = simulator.replay_round(character_index, round_index, 12, enable_reroll, 2, seed=3, render=None)
+            records = trace.records()
+            assert set(records['round']) == {round_index}
+
+            # 从初始状态开始，逐次加上选中的流派，得到该轮的最终属性值
+            character = Character(spec.attribute, spec.get_level(), spec.get_havetool())
+            for selected in records['selected'][records['selected'] >= 0]:
+                character.increase_attribute_value(trace.catalog.get_name(int(selected)), 1)
+            replayed = [character.attribute_values[style] for style in styles]
+            np.testing.assert_array_equal(replayed, final_counts[round_index])
+
+
+@pytest.mark.parametrize('engine', ['qmc', 'exact'])
+def test_replay_rejects_non_replayable_artifacts(tmp_path, engine):
+    simulator = Simulator(ProDistribution(500, 0.6))
+    filename = str(tmp_path / 'run.npz')
+    simulator.run_simulation(8, 64, engine=engine, seed=3, replicates=2).save(filename)
+    with pytest.raises(ValueError, match=engine):
+        cli.main(['replay', '--artifact', filename, '--character', '0', '--round', '0'])
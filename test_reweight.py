@@ -0,0 +1,55 @@
+import csv
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from simulator import Simulator
+from reweight import ReweightedRun
+import cli
+
+"""
+似然比重新加权测试
+
+功能说明：
+- 重新加权得到的附近ratio下的分布（含网格点之间的插值）与精确求解器一致
+- 保存后读取的结果与原结果重新加权完全相同，命令行 --from 不重新模拟
+"""
+
+
+@pytest.fixture(scope='module')
+def run():
+    return ReweightedRun.simulate(Simulator(ProDistribution(500, 0.6)), 12, 20000, seed=3)
+
+
+@pytest.mark.parametrize('ratio', [0.57, 0.6, 0.625])
+def test_reweighted_distribution_matches_exact(run, ratio):
+    proportions, ess = run.distribution(ratio)
+    exact = Simulator(ProDistribution(500, ratio)).run_simulation(12, engine='exact').histogram
+    width = max(proportions.shape[2], exact.shape[2])
+    proportions = np.pad(proportions, ((0, 0), (0, 0), (0, width - proportions.shape[2])))[:, 1:]
+    probabilities = np.pad(exact, ((0, 0), (0, 0), (0, width - exact.shape[2])))[:, 1:]
+    # 以有效样本量计算的二项分布标准误，加上很小的下限避免概率接近0时过严
+    standard_errors = np.sqrt(probabilities * (1 - probabilities) / ess[:, None, None]) + 1e-4
+    assert np.all(np.abs(proportions - probabilities) <= 5 * standard_errors)
+
+
+def test_save_and_load_round_trip(run, tmp_path):
+    filename = str(tmp_path / 'run.npz')
+    run.save(filename)
+    loaded = ReweightedRun.load(filename)
+    assert loaded.characters == run.characters
+    assert (loaded.draw_count, loaded.base_ratio, loaded.seed) == (run.draw_count, run.base_ratio, run.seed)
+    assert loaded.summarize([0.58, 0.615]) == run.summarize([0.58, 0.615])
+
+
+def test_cli_reweights_saved_run(run, tmp_path):
+    filename = str(tmp_path / 'run.npz')
+    output = str(tmp_path / 'summary.csv')
+    run.save(filename)
+    cli.main(['reweight', '--from', filename, '--target', '0.58', '--threshold', '5', '--output', output])
+    with open(output, encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    expected = run.summarize([0.58], threshold=5)
+    assert len(rows) == len(expected)
+    for row, expected_row in zip(rows, expected):
+        assert float(row['p_above_threshold']) == pytest.approx(expected_row['p_above_threshold'])
+        assert int(row['rounds']) == run.rounds
@@ -0,0 +1,86 @@
+import random
+from bisect import bisect_right
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from character import Character
+from sampler import FenwickSampler, StyleSampler
+from simulator import Simulator
+
+"""
+Fenwick树抽样器测试
+
+功能说明：
+- update与remove_many之后，前缀和与find的结果与暴力计算的累积权重一致
+- 流派抽样器的权重随属性值变化（含卡池只保留已拥有流派）与概率分布一致
+- 'fenwick'抽样方式与'cumulative'的卡池顺序不同，相同种子下结果不逐位相同，但分布与精确解一致
+"""
+
+
+def _assert_matches_brute_force(sampler, weights):
+    cumulative = np.cumsum(weights).tolist()
+    assert len(sampler) == len(weights)
+    for count in range(len(weights) + 1):
+        assert sampler.prefix_sum(count) == (cumulative[count - 1] if count else 0.0)
+    assert sampler.total() == cumulative[-1]
+    # 整数权重的前缀和没有舍入误差，边界上的目标值也与bisect_right一致
+    for target in sorted(set([0.0] + cumulative[:-1] + [value - 0.5 for value in cumulative])):
+        if 0 <= target < cumulative[-1]:
+            assert sampler.find(target) == bisect_right(cumulative, target)
+
+
+@pytest.mark.parametrize('size', [1, 2, 5, 8, 13])
+def test_fenwick_matches_brute_force(size):
+    rng = random.Random(size)
+    weights = [float(rng.randint(0, 9)) for _ in range(size)]
+    weights[0] = 1.0
+    sampler = FenwickSampler(weights)
+    _assert_matches_brute_force(sampler, weights)
+    for step in range(50):
+        if step % 10 == 9:
+            removed = rng.sample(range(size), rng.randint(0, size - 1))
+            sampler.remove_many(removed)
+            for index in removed:
+                weights[index] = 0.0
+        else:
+            index = rng.randrange(size)
+            weights[index] = float(rng.randint(0, 9))
+            sampler.update(index, weights[index])
+        if sum(weights) == 0:
+            weights[0] = 1.0
+            sampler.update(0, 1.0)
+        _assert_matches_brute_force(sampler, weights)
+
+
+def test_style_sampler_follows_character():
+    pro_distribution = ProDistribution(500, 0.6)
+    character = Character("熔岩球", 18)
+    character.bind_distribution(pro_distribution)
+    sampler = StyleSampler(character, pro_distribution)
+    character.attach_sampler(sampler)
+    rng = random.Random(3)
+    styles = list(character.attribute_values)
+    for step in range(60):
+        style = rng.choice(styles)
+        if rng.random() < 0.2:
+            character.set_attribute_value(style, 0)
+        else:
+            character.increase_attribute_value(style)
+        probabilities = pro_distribution.get_current_weight(character)
+        total = sampler.tree.total()
+        weights = dict(zip(sampler.styles, sampler.tree.weights))
+        assert sampler.restricted == (character.get_style_count() >= 3)
+        assert {style: weight / total for style, weight in weights.items() if weight > 0} == pytest.approx(probabilities)
+
+
+def test_fenwick_simulation_matches_exact():
+    draw_count, rounds = 10, 3000
+    simulator = Simulator(ProDistribution(500, 0.6), sampler='fenwick')
+    sampled = simulator.run_simulation(draw_count, rounds, seed=5).histogram
+    exact = simulator.run_simulation(draw_count, engine='exact').histogram
+
+    width = max(exact.shape[2], sampled.shape[2])
+    probabilities = np.pad(exact, ((0, 0), (0, 0), (0, width - exact.shape[2])))
+    proportions = np.pad(sampled, ((0, 0), (0, 0), (0, width - sampled.shape[2]))) / rounds
+    standard_errors = np.sqrt(probabilities * (1 - probabilities) / rounds) + 1e-4
+    assert np.all(np.abs(proportions - probabilities) <= 5 * standard_errors)
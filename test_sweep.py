@@ -0,0 +1,31 @@
+import os
+from sweep import expand_grid, run_sweep
+
+"""
+参数扫描测试
+
+功能说明：
+- 按最大抽卡次数模拟一次再截取前缀，与相同种子下单独模拟每个抽卡次数的汇总结果相同
+- 只有给定种子（或精确求解）时才写入结果缓存
+"""
+
+
+def test_shared_prefix_matches_separate_runs():
+    configs = expand_grid(ratio=[0.6, 0.7], max_rerolls=[0, 2], draw_count=[6, 10, 13])
+    for engine in ('batch', 'scalar'):
+        shared = run_sweep(configs, rounds=200, engine=engine, seed=3)
+        separate = []
+        for config in configs:
+            separate += run_sweep([config], rounds=200, engine=engine, seed=3)
+        assert shared == separate
+
+
+def test_cache_only_with_seed(tmp_path):
+    configs = [{'draw_count': 8}]
+    run_sweep(configs, rounds=50, cache_dir=str(tmp_path / 'unseeded'))
+    assert not os.path.exists(tmp_path / 'unseeded') or not os.listdir(tmp_path / 'unseeded')
+
+    cache_dir = str(tmp_path / 'seeded')
+    first = run_sweep(configs, rounds=50, seed=1, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    assert run_sweep(configs, rounds=50, seed=1, cache_dir=cache_dir) == first
@@ -0,0 +1,163 @@
+import json
+import os
+import re
+import numpy as np
+import pytest
+from ProDistribution import ProDistribution
+from simulator import Simulator
+from artifact import SimulationArtifact
+from trajectory import (
+    META_FILENAME, TrajectoryStore, TrajectoryView, combine_conditions, parse_condition, parse_metric
+)
+import cli
+
+"""
+逐轮轨迹存储测试
+
+功能说明：
+- 查询得到的主攻属性值分布与同一种子批量引擎结果文件中的直方图相同
+- 存储的任意一轮与 cli.py replay 重放的该轮逐次一致
+- 没有元数据文件的目录视为不完整
+- 条件表达式区分 >= 与 >，多个 --where 同时满足
+"""
+
+DRAW_COUNT = 10
+ROUNDS = 300
+SEED = 7
+CHARACTERS = [0, 4, 5]
+
+
+@pytest.fixture(scope='module')
+def simulator():
+    return Simulator(ProDistribution(500, 0.6))
+
+
+@pytest.fixture(scope='module')
+def store(simulator, tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('trajectories'))
+    # 块大小不整除轮数，覆盖最后一块不满的情况
+    return TrajectoryStore.record(
+        directory, simulator, DRAW_COUNT, ROUNDS, seed=SEED, characters=CHARACTERS, chunk_size=128
+    )
+
+
+def test_distribution_matches_batch_artifact(simulator, store, tmp_path):
+    filename = str(tmp_path / 'run.npz')
+    simulator.run_simulation(DRAW_COUNT, ROUNDS, engine='batch', seed=SEED).save(filename)
+    histogram = SimulationArtifact.load(filename).histogram
+
+    for character_index in CHARACTERS:
+        for draw in range(1, DRAW_COUNT + 1):
+            # 查询块大小同样不整除轮数
+            counts, matched = store.distribution(character_index, parse_metric(f'main@{draw}'), chunk_rounds=64)
+            assert matched == ROUNDS
+            expected = histogram[character_index, draw]
+            np.testing.assert_array_equal(np.pad(counts, (0, expected.size - counts.size)), expected)
+
+        mean, matched = store.mean(character_index, parse_metric(f'main@{DRAW_COUNT}'))
+        expected = histogram[character_index, DRAW_COUNT]
+        assert matched == ROUNDS
+        assert mean == pytest.approx((expected * np.arange(expected.size)).sum() / ROUNDS)
+
+
+@pytest.mark.parametrize('character_index, round_index', [(4, 0), (4, 131), (5, ROUNDS - 1)])
+def test_round_matches_replay(store, capsys, character_index, round_index):
+    capsys.readouterr()
+    cli.main([
+        'replay', '--seed', str(SEED), '--character', str(character_index), '--round', str(round_index),
+        '--draw-count', str(DRAW_COUNT), '--render', 'json'
+    ])
+    draws = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert [draw['draw'] for draw in draws] == list(range(DRAW_COUNT))
+
+    values, hands, rerolls = (array[round_index] for array in store.arrays(character_index))
+    entry = store._character_meta(character_index)
+    styles, main_index = entry['styles'], entry['main_index']
+    for draw in draws:
+        d = draw['draw']
+        assert [styles[card] for card in hands[d]] == draw['cards']
+        assert rerolls[d] == draw['reroll_count']
+        assert draw['main_value'] == (values[d, main_index] if main_index >= 0 else 0)
+        assert draw['style_count'] == int((values[d] > 0).sum())
+        # 本次抽卡只有选中流派的属性值加1
+        increase = values[d + 1].astype(np.int64) - values[d]
+        assert increase.tolist() == [int(style == draw['selected']) for style in styles]
+
+
+def test_incomplete_directory(simulator, tmp_path):
+    with pytest.raises(ValueError, match="不存在或不完整"):
+        TrajectoryStore(str(tmp_path / 'missing'))
+
+    directory = str(tmp_path / 'partial')
+    TrajectoryStore.record(directory, simulator, 4, 20, seed=1, characters=[0])
+    # 数据文件都在，但元数据最后写入，缺少时视为写入中断
+    os.remove(os.path.join(directory, META_FILENAME))
+    assert os.path.exists(os.path.join(directory, 'values_0.npy'))
+    with pytest.raises(ValueError, match="不存在或不完整"):
+        TrajectoryStore(directory)
+
+
+def _view():
+    # 3个流派、2次抽卡的5轮轨迹，主攻流派为第0列
+    values = np.array([
+        [[0, 0, 0], [1, 0, 0], [2, 0, 0]],
+        [[0, 0, 0], [0, 1, 0], [0, 1, 1]],
+        [[1, 0, 0], [1, 1, 0], [2, 1, 0]],
+        [[1, 0, 0], [2, 0, 0], [3, 0, 0]],
+        [[0, 0, 0], [0, 0, 1], [1, 0, 1]],
+    ], dtype=np.uint8)
+    hands = np.zeros((5, 2, 3), dtype=np.uint8)
+    rerolls = np.zeros((5, 2), dtype=np.uint8)
+    return TrajectoryView(values, hands, rerolls, ['a', 'b', 'c'], 0)
+
+
+def test_condition_operators():
+    view = _view()
+    main = [2, 0, 2, 3, 1]
+    expected = {
+        '>=': [value >= 2 for value in main],
+        '>': [value > 2 for value in main],
+        '<=': [value <= 2 for value in main],
+        '<': [value < 2 for value in main],
+        '==': [value == 2 for value in main],
+        '!=': [value != 2 for value in main],
+    }
+    for operator_text, mask in expected.items():
+        assert parse_condition(f'main@2{operator_text}2')(view).tolist() == mask
+        # 允许空格
+        assert parse_condition(f' main @ 2 {operator_text} 2 ')(view).tolist() == mask
+
+    assert parse_condition('style_count@2>=2')(view).tolist() == [False, True, True, False, True]
+    assert parse_condition('b@1>0')(view).tolist() == [False, True, True, False, False]
+    with pytest.raises(ValueError, match="格式"):
+        parse_condition('main@2=>2')
+    with pytest.raises(ValueError, match="流派 'd' 不存在"):
+        parse_condition('d@1>0')(view)
+
+
+def test_multiple_conditions(store, capsys):
+    view = _view()
+    where = combine_conditions([parse_condition('main@2>=1'), parse_condition('style_count@2==2')])
+    assert where(view).tolist() == [False, False, True, False, True]
+    assert combine_conditions([]) is None
+
+    conditions = ['main@5>=2', 'main_in_hand@8==0']
+    where = combine_conditions([parse_condition(text) for text in conditions])
+    matched = store.count(4, where)
+    separate = [store.count(4, parse_condition(text)) for text in conditions]
+    assert 0 < matched < min(separate)
+    values, hands, _ = store.arrays(4)
+    main_index = store._character_meta(4)['main_index']
+    assert matched == int(((values[:, 5, main_index] >= 2) & (hands[:, 7] != main_index).all(axis=1)).sum())
+    counts, total = store.distribution(4, parse_metric(f'main@{DRAW_COUNT}'), where)
+    assert total == matched
+
+    capsys.readouterr()
+    cli.main([
+        'trajectory', 'query', '--dir', store.directory, '--character', '4', '--metric', f'main@{DRAW_COUNT}',
+        '--where', conditions[0], '--where', conditions[1]
+    ])
+    output = capsys.readouterr().out
+    assert re.search(rf"共{matched}轮", output)
+    for value in np.flatnonzero(counts):
+        assert f"main@{DRAW_COUNT} = {value}: {counts[value]}轮" in output
@@ -0,0 +1,507 @@
+import argparse
+import json
+import operator
+import os
+import re
+import numpy as np
+from ProDistribution import ProDistribution
+from batch_engine import BatchEngine
+from character import Character
+from histogram import value_capacity
+
+"""
+逐轮轨迹存储与事后查询
+
+功能说明：
+- 用批量引擎模拟，把每个角色每一轮的完整轨迹写入磁盘上的.npy文件：
+  values_{i}.npy  每次抽卡后的全部属性值 (轮数, draw_count+1, 流派数)，第0列为初始值
+  hands_{i}.npy   每次抽卡最终用于选择的手牌（流派下标） (轮数, draw_count, 3)
+  rerolls_{i}.npy 每次抽卡消耗的重新roll次数 (轮数, draw_count)
+  trajectories.json 流派顺序、模拟参数与种子，最后写入，没有它的目录视为不完整
+- 数据类型按取值范围取最小的无符号整数，每个角色每轮约 (draw_count+1)*流派数 + 4*draw_count 字节
+- 查询时以内存映射方式打开，按块取零拷贝的切片做向量化筛选与聚合，内存占用与总轮数无关
+- 每一轮与逐轮/批量引擎中同一种子的同一轮完全一致，可以用replay_round逐次追踪
+
+用法示例：
+    python trajectory.py record --dir trajectories --rounds 10000000 --seed 1 --character 0 4
+    python trajectory.py query --dir trajectories --character 0 --metric style_count@10 --where main@5==0
+"""
+
+# 元数据文件名与格式版本
+META_FILENAME = 'trajectories.json'
+STORE_VERSION = 1
+
+# 查询时每块的轮数
+DEFAULT_QUERY_ROUNDS = 65536
+
+# 查询表达式中的比较运算符
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+
+
+class TrajectoryRecord:
+    """单块轨迹记录 - 批量引擎在抽卡时写入本块每一轮每次抽卡后的属性值、手牌与重新roll次数"""
+
+    def __init__(self, draw_count, value_dtype, hand_dtype, reroll_dtype):
+        """
+        初始化记录
+
+        Args:
+            draw_count: 每轮抽卡次数
+            value_dtype: 属性值的数据类型
+            hand_dtype: 手牌（流派下标）的数据类型
+            reroll_dtype: 重新roll次数的数据类型
+        """
+        self.draw_count = draw_count
+        self.value_dtype = value_dtype
+        self.hand_dtype = hand_dtype
+        self.reroll_dtype = reroll_dtype
+        self.values = None
+        self.hands = None
+        self.rerolls = None
+
+    def begin_chunk(self, size, counts):
+        """
+        开始记录一块轮次
+
+        Args:
+            size: 本块轮数
+            counts: 初始属性值矩阵 (size, 流派数)
+        """
+        self.values = np.empty((size, self.draw_count + 1, counts.shape[1]), dtype=self.value_dtype)
+        self.hands = np.empty((size, self.draw_count, 3), dtype=self.hand_dtype)
+        self.rerolls = np.empty((size, self.draw_count), dtype=self.reroll_dtype)
+        self.values[:, 0] = counts
+
+    def record_draw(self, draw, counts, hands, rerolls):
+        """
+        记录一次抽卡
+
+        Args:
+            draw: 抽卡次数（从0开始）
+            counts: 本次抽卡后的属性值矩阵 (size, 流派数)
+            hands: 最终手牌 (size, 3)
+            rerolls: 本次抽卡消耗的重新roll次数 (size,)
+        """
+        self.values[:, draw + 1] = counts
+        self.hands[:, draw] = hands
+        self.rerolls[:, draw] = rerolls
+
+
+class TrajectoryView:
+    """一块轮次的轨迹视图 - 属性均为内存映射数组的切片，按需计算查询用的指标"""
+
+    def __init__(self, values, hands, rerolls, styles, main_index):
+        """
+        初始化视图
+
+        Args:
+            values: 属性值 (轮数, draw_count+1, 流派数)
+            hands: 最终手牌 (轮数, draw_count, 3)
+            rerolls: 每次抽卡消耗的重新roll次数 (轮数, draw_count)
+            styles: 流派列表
+            main_index: 主攻流派下标，不在卡池中时为-1
+        """
+        self.values = values
+        self.hands = hands
+        self.rerolls = rerolls
+        self.styles = styles
+        self.main_index = main_index
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def value(self, style, draw):
+        """
+        获取第draw次抽卡后某个流派的属性值
+
+        Args:
+            style: 流派名称
+            draw: 抽卡次数（0为初始值）
+
+        Returns:
+            ndarray: 属性值 (轮数,)
+        """
+        if style not in self.styles:
+            raise ValueError(f"流派 '{style}' 不存在")
+        return self.values[:, draw, self.styles.index(style)]
+
+    def main(self, draw):
+        """第draw次抽卡后的主攻流派属性值 (轮数,)"""
+        if self.main_index < 0:
+            return np.zeros(len(self), dtype=self.values.dtype)
+        return self.values[:, draw, self.main_index]
+
+    def style_count(self, draw):
+        """第draw次抽卡后的流派拥有数量 (轮数,)"""
+        return (self.values[:, draw] > 0).sum(axis=1)
+
+    def rerolls_used(self, draw):
+        """前draw次抽卡累计消耗的重新roll次数 (轮数,)"""
+        return self.rerolls[:, :draw].sum(axis=1)
+
+    def hand(self, draw):
+        """第draw次抽卡（从1开始）最终用于选择的手牌 (轮数, 3)"""
+        return self.hands[:, draw - 1]
+
+    def main_in_hand(self, draw):
+        """第draw次抽卡（从1开始）的最终手牌中是否有主攻流派 (轮数,)"""
+        return (self.hand(draw) == self.main_index).any(axis=1)
+
+    def selected(self, draw):
+        """第draw次抽卡（从1开始）选中的流派下标 (轮数,)"""
+        return np.argmax(self.values[:, draw] != self.values[:, draw - 1], axis=1)
+
+
+class TrajectoryStore:
+    """磁盘上的逐轮轨迹 - 以内存映射方式分块查询"""
+
+    def __init__(self, directory):
+        """
+        打开轨迹目录
+
+        Args:
+            directory: record写入的目录
+        """
+        path = os.path.join(directory, META_FILENAME)
+        if not os.path.exists(path):
+            raise ValueError(f"轨迹目录 '{directory}' 不存在或不完整")
+        with open(path, encoding='utf-8') as file:
+            self.meta = json.load(file)
+        if self.meta['version'] != STORE_VERSION:
+            raise ValueError(f"轨迹格式版本 '{self.meta['version']}' 不受支持")
+        self.directory = directory
+        self.draw_count = self.meta['draw_count']
+        self.rounds = self.meta['rounds']
+        self._arrays = {}
+
+    @classmethod
+    def record(cls, directory, simulator, draw_count=15, rounds=100000, enable_reroll=True, max_rerolls=2, seed=None,
+               characters=None, chunk_size=8192):
+        """
+        用批量引擎模拟并把完整轨迹写入目录
+
+        Args:
+            directory: 输出目录（不存在时创建，同名文件会被覆盖）
+            simulator: Simulator实例，提供概率分布与角色
+            draw_count: 每轮抽卡次数，默认15次
+            rounds: 模拟轮数，默认100000轮
+            enable_reroll: 是否启用重新roll功能，默认True
+            max_rerolls: 一轮完整模拟中最大重新roll次数，默认2次
+            seed: 随机种子，默认None（使用模拟器的种子，都没有时生成新的种子）
+            characters: 记录的角色下标列表，默认None（全部角色）
+            chunk_size: 每块同时推进的轮数，默认8192
+
+        Returns:
+            TrajectoryStore: 写入完成的轨迹
+        """
+        indices = list(range(len(simulator.characters))) if characters is None else list(characters)
+        for index in indices:
+            if not 0 <= index < len(simulator.characters):
+                raise ValueError(f"角色下标 '{index}' 不存在")
+        seed = simulator.resolve_seed(seed)
+        batch_engine = BatchEngine(simulator.pro_distribution, chunk_size, seed, simulator.instrument)
+        os.makedirs(directory, exist_ok=True)
+        # 先删除元数据，写入中断时目录不会被当作完整的轨迹打开
+        meta_path = os.path.join(directory, META_FILENAME)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        value_dtype = np.min_scalar_type(value_capacity(simulator.characters, draw_count) - 1)
+        reroll_dtype = np.min_scalar_type(max(max_rerolls, 0))
+        character_meta = []
+        total = rounds * len(indices)
+        for n, i in enumerate(indices):
+            character = simulator.characters[i]
+            # 流派顺序与批量引擎的属性值列一致
+            styles = list(Character(character.attribute, character.get_level(), character.get_havetool())
+                          .attribute_values.keys())
+            main_index = styles.index(character.attribute) if character.attribute in styles else -1
+            hand_dtype = np.min_scalar_type(len(styles) - 1)
+            values = np.lib.format.open_memmap(
+                os.path.join(directory, f'values_{i}.npy'), 'w+', value_dtype, (rounds, draw_count + 1, len(styles))
+            )
+            hands = np.lib.format.open_memmap(
+                os.path.join(directory, f'hands_{i}.npy'), 'w+', hand_dtype, (rounds, draw_count, 3)
+            )
+            rerolls = np.lib.format.open_memmap(
+                os.path.join(directory, f'rerolls_{i}.npy'), 'w+', reroll_dtype, (rounds, draw_count)
+            )
+            record = TrajectoryRecord(draw_count, value_dtype, hand_dtype, reroll_dtype)
+            for first_round in range(0, rounds, chunk_size):
+                size = min(chunk_size, rounds - first_round)
+                batch_engine.simulate_chunk(
+                    character, size, draw_count, enable_reroll, max_rerolls, i, first_round, trajectory=record
+                )
+                # 整块连续写入，避免逐次抽卡跨行写磁盘
+                values[first_round:first_round + size] = record.values
+                hands[first_round:first_round + size] = record.hands
+                rerolls[first_round:first_round + size] = record.rerolls
+                simulator.instrument.progress('simulation', n * rounds + first_round + size, total)
+            for array in (values, hands, rerolls):
+                array.flush()
+            del values, hands, rerolls
+
+            character_meta.append({
+                'index': i,
+                'attribute': character.attribute,
+                'level': character.get_level(),
+                'havetool': character.get_havetool(),
+                'styles': styles,
+                'main_index': main_index,
+            })
+
+        meta = {
+            'version': STORE_VERSION,
+            'initial_value': simulator.pro_distribution.initial_value,
+            'ratio': simulator.pro_distribution.ratio,
+            'draw_count': draw_count,
+            'rounds': rounds,
+            'enable_reroll': enable_reroll,
+            'max_rerolls': max_rerolls,
+            'seed': seed,
+            'characters': character_meta,
+        }
+        with open(meta_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False, indent=2)
+        return cls(directory)
+
+    @property
+    def characters(self):
+        """已记录的角色下标列表"""
+        return [entry['index'] for entry in self.meta['characters']]
+
+    def _character_meta(self, character_index):
+        """获取某个角色的元数据"""
+        for entry in self.meta['characters']:
+            if entry['index'] == character_index:
+                return entry
+        raise ValueError(f"角色下标 '{character_index}' 没有记录轨迹")
+
+    def arrays(self, character_index):
+        """
+        以只读内存映射方式打开某个角色的轨迹
+
+        Args:
+            character_index: 角色下标
+
+        Returns:
+            tuple: (values, hands, rerolls) 内存映射数组
+        """
+        if character_index not in self._arrays:
+            self._character_meta(character_index)
+            self._arrays[character_index] = tuple(
+                np.load(os.path.join(self.directory, f'{name}_{character_index}.npy'), mmap_mode='r')
+                for name in ('values', 'hands', 'rerolls')
+            )
+        return self._arrays[character_index]
+
+    def iter_views(self, character_index, chunk_rounds=DEFAULT_QUERY_ROUNDS):
+        """
+        按块依次生成某个角色的轨迹视图
+
+        Args:
+            character_index: 角色下标
+            chunk_rounds: 每块轮数，默认DEFAULT_QUERY_ROUNDS
+
+        Yields:
+            TrajectoryView: 一块轮次的视图
+        """
+        entry = self._character_meta(character_index)
+        values, hands, rerolls = self.arrays(character_index)
+        for start in range(0, self.rounds, chunk_rounds):
+            end = min(start + chunk_rounds, self.rounds)
+            yield TrajectoryView(
+                values[start:end], hands[start:end], rerolls[start:end], entry['styles'], entry['main_index']
+            )
+
+    def count(self, character_index, where=None, chunk_rounds=DEFAULT_QUERY_ROUNDS):
+        """
+        统计满足条件的轮数
+
+        Args:
+            character_index: 角色下标
+            where: 函数，接收TrajectoryView，返回每一轮是否满足条件的布尔数组，默认None（全部轮）
+            chunk_rounds: 每块轮数，默认DEFAULT_QUERY_ROUNDS
+
+        Returns:
+            int: 轮数
+        """
+        if where is None:
+            return self.rounds
+        return sum(int(np.count_nonzero(where(view))) for view in self.iter_views(character_index, chunk_rounds))
+
+    def distribution(self, character_index, metric, where=None, chunk_rounds=DEFAULT_QUERY_ROUNDS):
+        """
+        统计满足条件的轮中某个非负整数指标的分布
+
+        Args:
+            character_index: 角色下标
+            metric: 函数，接收TrajectoryView，返回每一轮的非负整数指标 (轮数,)
+            where: 条件函数，见count，默认None（全部轮）
+            chunk_rounds: 每块轮数，默认DEFAULT_QUERY_ROUNDS
+
+        Returns:
+            tuple: (计数数组，下标为指标值, 满足条件的轮数)
+        """
+        counts = np.zeros(0, dtype=np.int64)
+        for view in self.iter_views(character_index, chunk_rounds):
+            values = np.asarray(metric(view))
+            if where is not None:
+                values = values[where(view)]
+            chunk_counts = np.bincount(values.astype(np.int64, copy=False))
+            if chunk_counts.size > counts.size:
+                counts = np.pad(counts, (0, chunk_counts.size - counts.size))
+            counts[:chunk_counts.size] += chunk_counts
+        return counts, int(counts.sum())
+
+    def mean(self, character_index, metric, where=None, chunk_rounds=DEFAULT_QUERY_ROUNDS):
+        """
+        计算满足条件的轮中某个指标的平均值
+
+        Args:
+            character_index: 角色下标
+            metric: 函数，接收TrajectoryView，返回每一轮的数值指标 (轮数,)
+            where: 条件函数，见count，默认None（全部轮）
+            chunk_rounds: 每块轮数，默认DEFAULT_QUERY_ROUNDS
+
+        Returns:
+            tuple: (平均值，没有满足条件的轮时为NaN, 满足条件的轮数)
+        """
+        total, matched = 0.0, 0
+        for view in self.iter_views(character_index, chunk_rounds):
+            values = np.asarray(metric(view), dtype=np.float64)
+            if where is not None:
+                values = values[where(view)]
+            total += float(values.sum())
+            matched += values.size
+        return (total / matched if matched else float('nan')), matched
+
+
+def parse_metric(text):
+    """
+    解析 '指标@抽卡次数' 形式的指标表达式
+
+    指标可以是main、style_count、rerolls_used、main_in_hand、selected或流派名称
+
+    Args:
+        text: 表达式，如 'style_count@10'、'main@5'
+
+    Returns:
+        function: 接收TrajectoryView，返回每一轮的指标
+    """
+    match = re.fullmatch(r'\s*([^@]+?)\s*@\s*(\d+)\s*', text)
+    if match is None:
+        raise ValueError(f"指标表达式 '{text}' 格式应为 指标@抽卡次数")
+    name, draw = match.group(1), int(match.group(2))
+    if name in ('main', 'style_count', 'rerolls_used', 'main_in_hand', 'selected'):
+        return lambda view: getattr(view, name)(draw)
+    return lambda view: view.value(name, draw)
+
+
+def parse_condition(text):
+    """
+    解析 '指标@抽卡次数 比较运算符 整数' 形式的条件表达式
+
+    Args:
+        text: 表达式，如 'main@5==0'、'style_count@10>=3'
+
+    Returns:
+        function: 接收TrajectoryView，返回每一轮是否满足条件的布尔数组
+    """
+    match = re.fullmatch(r'(.+?)(==|!=|>=|<=|>|<)\s*(-?\d+)\s*', text)
+    if match is None:
+        raise ValueError(f"条件表达式 '{text}' 格式应为 指标@抽卡次数 运算符 整数")
+    metric = parse_metric(match.group(1))
+    compare, value = COMPARISONS[match.group(2)], int(match.group(3))
+    return lambda view: compare(metric(view), value)
+
+
+def combine_conditions(conditions):
+    """
+    把多个条件合并为同时满足
+
+    Args:
+        conditions: 条件函数列表
+
+    Returns:
+        function: 合并后的条件函数，列表为空时为None
+    """
+    if not conditions:
+        return None
+
+    def where(view):
+        mask = conditions[0](view)
+        for condition in conditions[1:]:
+            mask = mask & condition(view)
+        return mask
+
+    return where
+
+
+def build_parser():
+    """
+    构造命令行参数解析器
+
+    Returns:
+        argparse.ArgumentParser: 参数解析器
+    """
+    parser = argparse.ArgumentParser(description="逐轮轨迹的记录与事后查询")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="模拟并记录完整轨迹")
+    record_parser.add_argument('--dir', required=True, help="输出目录")
+    record_parser.add_argument('--initial-value', type=float, default=500)
+    record_parser.add_argument('--ratio', type=float, default=0.6)
+    record_parser.add_argument('--draw-count', type=int, default=15)
+    record_parser.add_argument('--rounds', type=int, default=100000)
+    record_parser.add_argument('--no-reroll', action='store_true')
+    record_parser.add_argument('--max-rerolls', type=int, default=2)
+    record_parser.add_argument('--seed', type=int, default=None)
+    record_parser.add_argument('--character', type=int, nargs='+', default=None, help="角色下标（从0开始），默认全部角色")
+
+    query_parser = subparsers.add_parser('query', help="查询已记录的轨迹")
+    query_parser.add_argument('--dir', required=True, help="轨迹目录")
+    query_parser.add_argument('--character', type=int, nargs='+', default=None, help="角色下标，默认全部已记录的角色")
+    query_parser.add_argument('--metric', required=True, help="指标，如 style_count@10")
+    query_parser.add_argument('--where', action='append', default=[], help="条件，如 main@5==0，可重复（同时满足）")
+    query_parser.add_argument('--chunk-rounds', type=int, default=DEFAULT_QUERY_ROUNDS)
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    if args.command == 'record':
+        from simulator import Simulator
+
+        simulator = Simulator(ProDistribution(args.initial_value, args.ratio))
+        store = TrajectoryStore.record(
+            args.dir, simulator, args.draw_count, args.rounds, not args.no_reroll, args.max_rerolls, args.seed,
+            args.character
+        )
+        print(f"已记录{len(store.characters)}个角色各{store.rounds}轮的轨迹，随机种子: {store.meta['seed']}，"
+              f"目录: {args.dir}")
+        return
+
+    store = TrajectoryStore(args.dir)
+    metric = parse_metric(args.metric)
+    where = combine_conditions([parse_condition(text) for text in args.where])
+    condition_text = " 且 ".join(args.where) if args.where else "全部轮"
+    for character_index in (args.character if args.character is not None else store.characters):
+        counts, matched = store.distribution(character_index, metric, where, args.chunk_rounds)
+        entry = store._character_meta(character_index)
+        print(f"角色{character_index} (等级{entry['level']}, havetool={entry['havetool']})："
+              f"{condition_text} 共{matched}轮（{matched / store.rounds:.4%}）")
+        for value in np.flatnonzero(counts):
+            print(f"  {args.metric} = {value}: {counts[value]}轮 ({counts[value] / matched:.4%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -119,6 +119,119 @@ class Style:
         return self.name == other.name and self.skills == other.skills
 
 
+class SkillCatalog:
+    """技能目录 - 将技能名称驻留为整数ID，供角色群体（CharacterPopulation）与抽卡追踪共享"""
+    
+    # 类变量：基于Style.style_skills的默认目录
+    _default = None
+    
+    def __init__(self, skills=None):
+        """
+        初始化技能目录
+        
+        Args:
+            skills: 技能字典 {技能名称: 技能等级}，默认为Style.style_skills
+        """
+        if skills is None:
+            skills = Style.style_skills
+        
+        # 技能ID即技能在字典中的位置
+        self.names = tuple(skills.keys())
+        self.levels = tuple(skills[name] for name in self.names)
+        self.ids = {name: skill_id for skill_id, name in enumerate(self.names)}
+        
+        # 按等级缓存可用技能ID及其在属性值矩阵中的列，所有同等级群体共享
+        self._level_cache = {}
+    
+    @classmethod
+    def default(cls):
+        """
+        获取共享的默认技能目录
+        
+        Returns:
+            SkillCatalog: 基于Style.style_skills的目录实例
+        """
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+    
+    def get_id(self, skill_name):
+        """
+        获取技能名称对应的整数ID
+        
+        Args:
+            skill_name: 技能名称
+            
+        Returns:
+            int: 技能ID
+        """
+        if skill_name not in self.ids:
+            raise ValueError(f"技能名称 '{skill_name}' 不存在")
+        return self.ids[skill_name]
+    
+    def get_name(self, skill_id):
+        """
+        获取整数ID对应的技能名称
+        
+        Args:
+            skill_id: 技能ID
+            
+        Returns:
+            str: 技能名称
+        """
+        return self.names[skill_id]
+    
+    def _level_entry(self, max_level):
+        """
+        获取等级小于max_level的技能ID元组及ID到位置的映射（带缓存）
+        
+        Args:
+            max_level: 最大等级（不包含）
+            
+        Returns:
+            tuple: (技能ID元组, {技能ID: 位置})
+        """
+        entry = self._level_cache.get(max_level)
+        if entry is None:
+            skill_ids = tuple(skill_id for skill_id, level in enumerate(self.levels) if level < max_level)
+            entry = (skill_ids, {skill_id: slot for slot, skill_id in enumerate(skill_ids)})
+            self._level_cache[max_level] = entry
+        return entry
+    
+    def get_ids_below_level(self, max_level):
+        """
+        获取等级小于指定值的所有技能ID
+        
+        Args:
+            max_level: 最大等级（不包含）
+            
+        Returns:
+            tuple: 技能ID元组，顺序与Style.get_skills_below_level一致
+        """
+        return self._level_entry(max_level)[0]
+    
+    def get_slot_map(self, max_level):
+        """
+        获取等级小于指定值的技能ID到属性数组位置的映射
+        
+        Args:
+            max_level: 最大等级（不包含）
+            
+        Returns:
+            dict: {技能ID: 位置}
+        """
+        return self._level_entry(max_level)[1]
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def __str__(self):
+        return f"SkillCatalog(skills_count={len(self.names)})"
+    
+    def __repr__(self):
+        return f"SkillCatalog(names={self.names})"
+
+
 # 示例用法
 if __name__ == "__main__":
     # 创建流派实例
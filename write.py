@@ -1,50 +1,48 @@
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from weakref import WeakKeyDictionary
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
 from openpyxl.utils import get_column_letter
 
-def write_and_format_cell(worksheet, cell_address, content, style_dict=None):
+# 样式注册表：冻结后的样式字典 -> 共享的样式对象 (font, fill, border, alignment, number_format)
+_style_registry = {}
+
+# 样式键 -> 命名样式名称，每种样式在每个工作簿中只注册一次命名样式
+_style_names = {}
+
+# 每个工作簿中已注册的命名样式名称
+_workbook_style_names = WeakKeyDictionary()
+
+
+def _freeze_style(style_dict):
     """
-    向Excel工作表的指定单元格写入内容并应用格式化
+    将样式字典转换为可哈希的键
     
     Args:
-        worksheet: openpyxl工作表对象
-        cell_address: 单元格地址，如 'A1', 'B2' 等
-        content: 要写入的内容
-        style_dict: 样式字典，包含以下可选键：
-            - 'font': 字体样式字典
-                - 'name': 字体名称
-                - 'size': 字体大小
-                - 'bold': 是否加粗 (True/False)
-                - 'italic': 是否斜体 (True/False)
-                - 'color': 字体颜色 (RGB十六进制字符串，如 'FF0000')
-            - 'fill': 填充样式字典
-                - 'type': 填充类型 ('solid', 'patternFill' 等)
-                - 'color': 背景颜色 (RGB十六进制字符串)
-            - 'border': 边框样式字典
-                - 'left': 左边框样式 ('thin', 'medium', 'thick' 等)
-                - 'right': 右边框样式
-                - 'top': 上边框样式
-                - 'bottom': 下边框样式
-                - 'color': 边框颜色 (RGB十六进制字符串)
-            - 'alignment': 对齐样式字典
-                - 'horizontal': 水平对齐 ('left', 'center', 'right')
-                - 'vertical': 垂直对齐 ('top', 'center', 'bottom')
-                - 'wrap_text': 是否自动换行 (True/False)
-            - 'number_format': 数字格式字符串
-    
+        style_dict: 样式字典（可嵌套）
+        
     Returns:
-        None
+        tuple: 可哈希的样式键
     """
-    # 写入内容
-    worksheet[cell_address] = content
-    
-    # 如果没有样式信息，直接返回
-    if style_dict is None:
-        return
+    if isinstance(style_dict, dict):
+        return tuple(sorted((key, _freeze_style(value)) for key, value in style_dict.items()))
+    return style_dict
+
+
+def _build_style_objects(style_dict):
+    """
+    根据样式字典创建样式对象，只在每种样式第一次使用时调用
     
-    # 获取单元格对象
-    cell = worksheet[cell_address]
+    Args:
+        style_dict: 样式字典，格式见write_and_format_cell
+        
+    Returns:
+        tuple: (font, fill, border, alignment, number_format)，未指定的项为None
+    """
+    font = None
+    fill = None
+    border = None
+    alignment = None
     
-    # 应用字体样式
+    # 字体样式
     if 'font' in style_dict:
         font_dict = style_dict['font']
         font = Font()
@@ -59,10 +57,8 @@ def write_and_format_cell(worksheet, cell_address, content, style_dict=None):
             font.italic = font_dict['italic']
         if 'color' in font_dict:
             font.color = font_dict['color']
-        
-        cell.font = font
     
-    # 应用填充样式
+    # 填充样式
     if 'fill' in style_dict:
         fill_dict = style_dict['fill']
         fill = PatternFill()
@@ -71,10 +67,8 @@ def write_and_format_cell(worksheet, cell_address, content, style_dict=None):
             fill.fill_type = fill_dict['type']
         if 'color' in fill_dict:
             fill.fgColor = fill_dict['color']
-        
-        cell.fill = fill
     
-    # 应用边框样式
+    # 边框样式
     if 'border' in style_dict:
         border_dict = style_dict['border']
         border = Border()
@@ -97,10 +91,8 @@ def write_and_format_cell(worksheet, cell_address, content, style_dict=None):
                     if 'color' in border_dict:
                         side_obj.color = border_dict['color']
                     setattr(border, side, side_obj)
-        
-        cell.border = border
     
-    # 应用对齐样式
+    # 对齐样式
     if 'alignment' in style_dict:
         align_dict = style_dict['alignment']
         alignment = Alignment()
@@ -111,12 +103,171 @@ def write_and_format_cell(worksheet, cell_address, content, style_dict=None):
             alignment.vertical = align_dict['vertical']
         if 'wrap_text' in align_dict:
             alignment.wrap_text = align_dict['wrap_text']
+    
+    return font, fill, border, alignment, style_dict.get('number_format')
+
+
+def register_style(style_dict):
+    """
+    登记样式字典，返回可重复使用的样式键；相同内容的样式字典只创建一次样式对象
+    
+    Args:
+        style_dict: 样式字典，格式见write_and_format_cell
+        
+    Returns:
+        tuple: 样式键
+    """
+    key = _freeze_style(style_dict)
+    if key not in _style_registry:
+        _style_registry[key] = _build_style_objects(style_dict)
+        _style_names[key] = f"reward_style_{len(_style_names) + 1}"
+    return key
+
+
+def _build_named_style(style_key):
+    """
+    根据已登记的样式创建命名样式
+    
+    Args:
+        style_key: register_style返回的样式键
         
+    Returns:
+        NamedStyle: 命名样式，未指定的项保持默认值
+    """
+    font, fill, border, alignment, number_format = _style_registry[style_key]
+    named_style = NamedStyle(name=_style_names[style_key])
+    if font is not None:
+        named_style.font = font
+    if fill is not None:
+        named_style.fill = fill
+    if border is not None:
+        named_style.border = border
+    if alignment is not None:
+        named_style.alignment = alignment
+    if number_format is not None:
+        named_style.number_format = number_format
+    return named_style
+
+
+def apply_registered_style(cell, style_key):
+    """
+    按引用把已登记的样式应用到单元格
+    
+    Args:
+        cell: openpyxl单元格对象
+        style_key: register_style返回的样式键
+    """
+    # 尚未设置样式的单元格直接引用该工作簿中的命名样式，命名样式在每个工作簿中只注册一次
+    if not cell.has_style:
+        workbook = cell.parent.parent
+        registered_names = _workbook_style_names.get(workbook)
+        if registered_names is None:
+            registered_names = set()
+            _workbook_style_names[workbook] = registered_names
+        style_name = _style_names[style_key]
+        if style_name not in registered_names:
+            workbook.add_named_style(_build_named_style(style_key))
+            registered_names.add(style_name)
+        cell.style = style_name
+        return
+    
+    # 已有样式的单元格只覆盖指定的项
+    font, fill, border, alignment, number_format = _style_registry[style_key]
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if border is not None:
+        cell.border = border
+    if alignment is not None:
         cell.alignment = alignment
+    if number_format is not None:
+        cell.number_format = number_format
+
+
+def write_registered_cell(worksheet, cell_address, content, style_key=None):
+    """
+    写入内容并按引用应用已登记的样式
     
-    # 应用数字格式
-    if 'number_format' in style_dict:
-        cell.number_format = style_dict['number_format']
+    Args:
+        worksheet: openpyxl工作表对象
+        cell_address: 单元格地址，如 'A1', 'B2' 等
+        content: 要写入的内容
+        style_key: register_style返回的样式键，None表示不设置样式
+    """
+    worksheet[cell_address] = content
+    if style_key is not None:
+        apply_registered_style(worksheet[cell_address], style_key)
+
+
+def write_and_format_cell(worksheet, cell_address, content, style_dict=None):
+    """
+    向Excel工作表的指定单元格写入内容并应用格式化
+    
+    Args:
+        worksheet: openpyxl工作表对象
+        cell_address: 单元格地址，如 'A1', 'B2' 等
+        content: 要写入的内容
+        style_dict: 样式字典，包含以下可选键：
+            - 'font': 字体样式字典
+                - 'name': 字体名称
+                - 'size': 字体大小
+                - 'bold': 是否加粗 (True/False)
+                - 'italic': 是否斜体 (True/False)
+                - 'color': 字体颜色 (RGB十六进制字符串，如 'FF0000')
+            - 'fill': 填充样式字典
+                - 'type': 填充类型 ('solid', 'patternFill' 等)
+                - 'color': 背景颜色 (RGB十六进制字符串)
+            - 'border': 边框样式字典
+                - 'left': 左边框样式 ('thin', 'medium', 'thick' 等)
+                - 'right': 右边框样式
+                - 'top': 上边框样式
+                - 'bottom': 下边框样式
+                - 'color': 边框颜色 (RGB十六进制字符串)
+            - 'alignment': 对齐样式字典
+                - 'horizontal': 水平对齐 ('left', 'center', 'right')
+                - 'vertical': 垂直对齐 ('top', 'center', 'bottom')
+                - 'wrap_text': 是否自动换行 (True/False)
+            - 'number_format': 数字格式字符串
+    
+    Returns:
+        None
+    """
+    # 写入内容
+    worksheet[cell_address] = content
+    
+    # 如果没有样式信息，直接返回
+    if style_dict is None:
+        return
+    
+    # 样式对象按样式内容缓存，按引用应用到单元格
+    apply_registered_style(worksheet[cell_address], register_style(style_dict))
+
+# 表头样式
+HEADER_STYLE = {
+    'font': {
+        'name': '微软雅黑',
+        'size': 12,
+        'bold': True,
+        'color': 'FFFFFF'
+    },
+    'fill': {
+        'type': 'solid',
+        'color': '4472C4'
+    },
+    'alignment': {
+        'horizontal': 'center',
+        'vertical': 'center'
+    },
+    'border': {
+        'left': 'thin',
+        'right': 'thin',
+        'top': 'thin',
+        'bottom': 'thin',
+        'color': '000000'
+    }
+}
+HEADER_STYLE_KEY = register_style(HEADER_STYLE)
 
 def write_header_cell(worksheet, cell_address, content):
     """
@@ -127,31 +278,27 @@ def write_header_cell(worksheet, cell_address, content):
         cell_address: 单元格地址
         content: 要写入的内容
     """
-    header_style = {
-        'font': {
-            'name': '微软雅黑',
-            'size': 12,
-            'bold': True,
-            'color': 'FFFFFF'
-        },
-        'fill': {
-            'type': 'solid',
-            'color': '4472C4'
-        },
-        'alignment': {
-            'horizontal': 'center',
-            'vertical': 'center'
-        },
-        'border': {
-            'left': 'thin',
-            'right': 'thin',
-            'top': 'thin',
-            'bottom': 'thin',
-            'color': '000000'
-        }
+    write_registered_cell(worksheet, cell_address, content, HEADER_STYLE_KEY)
+
+# 数据样式
+DATA_STYLE = {
+    'font': {
+        'name': '微软雅黑',
+        'size': 10
+    },
+    'alignment': {
+        'horizontal': 'center',
+        'vertical': 'center'
+    },
+    'border': {
+        'left': 'thin',
+        'right': 'thin',
+        'top': 'thin',
+        'bottom': 'thin'
     }
-    
-    write_and_format_cell(worksheet, cell_address, content, header_style)
+}
+DATA_STYLE_KEY = register_style(DATA_STYLE)
+NUMERIC_DATA_STYLE_KEY = register_style(dict(DATA_STYLE, number_format='0.0000'))
 
 def write_data_cell(worksheet, cell_address, content, is_numeric=False):
     """
@@ -166,27 +313,12 @@ def write_data_cell(worksheet, cell_address, content, is_numeric=False):
     Note:
         此函数在simulator.py中未使用，可考虑移除
     """
-    data_style = {
-        'font': {
-            'name': '微软雅黑',
-            'size': 10
-        },
-        'alignment': {
-            'horizontal': 'center',
-            'vertical': 'center'
-        },
-        'border': {
-            'left': 'thin',
-            'right': 'thin',
-            'top': 'thin',
-            'bottom': 'thin'
-        }
-    }
-    
-    if is_numeric:
-        data_style['number_format'] = '0.0000'
-    
-    write_and_format_cell(worksheet, cell_address, content, data_style)
+    write_registered_cell(worksheet, cell_address, content,
+                          NUMERIC_DATA_STYLE_KEY if is_numeric else DATA_STYLE_KEY)
+
+# 百分数样式
+PERCENTAGE_STYLE = dict(DATA_STYLE, number_format='0.00%')
+PERCENTAGE_STYLE_KEY = register_style(PERCENTAGE_STYLE)
 
 def write_percentage_cell(worksheet, cell_address, content):
     """
@@ -197,10 +329,34 @@ def write_percentage_cell(worksheet, cell_address, content):
         cell_address: 单元格地址
         content: 要写入的内容（小数形式，如0.1234）
     """
-    percentage_style = {
+    write_registered_cell(worksheet, cell_address, content, PERCENTAGE_STYLE_KEY)
+
+# 根据gacha次数设置不同的背景颜色
+GACHA_COLORS = {
+    12: 'FFB6C1',  # 浅粉色
+    15: '98FB98',  # 浅绿色
+    20: '87CEEB'   # 浅蓝色
+}
+
+def get_max_value_style(gacha_number):
+    """
+    获取最大值单元格样式
+    
+    Args:
+        gacha_number: gacha次数（12, 15, 或 20）
+        
+    Returns:
+        dict: 样式字典
+    """
+    return {
         'font': {
             'name': '微软雅黑',
-            'size': 10
+            'size': 10,
+            'bold': True
+        },
+        'fill': {
+            'type': 'solid',
+            'color': GACHA_COLORS.get(gacha_number, 'FFFFFF')
         },
         'alignment': {
             'horizontal': 'center',
@@ -214,8 +370,25 @@ def write_percentage_cell(worksheet, cell_address, content):
         },
         'number_format': '0.00%'
     }
+
+# 最大值样式键（按gacha次数）
+MAX_VALUE_STYLE_KEYS = {}
+
+def get_max_value_style_key(gacha_number):
+    """
+    获取最大值单元格的样式键
     
-    write_and_format_cell(worksheet, cell_address, content, percentage_style)
+    Args:
+        gacha_number: gacha次数（12, 15, 或 20）
+        
+    Returns:
+        tuple: 样式键
+    """
+    style_key = MAX_VALUE_STYLE_KEYS.get(gacha_number)
+    if style_key is None:
+        style_key = register_style(get_max_value_style(gacha_number))
+        MAX_VALUE_STYLE_KEYS[gacha_number] = style_key
+    return style_key
 
 def write_max_value_cell(worksheet, cell_address, content, gacha_number):
     """
@@ -227,22 +400,25 @@ def write_max_value_cell(worksheet, cell_address, content, gacha_number):
         content: 要写入的内容
         gacha_number: gacha次数（12, 15, 或 20）
     """
-    # 根据gacha次数设置不同的背景颜色
-    color_map = {
-        12: 'FFB6C1',  # 浅粉色
-        15: '98FB98',  # 浅绿色
-        20: '87CEEB'   # 浅蓝色
-    }
-    
-    max_value_style = {
+    write_registered_cell(worksheet, cell_address, content, get_max_value_style_key(gacha_number))
+
+# 图例信息：(gacha次数, 颜色, 颜色名称)
+GACHA_LEGEND = [
+    (12, GACHA_COLORS[12], '浅粉色'),
+    (15, GACHA_COLORS[15], '浅绿色'),
+    (20, GACHA_COLORS[20], '浅蓝色')
+]
+
+# 图例颜色说明样式键（按gacha次数）
+LEGEND_STYLE_KEYS = {
+    gacha_num: register_style({
         'font': {
             'name': '微软雅黑',
-            'size': 10,
-            'bold': True
+            'size': 10
         },
         'fill': {
             'type': 'solid',
-            'color': color_map.get(gacha_number, 'FFFFFF')
+            'color': color
         },
         'alignment': {
             'horizontal': 'center',
@@ -253,11 +429,42 @@ def write_max_value_cell(worksheet, cell_address, content, gacha_number):
             'right': 'thin',
             'top': 'thin',
             'bottom': 'thin'
-        },
-        'number_format': '0.00%'
+        }
+    })
+    for gacha_num, color, _ in GACHA_LEGEND
+}
+
+# 图例说明文字样式键
+LEGEND_TEXT_STYLE_KEY = register_style({
+    'font': {
+        'name': '微软雅黑',
+        'size': 10
+    },
+    'alignment': {
+        'horizontal': 'left',
+        'vertical': 'center'
     }
+})
+
+def get_gacha_legend_rows(start_col):
+    """
+    获取gacha次数图例的各行单元格（供逐行流式写入使用）
     
-    write_and_format_cell(worksheet, cell_address, content, max_value_style)
+    Args:
+        start_col: 开始列号
+        
+    Returns:
+        list: 每行一个列表 [(列号, 内容, 样式键), ...]
+    """
+    return [
+        [
+            # 颜色说明
+            (start_col, f'Gacha {gacha_num}', LEGEND_STYLE_KEYS[gacha_num]),
+            # 说明文字
+            (start_col + 1, f'最大值标记 ({color_name})', LEGEND_TEXT_STYLE_KEY)
+        ]
+        for gacha_num, color, color_name in GACHA_LEGEND
+    ]
 
 def write_gacha_legend(worksheet, start_row, start_col):
     """
@@ -268,54 +475,9 @@ def write_gacha_legend(worksheet, start_row, start_col):
         start_row: 开始行号
         start_col: 开始列号
     """
-    gacha_info = [
-        (12, 'FFB6C1', '浅粉色'),
-        (15, '98FB98', '浅绿色'),
-        (20, '87CEEB', '浅蓝色')
-    ]
-    
-    for i, (gacha_num, color, color_name) in enumerate(gacha_info):
-        row = start_row + i
-        
-        # 写入颜色说明
-        legend_style = {
-            'font': {
-                'name': '微软雅黑',
-                'size': 10
-            },
-            'fill': {
-                'type': 'solid',
-                'color': color
-            },
-            'alignment': {
-                'horizontal': 'center',
-                'vertical': 'center'
-            },
-            'border': {
-                'left': 'thin',
-                'right': 'thin',
-                'top': 'thin',
-                'bottom': 'thin'
-            }
-        }
-        
-        write_and_format_cell(worksheet, f'{get_column_letter(start_col)}{row}', 
-                             f'Gacha {gacha_num}', legend_style)
-        
-        # 写入说明文字
-        text_style = {
-            'font': {
-                'name': '微软雅黑',
-                'size': 10
-            },
-            'alignment': {
-                'horizontal': 'left',
-                'vertical': 'center'
-            }
-        }
-        
-        write_and_format_cell(worksheet, f'{get_column_letter(start_col + 1)}{row}', 
-                             f'最大值标记 ({color_name})', text_style)
+    for i, cells in enumerate(get_gacha_legend_rows(start_col)):
+        for col, content, style_key in cells:
+            write_registered_cell(worksheet, f'{get_column_letter(col)}{start_row + i}', content, style_key)
 
 def apply_data_bars(worksheet, start_row, start_col, end_row, end_col):
     """